@@ -0,0 +1,438 @@
+"""
+End-to-End-Benchmark ohne Internet: synthetische Schul-Websites, Such-Stub,
+OpenAI-kompatibler KI-Stub (mit einstellbarer Latenz) und Geocoder-Stub.
+Misst crawl_and_analyze, run_auto_scan und generate_map: Schulen pro Minute,
+Latenz-Perzentile, Zeit pro Stufe und Peak-Speicher. Jede Phase läuft in einem
+eigenen Prozess mit leerem Arbeitsordner (keine Caches aus vorherigen Läufen).
+
+Aufruf (im Projektordner):
+    python benchmarks/bench_e2e.py [--schools 200] [--llm-latency 800] [--search-latency 150]
+                                   [--set SCAN_WORKERS=4 --set KI_BATCH_SIZE=5]
+                                   [--json ergebnis.json] [--baseline vorher.json]
+
+Die Websites laufen auf 127.0.0.1 mit einem Port pro Schule (eigene "Domain" je Schule).
+Ohne Chrome: Seiten, die einen Browser bräuchten, gelten als nicht erreichbar.
+"""
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import random
+import re
+import selectors
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+SCHULTYPEN = ["Grundschule", "Realschule", "Gymnasium", "Gesamtschule", "Förderschule", "Hauptschule"]
+KEYWORDS = ["MINT", "Sport", "Musik", "bilingual", "Makerspace", "Montessori", "Ganztag", "jahrgangsübergreifend", "Lernlabor"]
+NAMEN = ["Am Park", "Lindenhof", "Goethe", "Schiller", "Am Markt", "Sonnenhügel", "Kastanienallee", "Rheinblick", "Nordstadt", "Am Wald"]
+ORTE = ["Kassel", "Fulda", "Marburg", "Gießen", "Wetzlar", "Hanau", "Offenbach", "Darmstadt", "Limburg", "Bad Hersfeld"]
+CMS_TYPES = ["wordpress", "typo3", "joomla", "plain"]
+L1_PAGES = [("Über uns", "ueber-uns"), ("Schulprofil", "schulprofil"), ("Leitbild", "leitbild"), ("Unsere Schule", "unsere-schule")]
+L2_PAGES = [("Ganztag", "ganztag"), ("Konzept", "konzept"), ("AGs", "ags"), ("Förderung", "foerderung"), ("Pädagogik", "paedagogik")]
+OTHER_PAGES = [("Termine", "termine"), ("Aktuelles", "aktuelles"), ("Kontakt", "kontakt"), ("Impressum", "impressum"), ("Datenschutz", "datenschutz")]
+FILLER = ["Unsere Schülerinnen und Schüler lernen in kleinen Gruppen", "Der Förderverein unterstützt viele Projekte",
+          "Im Frühjahr findet das Schulfest statt", "Die Elternarbeit ist uns ein besonderes Anliegen",
+          "Wir arbeiten eng mit Vereinen aus der Region zusammen", "Die Mensa bietet täglich ein warmes Mittagessen an",
+          "Neue Tablets stehen allen Klassen zur Verfügung", "Die Bibliothek ist in den Pausen geöffnet"]
+
+
+# --- KORPUS ---
+
+def make_corpus(count, seed):
+    """Deterministische Liste synthetischer Schulen (gleicher Seed -> gleiche Websites)."""
+    rng = random.Random(seed)
+    sites = []
+    for i in range(count):
+        typ = rng.choice(SCHULTYPEN)
+        sites.append({
+            "id": i,
+            "name": f"{typ} {rng.choice(NAMEN)} {i}",
+            "ort": rng.choice(ORTE),
+            "typ": typ,
+            "keywords": sorted(rng.sample(KEYWORDS, rng.randint(1, 4))),
+            "cms": CMS_TYPES[i % len(CMS_TYPES)],
+            "l1": rng.sample(L1_PAGES, rng.randint(1, 3)),
+            "l2": rng.sample(L2_PAGES, rng.randint(0, 3)),
+            "size": rng.choice([2, 4, 8, 16, 40]), # Absätze pro Seite -> ca. 0,3 bis 8 KB Text
+            "seed": rng.random(),
+        })
+    return sites
+
+def paragraphs(rng, n):
+    return "".join(f"<p>{rng.choice(FILLER)}. {rng.choice(FILLER)}.</p>" for _ in range(n))
+
+def nav_html(site, current_l1=None):
+    """Menü im Stil des jeweiligen CMS; L2-Seiten hängen (wie oft in echt) nur unter der L1-Seite."""
+    items = [("Startseite", "")] + site["l1"] + OTHER_PAGES[:3]
+    links = []
+    for label, slug in items:
+        link = f'<a href="/{slug + "/" if slug else ""}">{label}</a>'
+        if slug == current_l1 and site["l2"]:
+            link += "<ul>" + "".join(f'<li><a href="/{slug}/{s}/">{l}</a></li>' for l, s in site["l2"]) + "</ul>"
+        links.append(f"<li>{link}</li>")
+    menu = "<ul>" + "".join(links) + "</ul>"
+    if site["cms"] == "wordpress": return f'<nav class="main-navigation">{menu}</nav>'
+    if site["cms"] == "typo3": return f'<div id="mainmenu">{menu}</div>'
+    if site["cms"] == "joomla": return f'<div class="moduletable"><ul class="nav menu">{menu}</ul></div>'
+    return f"<div>{menu}</div>"
+
+def footer_html():
+    return ('<div class="cookie-banner">Wir verwenden Cookies, um unsere Website zu verbessern. Alle akzeptieren</div>'
+            '<footer><a href="/impressum/">Impressum</a> | <a href="/datenschutz/">Datenschutz</a> © 2024</footer>')
+
+def page_html(site, path):
+    """HTML einer Seite oder None (404)."""
+    rng = random.Random(f"{site['seed']}{path}")
+    kws = site["keywords"]
+    half = len(kws) // 2 if site["l2"] else len(kws) # ohne L2-Seiten stehen alle Keywords auf L1
+    l1_slugs = {s: l for l, s in site["l1"]}
+    l2_slugs = {s: l for l, s in site["l2"]}
+    parts = [p for p in path.strip("/").split("/") if p]
+
+    if not parts:
+        title = site["name"]
+        body = (f"<h1>Willkommen an der {site['name']}</h1><p>Wir sind eine {site['typ']} in {site['ort']}.</p>"
+                + paragraphs(rng, site["size"]))
+        current = None
+    elif len(parts) == 1 and parts[0] in l1_slugs:
+        title = l1_slugs[parts[0]]
+        body = (f"<h1>{title}</h1><p>Unser Schulprofil: Als {site['typ']} setzen wir auf {', '.join(kws[:half] or kws)}.</p>"
+                + paragraphs(rng, site["size"]))
+        current = parts[0]
+    elif len(parts) == 2 and parts[0] in l1_slugs and parts[1] in l2_slugs:
+        title = l2_slugs[parts[1]]
+        body = f"<h1>{title}</h1><p>Im Bereich {title} bieten wir {', '.join(kws[half:] or kws)} an.</p>" + paragraphs(rng, site["size"])
+        current = parts[0]
+    elif len(parts) == 1 and parts[0] in {s for _, s in OTHER_PAGES}:
+        title = parts[0].title()
+        body = paragraphs(rng, 2)
+        current = None
+    else:
+        return None
+    return (f"<!DOCTYPE html><html><head><title>{title} - {site['name']}</title><style>body{{font-family:sans-serif}}</style>"
+            f"<script>var cms='{site['cms']}';</script></head><body>{nav_html(site, current)}<main>{body}</main>{footer_html()}</body></html>")
+
+def site_paths(site):
+    paths = ["/"] + [f"/{s}/" for _, s in site["l1"]] + [f"/{s}/" for _, s in OTHER_PAGES]
+    paths += [f"/{l1}/{l2}/" for _, l1 in site["l1"] for _, l2 in site["l2"]]
+    return paths
+
+def sitemap_xml(site, base):
+    locs = "".join(f"<url><loc>{base}{p}</loc></url>" for p in site_paths(site))
+    return f'<?xml version="1.0" encoding="UTF-8"?><urlset xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">{locs}</urlset>'
+
+
+# --- STUB-SERVER (laufen in einem eigenen Prozess) ---
+
+class QuietServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def handle_error(self, request, client_address): pass # abgebrochene Verbindungen (z.B. HEAD-Checks) sind normal
+
+class SiteHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True # sonst bremst Delayed-ACK jede Antwort um ~40 ms
+
+    def log_message(self, *args): pass
+
+    def send(self, status, body, ctype="text/html; charset=utf-8"):
+        raw = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", ctype)
+        self.send_header("Content-Length", str(len(raw)))
+        self.end_headers()
+        if self.command != "HEAD": self.wfile.write(raw)
+
+    def do_HEAD(self): self.do_GET()
+
+    def do_GET(self):
+        site = self.server.site
+        base = f"http://127.0.0.1:{self.server.server_address[1]}"
+        path = self.path.split("?")[0]
+        cms = site["cms"]
+        if path == "/robots.txt":
+            extra = f"Sitemap: {base}/wp-sitemap.xml\n" if cms == "wordpress" else ""
+            return self.send(200, "User-agent: *\nDisallow: /wp-admin/\n" + extra, "text/plain")
+        if cms == "wordpress" and path == "/wp-sitemap.xml":
+            return self.send(200, '<?xml version="1.0"?><sitemapindex xmlns="http://www.sitemaps.org/schemas/sitemap/0.9">'
+                                  f"<sitemap><loc>{base}/wp-sitemap-posts-page-1.xml</loc></sitemap></sitemapindex>", "application/xml")
+        if (cms == "wordpress" and path == "/wp-sitemap-posts-page-1.xml") or (cms == "typo3" and path == "/sitemap.xml"):
+            return self.send(200, sitemap_xml(site, base), "application/xml")
+        html = page_html(site, path)
+        if html is None: return self.send(404, "<h1>404</h1>")
+        self.send(200, html)
+
+class LLMHandler(BaseHTTPRequestHandler):
+    """Minimaler OpenAI-kompatibler /v1/chat/completions-Endpunkt (auch für Batch-Prompts)."""
+    protocol_version = "HTTP/1.1"
+    disable_nagle_algorithm = True
+
+    def log_message(self, *args): pass
+
+    def do_POST(self):
+        req = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+        prompt = req.get("messages", [{}])[-1].get("content", "")
+        latency = self.server.latency
+        time.sleep(random.uniform(0.5, 1.5) * latency if latency else 0)
+        summary = "Die Schule legt Wert auf individuelle Förderung. Sie bietet ein breites Ganztagsangebot."
+        if '"ergebnisse"' in prompt:
+            ids = re.findall(r'"id": (\d+)', prompt.split("Schulen:")[-1])
+            content = json.dumps({"ergebnisse": [{"id": int(i), "zusammenfassung": summary} for i in ids]}, ensure_ascii=False)
+        else:
+            content = summary
+        body = json.dumps({
+            "id": "bench", "object": "chat.completion", "created": int(time.time()), "model": req.get("model", "stub"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": len(prompt) // 4, "completion_tokens": len(content) // 4, "total_tokens": (len(prompt) + len(content)) // 4},
+        }).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+def serve(count, seed, llm_latency, conn):
+    """Ein Port pro Schule + ein KI-Port; alle Listener in einer Selector-Schleife."""
+    servers = []
+    for site in make_corpus(count, seed):
+        srv = QuietServer(("127.0.0.1", 0), SiteHandler)
+        srv.site = site
+        servers.append(srv)
+    llm = QuietServer(("127.0.0.1", 0), LLMHandler)
+    llm.latency = llm_latency
+    threading.Thread(target=llm.serve_forever, daemon=True).start()
+    conn.send({"ports": [s.server_address[1] for s in servers], "llm_port": llm.server_address[1]})
+
+    sel = selectors.DefaultSelector()
+    for srv in servers:
+        sel.register(srv.socket, selectors.EVENT_READ, srv)
+    while True:
+        for key, _ in sel.select():
+            key.data._handle_request_noblock()
+
+
+# --- PHASEN (laufen jeweils in einem frischen Prozess) ---
+
+class NullDriver:
+    """Platzhalter für Chrome: Seiten, die einen echten Browser bräuchten, bleiben leer."""
+    def get(self, url): raise RuntimeError("Kein Browser im Benchmark")
+    def execute_script(self, *args): return 1
+    def quit(self): pass
+
+class StubGeocoder:
+    latency = 0.0
+    def __init__(self, *args, **kwargs): pass
+    def geocode(self, query, timeout=None):
+        time.sleep(StubGeocoder.latency)
+        h = int(hashlib.md5(query.encode("utf-8")).hexdigest(), 16)
+        if h % 20 == 0: return None # ein paar Adressen findet der Geocoder nicht -> Fallback auf den Ort
+        class Location: pass
+        loc = Location()
+        loc.latitude, loc.longitude = 47.5 + (h % 5000) / 1000, 6.0 + (h // 5000 % 9000) / 1000
+        return loc
+
+def pct(values, q):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, int(q * len(ordered) + 0.999999) - 1))] if ordered else 0.0
+
+def peak_rss_mb():
+    try:
+        import resource
+    except ImportError: # Windows: kein resource-Modul -> Spalte bleibt 0
+        return 0.0
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / 1024 / 1024 if sys.platform == "darwin" else rss / 1024
+
+def setup_scanner(setup):
+    """Importiert school_miner im leeren Arbeitsordner und hängt alle Stubs ein."""
+    os.environ["NO_PROXY"] = os.environ["no_proxy"] = "127.0.0.1,localhost"
+    sys.path.insert(0, ROOT)
+    import school_miner as sm
+    from openai import OpenAI
+
+    sm.CONFIG.update({"MAP_DELAY": 0, "AI_PRIORITY": ["openai"], "OPENAI_MODEL": "stub", "METRICS_EXPORT_INTERVAL": 3600})
+    sm.CONFIG.update(setup["overrides"])
+    sm.status_flags.update({p: p == "openai" for p in sm.status_flags})
+    sm.clients["openai"] = OpenAI(base_url=f"http://127.0.0.1:{setup['llm_port']}/v1", api_key="bench", max_retries=0)
+    sm.get_driver = lambda *a, **k: NullDriver()
+
+    latency = setup["search_latency"]
+    urls = {f"{s['name']} {s['ort']} Startseite": f"http://127.0.0.1:{port}/" for s, port in zip(setup["sites"], setup["ports"])}
+
+    class StubSearch:
+        def text(self, query, **kwargs):
+            time.sleep(latency)
+            return [{"href": "https://de.wikipedia.org/wiki/Schule"}, {"href": urls.get(query, "http://127.0.0.1:9/")}]
+
+    sm.get_search_session = lambda: StubSearch()
+    import geopy.geocoders
+    StubGeocoder.latency = setup["geo_latency"]
+    geopy.geocoders.Nominatim = StubGeocoder
+    return sm
+
+def accuracy(sites, entries):
+    """Anteil der Schulen, deren Schultyp bzw. alle Keywords korrekt erkannt wurden."""
+    typ_ok = sum(1 for s, e in zip(sites, entries) if s["typ"] in str(e.get("schultyp", "")))
+    kw_ok = sum(1 for s, e in zip(sites, entries) if all(k in str(e.get("keywords", "")).split(", ") for k in s["keywords"]))
+    return typ_ok / len(sites), kw_ok / len(sites)
+
+def phase_crawl(sm, setup):
+    sites, latencies, entries = setup["sites"], [], []
+    driver = sm.get_shared_driver()
+    start = time.perf_counter()
+    for s in sites:
+        t0 = time.perf_counter()
+        url, typ, kw, ctx = sm.crawl_and_analyze(driver, s["name"], s["ort"])
+        latencies.append(time.perf_counter() - t0)
+        entries.append({"schultyp": typ, "keywords": kw})
+    wall = time.perf_counter() - start
+    typ_acc, kw_acc = accuracy(sites, entries)
+    return {"crawl_and_analyze": {"schools": len(sites), "seconds": wall, "per_min": len(sites) / wall * 60,
+                                  "p50": pct(latencies, .5), "p95": pct(latencies, .95), "p99": pct(latencies, .99),
+                                  "typ_accuracy": typ_acc, "kw_accuracy": kw_acc, "peak_rss_mb": peak_rss_mb(),
+                                  "stages": sm.metrics_snapshot()}}
+
+def phase_scan_and_map(sm, setup):
+    sites = setup["sites"]
+    data = [{"schulname": s["name"], "ort": s["ort"], "schultyp": "", "keywords": "",
+             "webseite": "Nicht gefunden", "ki_zusammenfassung": "Keine Daten"} for s in sites]
+    sm.save_data(data)
+    data = sm.load_data()
+
+    start = time.perf_counter()
+    sm.run_auto_scan(data)
+    scan_wall = time.perf_counter() - start
+    stages = sm.metrics_snapshot()
+    data = sm.load_data()
+    typ_acc, kw_acc = accuracy(sites, data)
+    crawl = stages.get("crawl", {})
+    results = {"run_auto_scan": {"schools": len(data), "seconds": scan_wall, "per_min": len(data) / scan_wall * 60,
+                                 "p50": crawl.get("p50", 0), "p95": crawl.get("p95", 0), "p99": crawl.get("p99", 0),
+                                 "typ_accuracy": typ_acc, "kw_accuracy": kw_acc,
+                                 "ki_done": sum(1 for e in data if "Förderung" in str(e.get("ki_zusammenfassung", ""))) / len(data),
+                                 "peak_rss_mb": peak_rss_mb(), "stages": stages}}
+
+    start = time.perf_counter()
+    sm.generate_map(data)
+    map_wall = time.perf_counter() - start
+    results["generate_map"] = {"schools": len(data), "seconds": map_wall, "per_min": len(data) / map_wall * 60,
+                               "map_kb": os.path.getsize(sm.CONFIG["MAP_FILE"]) / 1024, "peak_rss_mb": peak_rss_mb()}
+    return results
+
+PHASES = {"crawl": phase_crawl, "scan": phase_scan_and_map}
+
+def run_phase(name, setup_path, result_path, verbose):
+    with open(setup_path, encoding="utf-8") as f:
+        setup = json.load(f)
+    # ignore_cleanup_errors: unter Windows hält der Scanner seine SQLite-Dateien bis Prozessende offen
+    with tempfile.TemporaryDirectory(prefix=f"bench_{name}_", ignore_cleanup_errors=True) as workdir:
+        os.chdir(workdir)
+        devnull = None
+        if not verbose:
+            devnull = open(os.devnull, "w", encoding="utf-8")
+            sys.stdout = devnull
+        try:
+            sm = setup_scanner(setup)
+            result = PHASES[name](sm, setup)
+        finally:
+            if devnull: sys.stdout = sys.__stdout__
+            os.chdir(ROOT) # das aktuelle Verzeichnis lässt sich nicht löschen
+    with open(result_path, "w", encoding="utf-8") as f:
+        json.dump(result, f)
+
+
+# --- AUSGABE ---
+
+def print_results(results, baseline):
+    print(f"\n   {'Phase':<18} {'Schulen':>7} {'Zeit s':>8} {'pro Min':>9} {'p50 ms':>8} {'p95 ms':>8} {'p99 ms':>8} {'Typ':>5} {'KW':>5} {'RSS MB':>7}")
+    for name, r in results.items():
+        acc = f"{r['typ_accuracy']:>5.0%} {r['kw_accuracy']:>5.0%}" if "typ_accuracy" in r else f"{'':>5} {'':>5}"
+        print(f"   {name:<18} {r['schools']:>7} {r['seconds']:>8.2f} {r['per_min']:>9.0f} {r.get('p50', 0) * 1000:>8.0f} "
+              f"{r.get('p95', 0) * 1000:>8.0f} {r.get('p99', 0) * 1000:>8.0f} {acc} {r['peak_rss_mb']:>7.0f}")
+        if baseline and name in baseline:
+            before = baseline[name]["per_min"]
+            print(f"   {'':<18} Durchsatz ggü. Baseline: {r['per_min'] / before - 1:+.0%} ({before:.0f}/min vorher)")
+
+    stages = results.get("run_auto_scan", {}).get("stages", {})
+    if stages:
+        print(f"\n   Stufen im Auto-Scan: {'Anzahl':>7} {'p50 ms':>8} {'p95 ms':>8} {'Summe s':>8}")
+        for stage, m in stages.items():
+            print(f"   {stage:<20} {m['count']:>7} {m['p50'] * 1000:>8.1f} {m['p95'] * 1000:>8.1f} {m['seconds_total']:>8.1f}")
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--schools", type=int, default=200)
+    ap.add_argument("--seed", type=int, default=1)
+    ap.add_argument("--llm-latency", type=float, default=800, help="ms pro KI-Anfrage (Mittelwert, ±50%% Streuung)")
+    ap.add_argument("--search-latency", type=float, default=150, help="ms pro Suchanfrage")
+    ap.add_argument("--geo-latency", type=float, default=50, help="ms pro Geocoding-Anfrage")
+    ap.add_argument("--phases", default="crawl,scan", help="crawl = crawl_and_analyze, scan = run_auto_scan + generate_map")
+    ap.add_argument("--set", action="append", default=[], metavar="KEY=VALUE", help="config.json-Wert für den Lauf (JSON-Wert)")
+    ap.add_argument("--json", help="Ergebnisse als JSON speichern (z.B. als spätere Baseline)")
+    ap.add_argument("--baseline", help="JSON eines früheren Laufs zum Vergleich")
+    ap.add_argument("--verbose", action="store_true", help="Ausgaben des Scanners anzeigen")
+    ap.add_argument("--phase", help=argparse.SUPPRESS)
+    ap.add_argument("--setup", help=argparse.SUPPRESS)
+    ap.add_argument("--result", help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.phase:
+        return run_phase(args.phase, args.setup, args.result, args.verbose)
+
+    overrides = {}
+    for item in args.set:
+        key, _, value = item.partition("=")
+        try: overrides[key] = json.loads(value)
+        except ValueError: overrides[key] = value
+
+    sites = make_corpus(args.schools, args.seed)
+    parent_conn, child_conn = multiprocessing.Pipe()
+    server = multiprocessing.Process(target=serve, args=(args.schools, args.seed, args.llm_latency / 1000, child_conn), daemon=True)
+    server.start()
+    ports = parent_conn.recv()
+
+    pages = sum(len(site_paths(s)) for s in sites)
+    print(f"📦 Korpus: {len(sites)} Schulen, {pages} Seiten | CMS: {dict(Counter(s['cms'] for s in sites))}")
+    print(f"   Latenzen: KI {args.llm_latency:.0f} ms, Suche {args.search_latency:.0f} ms, Geocoder {args.geo_latency:.0f} ms"
+          + (f" | Config: {overrides}" if overrides else ""))
+
+    results = {}
+    with tempfile.TemporaryDirectory() as tmp:
+        setup_path = os.path.join(tmp, "setup.json")
+        with open(setup_path, "w", encoding="utf-8") as f:
+            json.dump({"sites": sites, **ports, "overrides": overrides, "search_latency": args.search_latency / 1000,
+                       "geo_latency": args.geo_latency / 1000}, f)
+        for phase in [p.strip() for p in args.phases.split(",") if p.strip()]:
+            result_path = os.path.join(tmp, f"{phase}.json")
+            print(f"⏱️ Phase '{phase}' läuft...")
+            subprocess.run([sys.executable, os.path.abspath(__file__), "--phase", phase, "--setup", setup_path,
+                            "--result", result_path] + (["--verbose"] if args.verbose else []), check=True)
+            with open(result_path, encoding="utf-8") as f:
+                results.update(json.load(f))
+    server.terminate()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)["results"]
+    print_results(results, baseline)
+
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2, ensure_ascii=False)
+        print(f"\n💾 Ergebnisse gespeichert: {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,151 @@
+"""
+Micro-Benchmark: alte Keyword-/Schultyp-/Strict-Erkennung (ein Regex pro Eintrag)
+gegen den kompilierten TextMatcher aus school_miner.py.
+
+Aufruf (im Projektordner):
+    python benchmarks/bench_matcher.py [--keywords 500] [--chars 60000] [--runs 20]
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+import school_miner as sm
+sm.CONFIG["METRICS"] = False # keine metrics.json/metrics.prom im Projektordner
+
+
+# --- Alte Implementierung (Stand vor dem TextMatcher), nur zum Vergleich ---
+
+# Fallen-Liste wie im Ausgangsstand, bewusst MIT den fehlenden Kommas: "über die", "über Ihre"
+# und "übergang ..." kleben zu einem Muster zusammen, das praktisch nie greift.
+BASELINE_FALLEN = [
+    r"nach\s+der\s+",
+    r"von\s+der\s+",
+    r"über\s+die\s+"
+    r"über\s+Ihre\s+"
+    r"übergang\s+(von|aus)\s+(der)?\s*",
+    r"kooperation\s+mit\s+(der|einer)?\s*",
+    r"schüler(innen)?\s+der\s+",
+    r"abgänger(innen)?\s+der\s+"
+]
+BASELINE_TRIGGERS = ["leitbild", "konzept", "schulprogramm", "schulprofil", "pädagogik"]
+BASELINE_PATTERNS = [r"Wir\s+sind\s+eine", r"Unsere\s+ist\s+eine", r"Unsere\s+Schule", r"Wir\s+Schule",
+                     r"Die\s+Schule", r"Die\s+.{0,100}?\s+ist\s+eine"]
+
+# Sätze, bei denen der TextMatcher absichtlich anders entscheidet (korrigierte Fallen-Liste)
+KNOWN_DIFFS = ["Alles Wichtige über die Grundschule am Park", "Wir informieren über Ihre Gymnasium-Anmeldung"]
+
+def legacy_keywords(text, keywords):
+    found = set()
+    for k in keywords:
+        if re.search(r'\b' + re.escape(k.lower()), text.lower()): found.add(k)
+    return found
+
+def legacy_school_types(text, school_types, fallen=BASELINE_FALLEN):
+    found = set()
+    for styp in school_types:
+        for match in re.finditer(re.escape(styp), text, re.IGNORECASE):
+            context_before = text[max(0, match.start() - 35):match.start()].lower()
+            if not any(re.search(f, context_before) for f in fallen):
+                found.add(styp)
+                break
+    return found
+
+def legacy_strict(text):
+    sample = text[:10000]
+    if any(t in sample.lower() for t in BASELINE_TRIGGERS):
+        return True
+    return any(re.search(p, sample, re.IGNORECASE) for p in BASELINE_PATTERNS)
+
+
+# --- Testdaten ---
+
+WORDS = ("schule unterricht klasse lehrer eltern projekt woche termine aktuelles "
+         "förderverein mensa bus anmeldung ferien sport musik kunst theater "
+         "nach der grundschule wechseln viele auf das gymnasium unsere schule").split()
+
+def make_keywords(n, rng):
+    base = list(sm.DEFAULT_HARD_KEYWORDS)
+    while len(base) < n:
+        base.append("".join(rng.choice("abcdefghijklmnopqrstuvwxyzäöü") for _ in range(rng.randint(5, 12))))
+    return base[:n]
+
+def make_text(chars, keywords, school_types, rng):
+    parts = []
+    size = 0
+    while size < chars:
+        r = rng.random()
+        if r < 0.01: w = rng.choice(keywords)
+        elif r < 0.015: w = rng.choice(school_types)
+        else: w = rng.choice(WORDS)
+        if rng.random() < 0.1: w = w.capitalize()
+        parts.append(w)
+        size += len(w) + 1
+    return " ".join(parts)[:chars]
+
+
+def bench(label, func, runs):
+    start = time.perf_counter()
+    for _ in range(runs):
+        result = func()
+    ms = (time.perf_counter() - start) / runs * 1000
+    print(f"   {label:<28} {ms:9.2f} ms")
+    return ms, result
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--keywords", type=int, default=500)
+    ap.add_argument("--chars", type=int, default=60000)
+    ap.add_argument("--runs", type=int, default=20)
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+
+    rng = random.Random(args.seed)
+    keywords = make_keywords(args.keywords, rng)
+    school_types = list(sm.DEFAULT_SCHULTYPEN)
+    text = make_text(args.chars, keywords, school_types, rng)
+
+    print(f"📏 {len(keywords)} Keywords, {len(school_types)} Schultypen, {len(text)} Zeichen, {args.runs} Läufe")
+
+    t0 = time.perf_counter()
+    matcher = sm.TextMatcher(keywords, school_types)
+    print(f"   {'Kompilieren (einmalig)':<28} {(time.perf_counter() - t0) * 1000:9.2f} ms")
+
+    def legacy():
+        return legacy_keywords(text, keywords), legacy_school_types(text, school_types), legacy_strict(text)
+
+    def compiled():
+        kws, types, ok = matcher.match(text, check_strict=True)
+        return kws, set(types), ok
+
+    old_ms, old = bench("Alt (Regex pro Eintrag)", legacy, args.runs)
+    new_ms, new = bench("TextMatcher (ein Durchlauf)", compiled, args.runs)
+
+    print(f"\n⚡ Faktor: {old_ms / new_ms:.1f}x schneller")
+
+    # Schultypen: gleiche Logik mit korrigierter Fallen-Liste muss exakt passen,
+    # Abweichungen zum Ausgangsstand dürfen nur von der Fallen-Korrektur kommen
+    fixed_types = legacy_school_types(text, school_types, sm.SCHULTYP_FALLEN)
+    if old[0] != new[0] or old[2] != new[2] or fixed_types != new[1]:
+        print("⚠️ Ergebnisse weichen ab!")
+        print(f"   Keywords nur alt: {sorted(old[0] - new[0])[:10]} | nur neu: {sorted(new[0] - old[0])[:10]}")
+        print(f"   Typen alt (korrigierte Fallen): {sorted(fixed_types)} | neu: {sorted(new[1])}")
+        print(f"   Strict alt: {old[2]} | neu: {new[2]}")
+        sys.exit(1)
+    print("✅ Keywords und Strict-Check identisch, Schultypen identisch bei gleicher Fallen-Liste.")
+    if old[1] != new[1]:
+        print(f"   Schultypen im Testtext ggü. Ausgangsstand: nur alt {sorted(old[1] - new[1])} | nur neu {sorted(new[1] - old[1])}")
+
+    print("\nℹ️ Bekannte Abweichung durch die korrigierte Fallen-Liste:")
+    for sentence in KNOWN_DIFFS:
+        before = sorted(legacy_school_types(sentence, school_types))
+        after = sorted(matcher.match(sentence)[1])
+        print(f"   \"{sentence}\"\n      Ausgangsstand: {before or '-'} | TextMatcher: {after or '-'}")
+
+
+if __name__ == "__main__":
+    main()
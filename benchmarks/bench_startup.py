@@ -0,0 +1,91 @@
+"""
+Startzeit-Benchmark: Zeit vom Programmstart bis zum Hauptmenü ("👉 Wahl:")
+plus Import-Zeit von school_miner.py. Dient als Regressionsschutz für die
+Lazy-Imports: schlägt fehl, wenn beim Import wieder ein schweres Paket
+mitgeladen wird oder die Startzeit über --max-ms liegt.
+
+Aufruf (im Projektordner):
+    python benchmarks/bench_startup.py [--runs 5] [--max-ms 1500]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+SCRIPT = os.path.join(ROOT, "school_miner.py")
+
+# Diese Pakete dürfen beim Start NICHT geladen werden
+HEAVY_MODULES = ["pandas", "selenium", "webdriver_manager", "openai", "google.genai",
+                 "ddgs", "folium", "geopy", "requests"]
+
+IMPORT_CHECK = (
+    "import sys, time; t = time.perf_counter(); import school_miner; "
+    "ms = (time.perf_counter() - t) * 1000; "
+    f"print(ms); print(','.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+)
+
+
+def child_env():
+    return dict(os.environ, PYTHONIOENCODING="utf-8", PYTHONPATH=ROOT)
+
+
+def time_to_menu(workdir):
+    """Startet das Programm in einem leeren Ordner und misst, bis der Menü-Prompt erscheint."""
+    t0 = time.perf_counter()
+    proc = subprocess.Popen([sys.executable, "-u", SCRIPT], cwd=workdir, env=child_env(),
+                            stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.STDOUT)
+    out = b""
+    try:
+        while b"Wahl:" not in out:
+            chunk = proc.stdout.read1(4096)
+            if not chunk:
+                raise RuntimeError("Programm beendet, bevor das Menü erschien:\n" + out.decode("utf-8", "replace"))
+            out += chunk
+        return (time.perf_counter() - t0) * 1000
+    finally:
+        proc.kill()
+        proc.wait()
+
+
+def import_check(workdir):
+    res = subprocess.run([sys.executable, "-c", IMPORT_CHECK], cwd=workdir, env=child_env(),
+                         capture_output=True, text=True, check=True)
+    ms, loaded = res.stdout.splitlines()[-2:]
+    return float(ms), [m for m in loaded.split(",") if m]
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--runs", type=int, default=5)
+    ap.add_argument("--max-ms", type=float, default=0, help="Fehler, wenn der Median bis zum Menü darüber liegt (0 = aus)")
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as workdir:
+        imports, menus, heavy = [], [], set()
+        for _ in range(args.runs):
+            ms, loaded = import_check(workdir)
+            imports.append(ms)
+            heavy.update(loaded)
+            menus.append(time_to_menu(workdir))
+
+    print(f"📏 {args.runs} Läufe")
+    print(f"   {'Import school_miner':<22} median {statistics.median(imports):8.1f} ms | min {min(imports):8.1f} ms")
+    print(f"   {'Start bis Menü':<22} median {statistics.median(menus):8.1f} ms | min {min(menus):8.1f} ms")
+
+    failed = False
+    if heavy:
+        print(f"⚠️ Beim Import geladen: {', '.join(sorted(heavy))}")
+        failed = True
+    if args.max_ms and statistics.median(menus) > args.max_ms:
+        print(f"⚠️ Start dauert länger als {args.max_ms:.0f} ms")
+        failed = True
+    if failed: sys.exit(1)
+    print("✅ Keine schweren Imports beim Start.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,131 @@
+"""
+Funktionstest für die Cluster-Karte ohne Browser: erzeugt mit generate_map eine Karte
+aus synthetischen Schulen und führt deren Inline-Skripte mit Node.js in Dokument-
+Reihenfolge aus. Ein Skript sieht dabei nur Elemente, die im HTML vor ihm stehen (wie
+im Browser beim Parsen); danach kommen DOMContentLoaded und load. Leaflet selbst ist
+nur ein Stub. Geprüft wird, dass alle Marker im Cluster landen (per addLayers, damit
+chunkedLoading greift) und dass ein Popup die entpackten Details zeigt statt
+"Details werden geladen...". Schlägt fehl (Exit-Code 1), wenn etwas davon nicht stimmt.
+
+Aufruf (im Projektordner, Node.js muss installiert sein):
+    python benchmarks/check_map.py [--schools 2000]
+"""
+import argparse
+import json
+import os
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+SCHULTYPEN = ["Grundschule", "Gymnasium", "Realschule", "Gesamtschule", "Grundschule, Hauptschule", ""]
+
+# Minimaler DOM: getElementById kennt nur bereits "geparste" Elemente
+HARNESS = r"""
+const fs = require("fs");
+const html = fs.readFileSync(process.argv[2], "utf8");
+const elements = {}, listeners = {DOMContentLoaded: [], load: []};
+const cluster = {layers: [], addLayersCalls: 0, options: null,
+    addLayers(a) { this.addLayersCalls++; this.layers.push(...a); }, clearLayers() { this.layers = []; }, addTo() { return this; }};
+function chain() { return new Proxy(function () {}, {get: (t, k) => k === "then" ? undefined : chain(), apply: () => chain()}); }
+global.window = global;
+global.document = {
+    getElementById: id => elements[id] || null,
+    querySelectorAll: () => [],
+    addEventListener: (e, f) => (listeners[e] || []).push(f),
+};
+window.addEventListener = (e, f) => (listeners[e] || []).push(f);
+global.L = new Proxy({
+    markerClusterGroup: o => { cluster.options = o; return cluster; },
+    AwesomeMarkers: {icon: o => o},
+    LatLng: function (a, b) { this.lat = a; this.lng = b; },
+    marker: (ll, o) => ({ll, o, bindPopup(f) { this.popup = f; return this; },
+                          addTo() { throw new Error("Marker einzeln per addTo statt addLayers"); }}),
+}, {get: (t, k) => k in t ? t[k] : chain()});
+
+const errors = [];
+process.on("unhandledRejection", e => errors.push(String(e && e.message || e)));
+const token = /<script\b([^>]*)>([\s\S]*?)<\/script>|\bid="([^"]+)"/g;
+for (const m of html.matchAll(token)) {
+    if (m[3]) { elements[m[3]] = {id: m[3], textContent: "", style: {}}; continue; }
+    const attrs = m[1], body = m[2];
+    const id = (attrs.match(/\bid="([^"]+)"/) || [])[1];
+    if (id) elements[id] = {id, textContent: body, style: {}};
+    if (/\bsrc=/.test(attrs) || (/\btype=/.test(attrs) && !/javascript/.test(attrs))) continue;
+    try { (0, eval)(body); } catch (e) { errors.push(e.message); }
+}
+
+(async () => {
+    for (const f of [...listeners.DOMContentLoaded, ...listeners.load]) {
+        try { await f(); } catch (e) { errors.push(e.message); }
+    }
+    await new Promise(r => setTimeout(r, 200));
+    const popup = SCHOOL_MARKERS.length ? SCHOOL_MARKERS[0].popup(SCHOOL_MARKERS[0]) : "";
+    console.log(JSON.stringify({markers: SCHOOL_MARKERS.length, in_cluster: cluster.layers.length,
+        add_layers_calls: cluster.addLayersCalls, chunked: !!(cluster.options && cluster.options.chunkedLoading),
+        popup: popup, errors: errors}));
+})();
+"""
+
+
+def make_data(n, rng):
+    data = []
+    for i in range(n):
+        e = {"schulname": f"Schule Nr. {i}", "ort": "Musterstadt", "schultyp": rng.choice(SCHULTYPEN),
+             "keywords": "MINT, Sport", "webseite": f"https://schule{i}.de",
+             "ki_zusammenfassung": "Die Schule bietet Ganztag und eine Schülerfirma.",
+             "lat": 47.5 + rng.random() * 7, "lon": 6 + rng.random() * 9, "geo_precision": rng.choice(["exakt", "stadt"])}
+        data.append(e)
+    return data
+
+
+def main():
+    ap = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    ap.add_argument("--schools", type=int, default=2000)
+    ap.add_argument("--seed", type=int, default=1)
+    args = ap.parse_args()
+
+    node = shutil.which("node")
+    if not node:
+        print("❌ Node.js nicht gefunden - Test übersprungen.")
+        sys.exit(1)
+
+    sys.path.insert(0, ROOT)
+    with tempfile.TemporaryDirectory() as workdir:
+        os.chdir(workdir)
+        import school_miner as sm
+        sm.CONFIG.update({"MAP_MODE": "cluster", "MAP_FILE": "karte.html", "METRICS": False})
+        data = make_data(args.schools, random.Random(args.seed))
+        for e in data: e["geo_key"] = sm.make_geo_key(e)
+        sm.generate_map(data)
+
+        with open("harness.js", "w", encoding="utf-8") as f:
+            f.write(HARNESS)
+        out = subprocess.run([node, "harness.js", "karte.html"], capture_output=True, text=True, encoding="utf-8")
+        os.chdir(ROOT)
+    if out.returncode != 0:
+        print(f"❌ Node-Fehler:\n{out.stderr}")
+        sys.exit(1)
+
+    r = json.loads(out.stdout.strip().splitlines()[-1])
+    print(f"\n📏 {args.schools} Schulen: {r['markers']} Marker, {r['in_cluster']} im Cluster, "
+          f"{r['add_layers_calls']}x addLayers, chunkedLoading={r['chunked']}")
+
+    problems = list(r["errors"])
+    if r["markers"] != args.schools or r["in_cluster"] != args.schools:
+        problems.append("nicht alle Marker im Cluster")
+    if r["add_layers_calls"] != 1 or not r["chunked"]:
+        problems.append("Marker nicht gesammelt per addLayers mit chunkedLoading eingefügt")
+    if "Schule Nr. 0" not in r["popup"] or "Details werden geladen" in r["popup"]:
+        problems.append(f"Popup ohne Details: {r['popup'][:120]!r}")
+    if problems:
+        for p in problems: print(f"⚠️ {p}")
+        sys.exit(1)
+    print("✅ Popups zeigen die Details, alle Marker im Cluster.")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,32 +1,29 @@
 import os
-import pandas as pd
 import json
 import time
 import warnings
 import re
 import random
 import sys
-from urllib.parse import urljoin, urlparse
+from urllib.parse import urljoin, urlparse, unquote
+import html as html_lib
 from dotenv import load_dotenv
 import shutil 
 import webbrowser
 import logging
 import traceback
-
-
-from openai import OpenAI
-from google import genai
-from ddgs import DDGS
-import folium
-from folium import Element
-from geopy.geocoders import Nominatim
-
-# Selenium & Webdriver Manager
-from selenium import webdriver
-from selenium.webdriver.chrome.service import Service
-from selenium.webdriver.chrome.options import Options
-from selenium.webdriver.common.by import By
-from webdriver_manager.chrome import ChromeDriverManager
+import sqlite3
+import hashlib
+import socket
+import collections
+import queue
+import threading
+from html.parser import HTMLParser
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+
+# Schwere Pakete (pandas, Selenium, folium, geopy, ddgs, openai, google-genai, requests)
+# werden erst dort importiert, wo sie gebraucht werden - das Menü erscheint so sofort,
+# und "Einstellungen" oder "Sync" zahlen nicht für Browser, Karte und KI-SDKs.
 
 # --- SETUP & CONFIG ---
 warnings.filterwarnings("ignore")
@@ -42,16 +39,76 @@ PRIORITY_LINKS_L2 = ["Leitbild", "Konzept", "Pädagogik", "Schwerpunkte", "Ganzt
 
 DEFAULT_CONFIG = {
     "INPUT_FILE": "schulen.xlsx",
-    "OUTPUT_FILE": "schulen_ergebnisse.xlsx",
+    "OUTPUT_FILE": "schulen_ergebnisse.xlsx", # Excel-Export (beim Beenden bzw. Menüpunkt "Excel exportieren")
+    "RESULT_DB_FILE": "schulen_ergebnisse.sqlite", # Arbeitsdatenbank, jede Schule wird sofort gespeichert
+    "METRICS": True, # Zeit pro Stufe messen (Suche, Seiten, Matching, KI, Speichern)
+    "METRICS_FILE": "metrics.json", # wird während des Auto-Scans laufend aktualisiert ...
+    "METRICS_PROM_FILE": "metrics.prom", # ... ebenso im Prometheus-Textformat
+    "METRICS_EXPORT_INTERVAL": 10, # Sek.
+    "RESULT_DB_JOURNAL_MODE": "WAL", # "DELETE", wenn die Datenbank auf einem Netzlaufwerk liegt
     "MAP_FILE": "schulen_karte.html",
     "MAP_DELAY": 1.7,  
+    "MAP_MODE": "auto", # "classic" = ein Marker mit Popup je Schule, "cluster" = gebündelte Marker + Filter (große Listen)
+    "MAP_CLUSTER_THRESHOLD": 500, # "auto": ab so vielen Schulen wird die Cluster-Karte erzeugt
+    "GEOCODE_CACHE_FILE": "geocode_cache.sqlite",
+    "GEOCODE_NEGATIVE_TTL_DAYS": 30,
     "COLUMN_NAME_IDX": 0,
     "COLUMN_ORT_IDX": 2,
     "GEMINI_MODEL": "gemini-2.0-flash-exp", 
     "OPENROUTER_MODEL": "meta-llama/llama-3.3-70b-instruct", 
     "GROQ_MODEL": "llama-3.3-70b-versatile",
+    "OPENAI_MODEL": "gpt-4o-mini",
+    "LLM_CACHE": True, # Identische KI-Anfragen nicht erneut (kostenpflichtig) stellen
+    "LLM_CACHE_FILE": "llm_cache.sqlite",
+    "LLM_CACHE_MAX_AGE_DAYS": 90,
+    "LLM_CACHE_MAX_ENTRIES": 20000,
+    "KI_CONCURRENCY": 4, # Max. gleichzeitige KI-Anfragen (z.B. Batch-Fallback)
+    "PROVIDER_LIMITS": {}, # Requests (rpm) und Tokens (tpm) pro Minute je Anbieter, z.B. {"groq": {"rpm": 30, "tpm": 12000}}; fehlt ein Wert = unbegrenzt
+    "KI_EXPECTED_OUTPUT_TOKENS": 300,
+    "KI_RATE_LIMIT_PAUSE": 30, # Sek. Pause für einen Anbieter nach einem 429/Quota-Fehler
+    "KI_TIMEOUTS": {"default": 60, "groq": 30}, # Sek. pro Anfrage und Anbieter
+    "KI_BREAKER_FAILURES": 3, # So viele Fehler in Folge -> Anbieter wird übersprungen ...
+    "KI_BREAKER_COOLDOWN": 120, # ... für so viele Sekunden
+    "KI_HEDGING": False, # Langsamer Anbieter (> p95)? Dann parallel den nächsten fragen, erste Antwort gewinnt
+    "KI_HEDGE_MIN_DELAY": 2.0,
+    "KI_HEDGE_DEFAULT_DELAY": 15.0, # Solange noch keine Messwerte vorliegen
+    "KI_BATCH_SIZE": 0, # >1: Auto-Scan fasst so viele Schulen zu einer KI-Anfrage zusammen (0 = aus)
+    "KI_BATCH_CONTEXT_TOKENS": 2000, # Max. Tokens Text pro Schule innerhalb einer Batch-Anfrage
+    "KI_CONTEXT_TOKENS": {"default": 6000, "groq": 3000}, # Token-Budget für den Website-Text im Prompt je Anbieter
+    "KI_CONTEXT_PAGE_CHARS": 2500, # Max. Zeichen pro Unterseite (nach Entfernen von Menü/Footer/Cookie-Text)
     "WAIT_TIME": 2.0, 
     "HEADLESS": True,
+    "BROWSER_PROFILE": "lean", # "lean" = ohne Bilder/Schriften/Tracker + adaptive Wartezeit, "classic" = altes Verhalten
+    "BROWSER_QUIET_MS": 300, # So lange muss das DOM unverändert sein, bis eine Seite als fertig gilt
+    "CHROMEDRIVER_PATH": "", # Wird automatisch gemerkt, sobald ein Chrome-Treiber funktioniert hat
+    "BROWSER_PREWARM": False, # Browser beim Programmstart im Hintergrund hochfahren
+    "FAST_FETCH": True, # Seiten zuerst per einfachem HTTP laden, Chrome nur bei JS-Seiten
+    "FAST_FETCH_MIN_TEXT": 400, # Weniger sichtbarer Text -> Seite gilt als JS-Seite
+    "HTTP_TIMEOUT": 10,
+    "SEARCH_CACHE_FILE": "search_cache.sqlite", # Suchanfrage -> Treffer
+    "SEARCH_CACHE_TTL_DAYS": 30,
+    "REUSE_KNOWN_URL": True, # Auto-Scan: bekannte, erreichbare Webseite nutzen, wenn der letzte Scan damit Ergebnisse hatte
+    "SEARCH_BACKOFF": 1.0, # Sek. Grundwert für exponentielles Backoff bei Suchfehlern ...
+    "SEARCH_RATELIMIT_BACKOFF": 10.0, # ... und bei Rate-Limits der Suchmaschine
+    "SITEMAP_DISCOVERY": True, # Profilseiten über sitemap.xml finden statt Unterseiten im Browser abzuklappern
+    "SITEMAP_MAX_PAGES": 6,
+    "PAGE_CACHE": True, # Geladene Seiten auf der Festplatte zwischenspeichern
+    "PAGE_CACHE_FILE": "page_cache.sqlite",
+    "PAGE_CACHE_MAX_AGE_HOURS": 168, # Danach wird die Seite erneut geprüft (ETag/Last-Modified)
+    "PAGE_CACHE_MAX_MB": 200,
+    "CASSETTE_MODE": "off", # "record" = alle externen Antworten pro Schule mitschneiden, "replay" = offline abspielen
+    "CASSETTE_DIR": "cassettes",
+    "CASSETTE_TIME_SCALE": 0.0, # Wiedergabe: 0 = so schnell wie möglich, 1 = Originalzeiten, 0.1 = 10x schneller
+    "SCAN_WORKERS": 1, # Anzahl paralleler Browser im Auto-Scan (1 = klassisch, einer nach dem anderen)
+    "WORK_QUEUE": False, # Mehrere Programme/Rechner teilen sich die Arbeit über RESULT_DB_FILE (statt AUTO_RESUME_IDX)
+    "WORK_QUEUE_BATCH": 5, # So viele Schulen reserviert ein Worker auf einmal
+    "WORK_QUEUE_LEASE_SECONDS": 600, # Reservierung verfällt, wenn sich der Worker so lange nicht meldet
+    "WORK_QUEUE_RETRY_HOURS": 24, # Erfolglos gescannte Schulen frühestens danach erneut versuchen
+    "PIPELINE_MODE": False, # Suche, Crawl, KI und Speichern laufen als überlappende Stufen
+    "PIPELINE_SEARCH_WORKERS": 2,
+    "PIPELINE_KI_WORKERS": 2,
+    "PIPELINE_QUEUE_SIZE": 8, # Max. wartende Schulen zwischen zwei Stufen
+    "SCAN_STOP_TIMEOUT": 15, # Sek., die laufende Worker nach STRG+C noch fertig werden dürfen, bevor die Browser schließen
     "SENSITIVITY": "normal", 
     "SCHULTYPEN_LISTE": DEFAULT_SCHULTYPEN,
     "KEYWORD_LISTE": DEFAULT_HARD_KEYWORDS,
@@ -78,6 +135,9 @@ def load_config():
             with open(CONFIG_FILE, 'r', encoding='utf-8') as f:
                 loaded = json.load(f)
                 for k, v in loaded.items(): cfg[k] = v
+                # Umbenannt: KI_BATCH_CONTEXT_CHARS (Zeichen) -> KI_BATCH_CONTEXT_TOKENS (ca. 4 Zeichen pro Token)
+                if "KI_BATCH_CONTEXT_CHARS" in loaded and "KI_BATCH_CONTEXT_TOKENS" not in loaded:
+                    cfg["KI_BATCH_CONTEXT_TOKENS"] = max(1, int(cfg.pop("KI_BATCH_CONTEXT_CHARS")) // 4)
         except: pass
     return cfg
 
@@ -91,6 +151,262 @@ def save_config_to_file(cfg):
 
 CONFIG = load_config()
 
+USER_AGENT = "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36"
+MAX_HTML_BYTES = 3 * 1024 * 1024
+
+# --- METRIKEN (Zeit pro Stufe) ---
+# Jede Stufe (Suche, Seitenabruf, Matching, KI je Anbieter, Speichern) sammelt Anzahl, Fehler,
+# Dauer-Perzentile, Textmenge und Tokens. Während des Laufs wird regelmäßig METRICS_FILE
+# (JSON) und METRICS_PROM_FILE (Prometheus-Textformat) geschrieben.
+
+METRICS_MAX_SAMPLES = 5000 # Pro Stufe; reicht für stabile p99 und begrenzt den Speicher
+
+class StageStats:
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.seconds = 0.0
+        self.bytes = 0
+        self.tokens = 0
+        self.samples = collections.deque(maxlen=METRICS_MAX_SAMPLES)
+
+    def percentile(self, q):
+        ordered = sorted(self.samples)
+        if not ordered: return 0.0
+        return ordered[min(len(ordered) - 1, max(0, int(q * len(ordered) + 0.999999) - 1))]
+
+_metrics = {}
+_metrics_lock = threading.Lock()
+_metrics_last_export = 0.0
+_metrics_exporting = False # Dateien nur während eines Auto-Scans schreiben, nicht bei jeder Menüaktion
+
+def record_metric(stage, seconds, size=0, tokens=0, error=False):
+    global _metrics_last_export
+    if not CONFIG.get("METRICS", True): return
+    now = time.time()
+    with _metrics_lock:
+        st = _metrics.setdefault(stage, StageStats())
+        st.count += 1
+        st.errors += int(error)
+        st.seconds += seconds
+        st.bytes += size
+        st.tokens += tokens
+        st.samples.append(seconds)
+        due = _metrics_exporting and now - _metrics_last_export >= CONFIG.get("METRICS_EXPORT_INTERVAL", 10)
+        if due: _metrics_last_export = now
+    if due: export_metrics()
+
+class StageTimer:
+    """`with measure("suche") as m: ...` - Dauer/Fehler automatisch, m.size und m.tokens optional."""
+
+    def __init__(self, stage, size=0, tokens=0):
+        self.stage, self.size, self.tokens = stage, size, tokens
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        error = exc_type is not None and not issubclass(exc_type, KeyboardInterrupt)
+        record_metric(self.stage, time.perf_counter() - self.start, self.size, self.tokens, error)
+        return False
+
+def measure(stage, size=0, tokens=0):
+    return StageTimer(stage, size, tokens)
+
+def reset_metrics():
+    with _metrics_lock:
+        _metrics.clear()
+
+def set_metrics_export(active):
+    """Laufende Ausgabe nach METRICS_FILE/METRICS_PROM_FILE an- bzw. abschalten (erster Export nach einem Intervall)."""
+    global _metrics_last_export, _metrics_exporting
+    with _metrics_lock:
+        _metrics_exporting = active
+        _metrics_last_export = time.time()
+
+def metrics_snapshot():
+    with _metrics_lock:
+        return {stage: {
+            "count": st.count, "errors": st.errors, "seconds_total": round(st.seconds, 4),
+            "p50": round(st.percentile(0.50), 5), "p95": round(st.percentile(0.95), 5), "p99": round(st.percentile(0.99), 5),
+            "bytes_total": st.bytes, "tokens_total": st.tokens,
+        } for stage, st in sorted(_metrics.items())}
+
+def _write_atomic(path, text):
+    tmp = f"{path}.tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        f.write(text)
+    os.replace(tmp, path)
+
+def export_metrics():
+    """Schreibt den aktuellen Stand als JSON und im Prometheus-Textformat (für node_exporter textfile o.ä.)."""
+    snap = metrics_snapshot()
+    lines = ["# TYPE school_miner_stage_seconds summary"]
+    for stage, m in snap.items():
+        for q, key in (("0.5", "p50"), ("0.95", "p95"), ("0.99", "p99")):
+            lines.append(f'school_miner_stage_seconds{{stage="{stage}",quantile="{q}"}} {m[key]}')
+        lines.append(f'school_miner_stage_seconds_sum{{stage="{stage}"}} {m["seconds_total"]}')
+        lines.append(f'school_miner_stage_seconds_count{{stage="{stage}"}} {m["count"]}')
+    for name, field in (("errors", "errors"), ("bytes", "bytes_total"), ("tokens", "tokens_total")):
+        lines.append(f"# TYPE school_miner_stage_{name}_total counter")
+        lines += [f'school_miner_stage_{name}_total{{stage="{stage}"}} {m[field]}' for stage, m in snap.items()]
+    try:
+        _write_atomic(CONFIG.get("METRICS_FILE", "metrics.json"),
+                      json.dumps({"updated": time.time(), "stages": snap}, indent=2, ensure_ascii=False))
+        _write_atomic(CONFIG.get("METRICS_PROM_FILE", "metrics.prom"), "\n".join(lines) + "\n")
+    except OSError as e:
+        logging.error(f"Metriken konnten nicht geschrieben werden: {e}")
+
+def print_metrics_summary():
+    snap = metrics_snapshot()
+    if not snap: return
+    export_metrics()
+    print("\n⏱️ ZEIT PRO STUFE")
+    print(f"   {'Stufe':<20} {'Anzahl':>7} {'Fehler':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'Summe s':>9} {'Text KB':>9} {'Tokens':>9}")
+    for stage, m in snap.items():
+        print(f"   {stage:<20} {m['count']:>7} {m['errors']:>6} {m['p50'] * 1000:>9.1f} {m['p95'] * 1000:>9.1f} {m['p99'] * 1000:>9.1f} "
+              f"{m['seconds_total']:>9.1f} {m['bytes_total'] / 1024:>9.0f} {m['tokens_total']:>9}")
+
+# --- KASSETTEN (Aufnahme/Wiedergabe aller externen Antworten) ---
+# CASSETTE_MODE="record" schneidet Suchtreffer, Seiten, Sitemaps, KI-Antworten und Geocoding
+# pro Schule in CASSETTE_DIR mit (gzip-JSON). "replay" spielt sie ohne Netzwerk, Browser oder
+# API-Keys wieder ab - deterministisch, mit CASSETTE_TIME_SCALE als Zeitraffer.
+# Aufgenommen wird oberhalb der lokalen Caches, damit die Wiedergabe nicht von deren Stand abhängt.
+
+CASSETTE_MISS_DEFAULTS = {"suche": [], "seite": ("", "", []), "datei": None, "erreichbar": False, "ki": "KI-Fehler", "geo": None}
+CASSETTE_GENERAL = "_allgemein" # Aufnahmen, die keiner Schule zugeordnet werden können
+
+_cassette_lock = threading.Lock()
+_cassette_local = threading.local()
+_cassette_tapes = {} # Schule -> aufgenommene Interaktionen
+_cassette_dirty = set()
+_cassette_ctx_school = {} # Hash des KI-Kontexts -> Schule, aus der er stammt
+_cassette_index = None # Wiedergabe: (art, schlüssel) -> deque[(antwort, sekunden)]
+cassette_stats = {"recorded": 0, "replayed": 0, "misses": 0}
+
+def cassette_mode():
+    mode = str(CONFIG.get("CASSETTE_MODE", "off")).lower()
+    return mode if mode in ("record", "replay") else None
+
+def cassette_hash(text):
+    return hashlib.sha256(str(text).encode("utf-8")).hexdigest()[:24]
+
+def cassette_school_label(name, ort):
+    return f"{' '.join(str(name).split())}|{' '.join(str(ort).split())}"
+
+def cassette_file(school):
+    slug = re.sub(r"\W+", "-", school.lower()).strip("-")[:40] or "schule"
+    return os.path.join(CONFIG.get("CASSETTE_DIR", "cassettes"), f"{slug}_{cassette_hash(school)[:8]}.json.gz")
+
+class cassette_school:
+    """Ordnet alle Aufnahmen im Block (im aktuellen Thread) einer Schule zu."""
+    def __init__(self, name, ort):
+        self.school = cassette_school_label(name, ort)
+
+    def __enter__(self):
+        self.previous = getattr(_cassette_local, "school", None)
+        _cassette_local.school = self.school
+        return self
+
+    def __exit__(self, *exc):
+        _cassette_local.school = self.previous
+        return False
+
+def cassette_owns_context(ctx):
+    """Merkt sich, zu welcher Schule ein KI-Kontext gehört (die KI läuft oft in einem anderen Thread/Batch)."""
+    school = getattr(_cassette_local, "school", None)
+    if ctx and school and cassette_mode() == "record":
+        with _cassette_lock:
+            _cassette_ctx_school[cassette_hash(ctx)] = school
+
+def cassette_record(kind, key, result, seconds, school=None):
+    school = school or getattr(_cassette_local, "school", None) or CASSETTE_GENERAL
+    with _cassette_lock:
+        _cassette_tapes.setdefault(school, []).append({"kind": kind, "key": key, "seconds": round(seconds, 4), "result": result})
+        _cassette_dirty.add(school)
+        cassette_stats["recorded"] += 1
+
+def save_cassettes():
+    """Schreibt alle geänderten Kassetten (atomar, gzip). Wird nach jeder gespeicherten Schule aufgerufen."""
+    import gzip
+    with _cassette_lock:
+        pending = {school: list(_cassette_tapes[school]) for school in _cassette_dirty}
+        _cassette_dirty.clear()
+    if not pending: return
+    os.makedirs(CONFIG.get("CASSETTE_DIR", "cassettes"), exist_ok=True)
+    for school, tape in pending.items():
+        path = cassette_file(school)
+        payload = json.dumps({"version": 1, "school": school, "interactions": tape}, ensure_ascii=False).encode("utf-8")
+        try:
+            with open(f"{path}.tmp", "wb") as f:
+                f.write(gzip.compress(payload, compresslevel=6))
+            os.replace(f"{path}.tmp", path)
+        except OSError as e:
+            logging.error(f"Kassette konnte nicht geschrieben werden ({path}): {e}")
+
+def load_cassette_index():
+    """Liest alle Kassetten aus CASSETTE_DIR; gleiche Anfragen werden in Aufnahme-Reihenfolge abgespielt."""
+    import gzip
+    global _cassette_index
+    with _cassette_lock:
+        if _cassette_index is not None: return _cassette_index
+        index = {}
+        folder = CONFIG.get("CASSETTE_DIR", "cassettes")
+        files = sorted(f for f in os.listdir(folder) if f.endswith(".json.gz")) if os.path.isdir(folder) else []
+        for name in files:
+            try:
+                with open(os.path.join(folder, name), "rb") as f:
+                    tape = json.loads(gzip.decompress(f.read()))
+            except (OSError, ValueError) as e:
+                logging.error(f"Kassette {name} nicht lesbar: {e}")
+                continue
+            for item in tape.get("interactions", []):
+                index.setdefault((item["kind"], item["key"]), collections.deque()).append((item["result"], item.get("seconds", 0.0)))
+        print(f"   📼 Wiedergabe: {len(files)} Kassetten, {sum(len(v) for v in index.values())} Antworten aus '{folder}'")
+        _cassette_index = index
+        return index
+
+def cassette_replay(kind, key):
+    index = load_cassette_index()
+    with _cassette_lock:
+        answers = index.get((kind, key))
+        if not answers:
+            cassette_stats["misses"] += 1
+            logging.warning(f"Kassette: keine Aufnahme für {kind} {key}")
+            return CASSETTE_MISS_DEFAULTS.get(kind)
+        # Die letzte Aufnahme bleibt liegen, falls dieselbe Anfrage öfter kommt als bei der Aufnahme
+        result, seconds = answers.popleft() if len(answers) > 1 else answers[0]
+        cassette_stats["replayed"] += 1
+    scale = float(CONFIG.get("CASSETTE_TIME_SCALE", 0.0))
+    if scale > 0 and seconds: time.sleep(seconds * scale)
+    return result
+
+def cassette(kind, key, fn, *args, school=None):
+    """
+    Externer Aufruf fn(*args) mit Kassetten-Unterstützung: normal durchreichen,
+    bei "record" zusätzlich Antwort + Dauer mitschneiden, bei "replay" nur abspielen.
+    """
+    mode = cassette_mode()
+    if mode == "replay": return cassette_replay(kind, key)
+    if mode is None: return fn(*args)
+    t0 = time.perf_counter()
+    result = fn(*args)
+    cassette_record(kind, key, result, time.perf_counter() - t0, school)
+    return result
+
+def print_cassette_stats():
+    if not cassette_mode(): return
+    save_cassettes()
+    s = cassette_stats
+    print(f"📼 Kassetten: {s['recorded']} aufgenommen, {s['replayed']} abgespielt, {s['misses']} ohne Aufnahme")
+
+class ReplayDriver:
+    """Platzhalter-Browser für die Wiedergabe: alle Seiten kommen aus den Kassetten."""
+    def get(self, url): pass
+    def execute_script(self, *args): return 1
+    def quit(self): pass
+
 def open_browser_search(query):
     """
     Versucht, Chrome/Chromium zu öffnen (Linux/Windows).
@@ -127,16 +443,26 @@ keys = {
     "groq": os.getenv("GROQ_API_KEY")
 }
 status_flags = {k: bool(v) for k, v in keys.items()}
-
-if status_flags["gemini"]: clients["gemini"] = genai.Client(api_key=keys["gemini"])
-if status_flags["openai"]: clients["openai"] = OpenAI(api_key=keys["openai"])
-if status_flags["groq"]: clients["groq"] = OpenAI(base_url="https://api.groq.com/openai/v1", api_key=keys["groq"])
-if status_flags["openrouter"]:
-    clients["openrouter"] = OpenAI(
-        base_url="https://openrouter.ai/api/v1", 
-        api_key=keys["openrouter"],
-        default_headers={"HTTP-Referer": "https://github.com/schul-scanner", "X-Title": "Schul-Scanner"}
-    )
+_clients_lock = threading.Lock()
+
+def get_client(provider):
+    """Baut den API-Client erst bei der ersten Anfrage (inkl. Import des SDKs)."""
+    with _clients_lock:
+        if provider not in clients:
+            if provider == "gemini":
+                from google import genai
+                clients["gemini"] = genai.Client(api_key=keys["gemini"])
+            else:
+                from openai import OpenAI
+                if provider == "openai": clients["openai"] = OpenAI(api_key=keys["openai"])
+                elif provider == "groq": clients["groq"] = OpenAI(base_url="https://api.groq.com/openai/v1", api_key=keys["groq"])
+                elif provider == "openrouter":
+                    clients["openrouter"] = OpenAI(
+                        base_url="https://openrouter.ai/api/v1", 
+                        api_key=keys["openrouter"],
+                        default_headers={"HTTP-Referer": "https://github.com/schul-scanner", "X-Title": "Schul-Scanner"}
+                    )
+        return clients[provider]
 
 def print_system_status():
     print("\n🔌 SYSTEM-CHECK API KEYS:")
@@ -147,7 +473,35 @@ def print_system_status():
 
 # --- SELENIUM DRIVER ---
 
+# BROWSER_PROFILE "lean": Diese Anfragen lädt Chrome gar nicht erst (Bilder, Medien, Schriften, Tracker).
+# CSS bleibt erlaubt, sonst stimmt der sichtbare Text nicht mehr.
+BLOCKED_URL_PATTERNS = [
+    "*.jpg", "*.jpeg", "*.png", "*.gif", "*.webp", "*.avif", "*.svg", "*.ico", "*.bmp",
+    "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot",
+    "*.mp4", "*.webm", "*.ogg", "*.mp3", "*.wav", "*.m4a", "*.mov",
+    "*google-analytics.com*", "*googletagmanager.com*", "*doubleclick.net*", "*googlesyndication.com*",
+    "*facebook.net*", "*connect.facebook.com*", "*hotjar.com*", "*clarity.ms*", "*matomo.js*", "*piwik.js*",
+    "*etracker.com*", "*youtube.com/embed*", "*youtube-nocookie.com*", "*player.vimeo.com*",
+    "*maps.googleapis.com*", "*fonts.googleapis.com*", "*fonts.gstatic.com*", "*cookiebot.com*", "*usercentrics.eu*",
+]
+
+def lean_profile():
+    return CONFIG.get("BROWSER_PROFILE", "lean") == "lean"
+
+def apply_lean_profile(driver):
+    """Blockiert Bilder/Medien/Schriften/Tracker per CDP für die ganze Browser-Sitzung."""
+    try:
+        driver.execute_cdp_cmd("Network.enable", {})
+        driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URL_PATTERNS})
+    except Exception as e:
+        print(f"   ⚠️ Ressourcen-Blockierung nicht verfügbar ({e}), lade Seiten komplett.")
+
 def get_driver(headless=True):
+    if cassette_mode() == "replay": return ReplayDriver()
+    from selenium import webdriver
+    from selenium.webdriver.chrome.service import Service
+    from selenium.webdriver.chrome.options import Options
+    from webdriver_manager.chrome import ChromeDriverManager
     
     is_headless = CONFIG.get("HEADLESS", True)
     
@@ -166,7 +520,7 @@ def get_driver(headless=True):
     chrome_options.add_argument("--window-size=1920,1080")
     # Unterdrückt unnötige USB-Fehlermeldungen in der Konsole
     chrome_options.add_argument("--log-level=3") 
-    chrome_options.add_argument("user-agent=Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36")
+    chrome_options.add_argument(f"user-agent={USER_AGENT}")
     
     # DOWNLOADS KOMPLETT BLOCKIEREN 
     prefs = {
@@ -174,55 +528,194 @@ def get_driver(headless=True):
         "download.prompt_for_download": False,   # Verhindert Pop-ups
         "plugins.always_open_pdf_externally": False # Verhindert, dass PDFs an externe Viewer geschickt werden
     }
+    if lean_profile():
+        # get() wartet nur auf das DOM, nicht auf jedes Bild/Iframe (den Rest erledigt wait_until_ready)
+        chrome_options.page_load_strategy = "eager"
+        prefs["profile.managed_default_content_settings.images"] = 2
     chrome_options.add_experimental_option("prefs", prefs)
     
     driver = None
+    driver_path = None
+    
+    # --- VERSUCH 0: Gemerkter Treiber-Pfad (ohne Netzwerk-Abfrage) ---
+    cached_path = CONFIG.get("CHROMEDRIVER_PATH", "")
+    if cached_path and os.path.exists(cached_path):
+        try:
+            driver = webdriver.Chrome(service=Service(executable_path=cached_path), options=chrome_options)
+            driver_path = cached_path
+        except Exception:
+            # z.B. Chrome wurde aktualisiert und der Treiber passt nicht mehr -> neu ermitteln
+            print("   ♻️ Gemerkter Chrome-Treiber passt nicht mehr, suche neu...")
     
     # --- VERSUCH 1: Automatisch (Standard für Windows/Mac) ---
-    try:
-        # Versucht, den Treiber passend zum installierten Chrome herunterzuladen
-        service = Service(ChromeDriverManager().install())
-        driver = webdriver.Chrome(service=service, options=chrome_options)
-    except Exception as e_auto:
-        # --- VERSUCH 2: System-Pfad (Fallback für Linux) ---
-        
+    if driver is None:
         try:
-            # Liste typischer Pfade auf Linux
-            paths = [
-            "/usr/bin/chromedriver",
-            "/usr/lib/chromium-browser/chromedriver",
-            "/usr/lib/chromium/chromedriver", # Alternative für manche Distributionen
-            "/snap/bin/chromium.chromedriver"
-            "/usr/bin/chromium-browser"
-            ]
-            
-            found = next((p for p in paths if os.path.exists(p)), None)
+            # Versucht, den Treiber passend zum installierten Chrome herunterzuladen
+            driver_path = ChromeDriverManager().install()
+            driver = webdriver.Chrome(service=Service(driver_path), options=chrome_options)
+        except Exception as e_auto:
+            # --- VERSUCH 2: System-Pfad (Fallback für Linux) ---
             
-            if found:
-                service = Service(executable_path=found)
-                driver = webdriver.Chrome(service=service, options=chrome_options)
-            else:
-                # Letzter Versuch: 'chromedriver' im globalen PATH ?
-                driver = webdriver.Chrome(options=chrome_options)
+            try:
+                # Liste typischer Pfade auf Linux
+                paths = [
+                "/usr/bin/chromedriver",
+                "/usr/lib/chromium-browser/chromedriver",
+                "/usr/lib/chromium/chromedriver", # Alternative für manche Distributionen
+                "/snap/bin/chromium.chromedriver"
+                "/usr/bin/chromium-browser"
+                ]
                 
-        except Exception as e_sys:
-            print("\n\n❌ FEHLER: Konnte keinen Chrome-Treiber starten.")
-            print("   Bitte sicherstellen, dass Google Chrome oder Chromium installiert ist.")
-            print(f"   Fehler Auto-Mode: {e_auto}")
-            print(f"   Fehler System-Mode: {e_sys}")
-            print("\n   Tipp für Raspberry Pi: 'sudo apt install chromium-chromedriver'")
-            return None
+                driver_path = next((p for p in paths if os.path.exists(p)), None)
+                
+                if driver_path:
+                    service = Service(executable_path=driver_path)
+                    driver = webdriver.Chrome(service=service, options=chrome_options)
+                else:
+                    # Letzter Versuch: 'chromedriver' im globalen PATH ?
+                    driver = webdriver.Chrome(options=chrome_options)
+                    driver_path = getattr(driver.service, "path", None)
+                    
+            except Exception as e_sys:
+                print("\n\n❌ FEHLER: Konnte keinen Chrome-Treiber starten.")
+                print("   Bitte sicherstellen, dass Google Chrome oder Chromium installiert ist.")
+                print(f"   Fehler Auto-Mode: {e_auto}")
+                print(f"   Fehler System-Mode: {e_sys}")
+                print("\n   Tipp für Raspberry Pi: 'sudo apt install chromium-chromedriver'")
+                return None
+
+    # Funktionierenden Pfad merken -> nächster Start ohne Download-Check
+    if driver and driver_path and os.path.exists(driver_path) and driver_path != cached_path:
+        CONFIG["CHROMEDRIVER_PATH"] = driver_path
+        save_config_to_file(CONFIG)
 
     if driver:
         driver.set_page_load_timeout(20) # 20 Sek Timeout
+        if lean_profile(): apply_lean_profile(driver)
         print("   ✅ Browser-Engine bereit.   ")
         
     return driver
 
+# Ein Browser für die ganze Programmlaufzeit (Menüaktionen teilen ihn sich)
+_shared_driver = None
+_shared_driver_lock = threading.Lock()
+
+def driver_alive(driver):
+    """Health-Check: antwortet die Browser-Sitzung noch?"""
+    try:
+        driver.execute_script("return 1")
+        return True
+    except Exception:
+        return False
+
+def quit_driver(driver):
+    try: driver.quit()
+    except Exception: pass
+
+def get_shared_driver():
+    """Liefert den gemeinsamen Browser; ist er abgestürzt oder geschlossen, wird er neu gestartet."""
+    global _shared_driver
+    with _shared_driver_lock:
+        if _shared_driver is not None and not driver_alive(_shared_driver):
+            print("   ♻️ Browser reagiert nicht mehr, starte neu...")
+            quit_driver(_shared_driver)
+            _shared_driver = None
+        if _shared_driver is None:
+            _shared_driver = get_driver()
+        return _shared_driver
+
+def close_shared_driver():
+    global _shared_driver
+    with _shared_driver_lock:
+        if _shared_driver is not None:
+            quit_driver(_shared_driver)
+            _shared_driver = None
+
+def prewarm_shared_driver():
+    """Startet den Browser im Hintergrund, während das Menü schon bedienbar ist (BROWSER_PREWARM)."""
+    threading.Thread(target=get_shared_driver, name="browser-prewarm", daemon=True).start()
+
+def borrow_drivers(count):
+    """Browser für die Parallel-Modi: der gemeinsame plus (count - 1) zusätzliche."""
+    return [d for d in [get_shared_driver()] + [get_driver() for _ in range(count - 1)] if d]
+
+def revive_driver(driver):
+    """
+    Health-Check vor jeder Schule: get_selenium_content schluckt WebDriver-Fehler,
+    ein abgestürzter Browser fällt also nur hier auf. Der gemeinsame wird über
+    get_shared_driver neu gestartet, ein Pool-Browser durch einen neuen ersetzt.
+    """
+    if driver is None: return None # ohne Browser gestartet -> bleibt bei reinem HTTP
+    if driver is _shared_driver: return get_shared_driver()
+    if driver_alive(driver): return driver
+    print("   ♻️ Browser reagiert nicht mehr, starte neu...")
+    quit_driver(driver)
+    return get_driver()
+
+def release_drivers(drivers):
+    """Schließt die zusätzlichen Browser; der gemeinsame bleibt für die nächste Aktion offen."""
+    for d in drivers:
+        if d is not _shared_driver: quit_driver(d)
+
 # --- DATA MANAGEMENT ---
 
-def load_data():
+# Ergebnisse liegen in einer SQLite-Datenbank (WAL-Modus). Jede fertige Schule wird
+# einzeln per Upsert gespeichert; die Excel-Datei ist nur noch ein Export.
+
+_result_db = None
+_result_db_lock = threading.Lock()
+
+def get_result_db():
+    global _result_db
+    if _result_db is None:
+        conn = sqlite3.connect(CONFIG.get("RESULT_DB_FILE", "schulen_ergebnisse.sqlite"), check_same_thread=False, timeout=30)
+        # WAL ist am schnellsten, funktioniert aber nicht auf Netzlaufwerken (dort "DELETE" eintragen)
+        conn.execute(f"PRAGMA journal_mode={CONFIG.get('RESULT_DB_JOURNAL_MODE', 'WAL')}")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS schulen (
+                key_name TEXT NOT NULL,
+                key_ort TEXT NOT NULL,
+                pos INTEGER NOT NULL,
+                data TEXT NOT NULL,
+                updated REAL NOT NULL,
+                PRIMARY KEY (key_name, key_ort)
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS schulen_pos ON schulen (pos)")
+        # Arbeitswarteschlange für mehrere Prozesse/Rechner (siehe run_auto_scan_queue)
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS work (
+                key_name TEXT NOT NULL,
+                key_ort TEXT NOT NULL,
+                owner TEXT,
+                expires REAL NOT NULL DEFAULT 0,
+                attempted REAL,
+                PRIMARY KEY (key_name, key_ort)
+            )
+        """)
+        conn.commit()
+        _result_db = conn
+    return _result_db
+
+def entry_key(entry):
+    """Composite Key (Name + Ort), wie beim Sync."""
+    return str(entry.get('schulname', '')).strip().lower(), str(entry.get('ort', '')).strip().lower()
+
+def _entry_row(entry, pos):
+    return (*entry_key(entry), pos, json.dumps(entry, ensure_ascii=False, default=str), time.time())
+
+UPSERT_SQL = """
+    INSERT INTO schulen (key_name, key_ort, pos, data, updated) VALUES (?, ?, ?, ?, ?)
+    ON CONFLICT (key_name, key_ort) DO UPDATE SET pos = excluded.pos, data = excluded.data, updated = excluded.updated
+"""
+
+def load_excel_data():
+    """Liest die (alte) Excel-Ergebnisdatei, notfalls das Backup."""
     data = []
+    if not os.path.exists(CONFIG["OUTPUT_FILE"]) and not os.path.exists(CONFIG["OUTPUT_FILE"] + ".bak"):
+        return data
+    import pandas as pd
     # Versuch 1: Hauptdatei laden
     if os.path.exists(CONFIG["OUTPUT_FILE"]):
         try: 
@@ -241,7 +734,72 @@ def load_data():
 
     return data
 
+def renumber_positions(conn):
+    """
+    Setzt pos lückenlos auf 0..n-1 (Reihenfolge bleibt). Nach dem Zusammenfassen doppelter
+    Einträge entstehen sonst Lücken - und später über save_entry(entry, i) doppelte pos-Werte,
+    wodurch AUTO_RESUME_IDX/MANUAL_RESUME_IDX auf falsche Zeilen zeigen.
+    """
+    count, distinct, low, high = conn.execute("SELECT COUNT(*), COUNT(DISTINCT pos), MIN(pos), MAX(pos) FROM schulen").fetchone()
+    if not count or (distinct == count and low == 0 and high == count - 1): return
+    rows = conn.execute("SELECT rowid FROM schulen ORDER BY pos, rowid").fetchall()
+    conn.executemany("UPDATE schulen SET pos = ? WHERE rowid = ?", [(n, rowid) for n, (rowid,) in enumerate(rows)])
+
+def load_data():
+    with _result_db_lock:
+        conn = get_result_db()
+        with conn:
+            renumber_positions(conn) # heilt auch ältere Datenbanken mit Lücken/doppelten Positionen
+        rows = conn.execute("SELECT data FROM schulen ORDER BY pos").fetchall()
+    if rows:
+        return [json.loads(r[0]) for r in rows]
+
+    # Erster Start mit der Datenbank: vorhandene Excel-Ergebnisse übernehmen
+    data = load_excel_data()
+    if data:
+        print(f"📦 Übernehme {len(data)} Einträge aus '{CONFIG['OUTPUT_FILE']}' in die Datenbank...")
+        save_data(data)
+        if len(set(entry_key(e) for e in data)) < len(data):
+            print("   ⚠️ Doppelte Einträge (gleicher Name + Ort) wurden zusammengefasst.")
+            data = load_data()
+    return data
+
 def save_data(data):
+    """Speichert die komplette Liste in EINER Transaktion (z.B. nach Sync oder Karte)."""
+    try:
+        with measure("speichern_alle"), _result_db_lock:
+            conn = get_result_db()
+            with conn:
+                conn.execute("DELETE FROM schulen")
+                conn.executemany(UPSERT_SQL, [_entry_row(e, pos) for pos, e in enumerate(data)])
+                renumber_positions(conn) # Doppelte (Name + Ort) wurden zusammengefasst -> Lücken schließen
+    except Exception as e:
+        print(f"❌ KRITISCHER FEHLER beim Speichern: {e}")
+
+def save_entry(entry, pos):
+    """Speichert eine einzelne Schule sofort (konstante Zeit, unabhängig von der Listengröße)."""
+    try:
+        with measure("speichern"), _result_db_lock:
+            conn = get_result_db()
+            with conn:
+                conn.execute(UPSERT_SQL, _entry_row(entry, pos))
+    except Exception as e:
+        print(f"❌ KRITISCHER FEHLER beim Speichern: {e}")
+    if cassette_mode() == "record": save_cassettes()
+
+def save_entries(entries):
+    """Speichert mehrere (pos, entry)-Paare in einer Transaktion, ohne die übrigen Zeilen anzufassen."""
+    try:
+        with measure("speichern"), _result_db_lock:
+            conn = get_result_db()
+            with conn:
+                conn.executemany(UPSERT_SQL, [_entry_row(e, pos) for pos, e in entries])
+    except Exception as e:
+        print(f"❌ KRITISCHER FEHLER beim Speichern: {e}")
+
+def export_excel(data):
+    """Schreibt die Ergebnisse als Excel-Datei (mit Backup der vorherigen Version)."""
+    print(f"📤 Exportiere {len(data)} Einträge nach '{CONFIG['OUTPUT_FILE']}'...")
     try:
         # 1. Sicherheits-Backup der alten Datei erstellen 
         if os.path.exists(CONFIG["OUTPUT_FILE"]):
@@ -250,14 +808,44 @@ def save_data(data):
             except: pass # Wenn Backup fehlschlägt, ist das kein Beinbruch
         
         # 2. Neue Datei schreiben
-        pd.DataFrame(data).to_excel(CONFIG["OUTPUT_FILE"], index=False)
+        import pandas as pd
+        with measure("excel_export"):
+            pd.DataFrame(data).to_excel(CONFIG["OUTPUT_FILE"], index=False)
+        print("✅ Excel-Export fertig.")
     except Exception as e:
-        print(f"❌ KRITISCHER FEHLER beim Speichern: {e}")
+        print(f"❌ Fehler beim Excel-Export: {e}")
         # Versuchen, wenigstens das Backup zurückzuspielen
         if os.path.exists(CONFIG["OUTPUT_FILE"] + ".bak"):
-            print("   -> Stelle alte Version wieder her, um Datenverlust zu minimieren.")
+            print("   -> Stelle alte Version wieder her.")
             shutil.copy(CONFIG["OUTPUT_FILE"] + ".bak", CONFIG["OUTPUT_FILE"])
 
+def read_source_columns(path, name_idx, ort_idx):
+    """
+    Liest NUR die Spalten Name und Ort aus der Input-Datei.
+    .xlsx wird im Read-Only-Modus zeilenweise gestreamt (kein kompletter DataFrame im Speicher),
+    andere Formate gehen über pandas mit usecols.
+    Leere Zellen werden wie früher zu 'nan'.
+    """
+    import pandas as pd
+    if path.lower().endswith((".xlsx", ".xlsm")):
+        from openpyxl import load_workbook
+        wb = load_workbook(path, read_only=True, data_only=True)
+        try:
+            ws = wb.worksheets[0]
+            names, orts = [], []
+            max_col = max(name_idx, ort_idx) + 1
+            for row in ws.iter_rows(max_col=max_col, values_only=True):
+                if len(row) < max_col: row = tuple(row) + (None,) * (max_col - len(row))
+                names.append(row[name_idx])
+                orts.append(row[ort_idx])
+        finally:
+            wb.close()
+        df = pd.DataFrame({"name": names, "ort": orts}, dtype=object)
+    else:
+        df = pd.read_excel(path, header=None, usecols=[name_idx, ort_idx], dtype=object)
+        df = df.rename(columns={name_idx: "name", ort_idx: "ort"})
+    return df.fillna("nan").astype(str)
+
 def sync_with_source(current_data):
     print("\n🔄 Sync mit Ursprungsdatei...")
     if not os.path.exists(CONFIG["INPUT_FILE"]): 
@@ -265,53 +853,42 @@ def sync_with_source(current_data):
         return current_data
         
     try:
-        df_raw = pd.read_excel(CONFIG["INPUT_FILE"], header=None)
-        
-        # Aktuelle Daten temporär in einen DataFrame wandeln
-        df_current = pd.DataFrame(current_data) if current_data else pd.DataFrame(columns=['schulname', 'ort', 'schultyp', 'keywords', 'webseite', 'ki_zusammenfassung'])
-        
-        # Composite Key (Name + Ort) aufbauen
-        if not df_current.empty:
-            existing_keys = set(zip(
-                df_current['schulname'].astype(str).str.strip().str.lower(),
-                df_current['ort'].astype(str).str.strip().str.lower()
-            ))
-        else:
-            existing_keys = set()
-            
-        new_rows = []
-        for _, row in df_raw.iterrows():
-            if len(row) <= max(CONFIG["COLUMN_NAME_IDX"], CONFIG["COLUMN_ORT_IDX"]): continue
-            
-            name = str(row[CONFIG["COLUMN_NAME_IDX"]]).strip()
-            ort = str(row[CONFIG["COLUMN_ORT_IDX"]]).strip()
-            
-            # Wir fangen 'nan' (leere Zellen) ab
-            if name.lower() == 'nan': continue
-            
-            key = (name.lower(), ort.lower())
-            
-            # KORREKTUR: "schule"-Zwang ist weg. Längenprüfung auf > 2 reduziert.
-            if len(name) > 2 and "=" not in name and key not in existing_keys:
-                new_rows.append({
-                    'schulname': name, 'ort': ort,
-                    'schultyp': "", 'keywords': "", 
-                    'webseite': "Nicht gefunden", 'ki_zusammenfassung': "Keine Daten"
-                })
-                existing_keys.add(key)
-                
-        # Zusammenführen via pd.concat
-        if new_rows:
-            df_new = pd.DataFrame(new_rows)
-            df_final = pd.concat([df_current, df_new], ignore_index=True)
-            
-            # Zurück in die Listen-Struktur für die weitere Verarbeitung schreiben
-            current_data.clear()
-            current_data.extend(df_final.to_dict('records'))
-            save_data(current_data)
-            print(f"✅ {len(new_rows)} neue Schulen angefügt.")
+        df = read_source_columns(CONFIG["INPUT_FILE"], CONFIG["COLUMN_NAME_IDX"], CONFIG["COLUMN_ORT_IDX"])
+        total = len(df)
+
+        # Composite Key (Name + Ort) vektorisiert aufbauen
+        df["name"] = df["name"].str.strip()
+        df["ort"] = df["ort"].str.strip()
+        df["key"] = df["name"].str.lower() + "\x00" + df["ort"].str.lower()
+
+        # Wir fangen 'nan' (leere Zellen) ab. Kein "schule"-Zwang, Länge > 2, keine Formeln.
+        valid = (df["name"].str.lower() != "nan") & (df["name"].str.len() > 2) & ~df["name"].str.contains("=", regex=False)
+        df = df[valid]
+
+        # Anti-Join gegen die bereits vorhandenen Ergebnisse
+        existing_keys = set(f"{n}\x00{o}" for n, o in (entry_key(e) for e in current_data))
+        is_existing = df["key"].isin(existing_keys)
+        is_dup_in_source = df["key"].duplicated()
+        df_new = df[~is_existing & ~is_dup_in_source]
+
+        added = len(df_new)
+        skipped = total - len(df)
+        duplicates = len(df) - added
+
+        if added:
+            # Nur die neuen Zeilen anhängen und speichern, bestehende bleiben unberührt
+            start = len(current_data)
+            new_rows = [{
+                'schulname': name, 'ort': ort,
+                'schultyp': "", 'keywords': "", 
+                'webseite': "Nicht gefunden", 'ki_zusammenfassung': "Keine Daten"
+            } for name, ort in zip(df_new["name"], df_new["ort"])]
+            current_data.extend(new_rows)
+            save_entries((start + k, e) for k, e in enumerate(new_rows))
+            print(f"✅ {added} neue Schulen angefügt.")
         else:
             print("ℹ️ Keine neuen Einträge gefunden.")
+        print(f"   📊 {total} Zeilen gelesen: {added} neu, {duplicates} schon vorhanden/doppelt, {skipped} übersprungen (leer/ungültig).")
             
     except Exception as e: 
         print(f"❌ Sync-Fehler: {e}")
@@ -320,177 +897,778 @@ def sync_with_source(current_data):
 
 # --- CRAWLER LOGIC ---
 
+SEARCH_BLOCKLIST = ["wikipedia.org", "facebook.com", "instagram.com"]
+
+_search_cache = None
+_search_cache_lock = threading.Lock()
+_search_local = threading.local()
+
+def get_search_cache():
+    """Persistenter Cache Suchanfrage -> Trefferliste (SQLite), läuft nach SEARCH_CACHE_TTL_DAYS ab."""
+    global _search_cache
+    if _search_cache is None:
+        conn = sqlite3.connect(CONFIG.get("SEARCH_CACHE_FILE", "search_cache.sqlite"), check_same_thread=False, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS searches (
+                query TEXT PRIMARY KEY,
+                results TEXT NOT NULL,
+                created REAL NOT NULL
+            )
+        """)
+        conn.commit()
+        _search_cache = conn
+    return _search_cache
+
+def search_key(query):
+    return " ".join(str(query).lower().split())
+
+def search_cache_get(query):
+    max_age = CONFIG.get("SEARCH_CACHE_TTL_DAYS", 30) * 86400
+    with _search_cache_lock:
+        row = get_search_cache().execute("SELECT results, created FROM searches WHERE query = ?", (search_key(query),)).fetchone()
+    if row and time.time() - row[1] < max_age:
+        return json.loads(row[0])
+    return None
+
+def search_cache_put(query, hrefs):
+    with _search_cache_lock:
+        conn = get_search_cache()
+        with conn:
+            conn.execute("INSERT OR REPLACE INTO searches (query, results, created) VALUES (?, ?, ?)",
+                         (search_key(query), json.dumps(hrefs), time.time()))
+
+def get_search_session():
+    """Eine DDGS-Instanz pro Thread, die über alle Suchen hinweg wiederverwendet wird."""
+    ddgs = getattr(_search_local, "ddgs", None)
+    if ddgs is None:
+        from ddgs import DDGS
+        ddgs = DDGS()
+        _search_local.ddgs = ddgs
+    return ddgs
+
+def is_search_rate_limit(e):
+    from ddgs.exceptions import RatelimitException
+    return isinstance(e, RatelimitException) or "ratelimit" in str(e).lower() or "429" in str(e)
+
+def search_backoff(attempt, rate_limited):
+    """Exponentielles Backoff mit Jitter; nach einem Rate-Limit deutlich länger."""
+    base = CONFIG.get("SEARCH_RATELIMIT_BACKOFF", 10.0) if rate_limited else CONFIG.get("SEARCH_BACKOFF", 1.0)
+    return random.uniform(0.5, 1.0) * base * (2 ** attempt)
+
+def first_allowed_url(hrefs):
+    return next((u for u in hrefs if not any(b in u for b in SEARCH_BLOCKLIST)), None)
+
 def search_ddg_robust(query, max_retries=3):
-    """Sucht URL. Filtert Wikipedia explizit raus."""
+    """Sucht URL. Filtert Wikipedia explizit raus. Treffer kommen bevorzugt aus dem Such-Cache."""
+    return first_allowed_url(cassette("suche", search_key(query), search_hrefs, query, max_retries))
+
+def search_hrefs(query, max_retries=3):
+    """Trefferliste (URLs) zur Suchanfrage, aus dem Such-Cache oder live von DuckDuckGo."""
+    cached = search_cache_get(query)
+    if cached:
+        record_metric("suche_cache", 0.0)
+        return cached
+
     for attempt in range(max_retries):
         try:
-            with DDGS() as ddgs:
-                results = list(ddgs.text(query, region='de-de', max_results=5, backend="api"))
-            
-            for res in results:
-                url = res['href']
-                # FILTER
-                if "wikipedia.org" in url or "facebook.com" in url or "instagram.com" in url:
-                    continue
-                return url
-        except: time.sleep(1.5)
-    return None
+            with measure("suche"):
+                results = list(get_search_session().text(query, region='de-de', max_results=5, backend="api"))
+            hrefs = [res['href'] for res in results if res.get('href')]
+            if hrefs: search_cache_put(query, hrefs)
+            return hrefs
+        except Exception as e:
+            rate_limited = is_search_rate_limit(e)
+            if not rate_limited: _search_local.ddgs = None # Session evtl. kaputt -> neu aufbauen
+            if attempt + 1 < max_retries:
+                time.sleep(search_backoff(attempt, rate_limited))
+    return []
+
+# Scrollt nach unten (Lazy-Loading) und meldet sich, sobald das DOM BROWSER_QUIET_MS lang
+# unverändert war und das Dokument geparst ist - spätestens aber nach WAIT_TIME.
+READY_SCRIPT = """
+const done = arguments[arguments.length - 1];
+const quietMs = arguments[0], deadline = Date.now() + arguments[1];
+let last = Date.now();
+const obs = new MutationObserver(() => { last = Date.now(); });
+obs.observe(document.documentElement || document, {childList: true, subtree: true, characterData: true});
+if (document.body) window.scrollTo(0, document.body.scrollHeight);
+(function check() {
+    const now = Date.now();
+    if ((document.readyState !== "loading" && now - last >= quietMs) || now >= deadline) {
+        obs.disconnect();
+        done(document.readyState);
+    } else setTimeout(check, 50);
+})();
+"""
+
+def wait_until_ready(driver, wait_time):
+    """Adaptive Wartezeit statt fester Pausen: schnelle Seiten sind nach wenigen 100 ms fertig."""
+    try:
+        driver.execute_async_script(READY_SCRIPT, CONFIG.get("BROWSER_QUIET_MS", 300), int(wait_time * 1000))
+    except Exception:
+        time.sleep(wait_time / 2) # z.B. Script-Timeout -> wie früher einfach kurz warten
+
+# Titel, Seitentext ohne Navigation/Footer und alle Links in EINEM WebDriver-Aufruf
+# (statt 2-3 Round-Trips pro <a>). textContent liest auch eingeklappte Dropdown-Menüs.
+EXTRACT_SCRIPT = """
+const body = document.body;
+if (!body) return {title: document.title, text: "", links: []};
+const seen = new Set(), links = [];
+for (const a of body.querySelectorAll("a[href]")) {
+    // SVG-<a> liefern für a.href ein SVGAnimatedString -> Attribut lesen und selbst auflösen
+    let href;
+    try { href = new URL(a.getAttribute("href"), document.baseURI).href; } catch (e) { continue; }
+    if (/^(javascript|mailto|tel):/i.test(href)) continue;
+    const text = (a.textContent || a.innerText || "").replace(/\\s+/g, " ").trim().toLowerCase();
+    const key = href + "\\n" + text;
+    if (!text || seen.has(key)) continue;
+    seen.add(key);
+    links.push([href, text]);
+}
+const hidden = [];
+for (const el of body.querySelectorAll("nav, footer, [role=navigation], [role=contentinfo]")) {
+    hidden.push([el, el.style.display]);
+    el.style.display = "none";
+}
+let text = body.innerText;
+for (const [el, display] of hidden) el.style.display = display;
+if (!text.trim()) text = body.innerText;
+return {title: document.title, text: text, links: links};
+"""
 
 def get_selenium_content(driver, url, wait_time=2.0):
     """Lädt die Seite, scrollt für Lazy-Loading und extrahiert Text/Links (auch versteckte!)."""
     try:
         driver.get(url)
-        time.sleep(wait_time / 2)
-        driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
-        time.sleep(wait_time / 2)
-        
-        title = driver.title
-        body_text = driver.find_element(By.TAG_NAME, "body").text
-        
-        kombinierter_text = f"{title}\n\n{body_text}"
+        if lean_profile():
+            wait_until_ready(driver, wait_time)
+        else:
+            time.sleep(wait_time / 2)
+            driver.execute_script("window.scrollTo(0, document.body.scrollHeight);")
+            time.sleep(wait_time / 2)
         
-        links = []
+        page = driver.execute_script(EXTRACT_SCRIPT) or {}
+        title = page.get("title") or ""
+        kombinierter_text = f"{title}\n\n{page.get('text') or ''}"
+        links = [(href, text) for href, text in page.get("links") or []]
         
-        for elem in driver.find_elements(By.TAG_NAME, "a"):
-            try: 
-                href = elem.get_attribute("href")
-                
-                #  textContent liest auch eingeklappte Dropdown-Menüs!
-                link_text = elem.get_attribute("textContent")
-                
-                # alls textContent unerwartet leer ist
-                if not link_text:
-                    link_text = elem.text
-                    
-                if href and link_text: 
-                    # keine Leerzeichen/Zeilenumbrüchen
-                    clean_text = " ".join(link_text.split()).lower()
-                    links.append((href, clean_text))
-            except: 
-                continue
-                
-        return title, body, kombinierter_text, links
+        return title, kombinierter_text, links
     except Exception as e: 
         return "", "", []
 
+# --- SCHNELLER HTTP-ABRUF (ohne Browser) ---
+
+# Seiten, die ihren Inhalt erst per JavaScript erzeugen ("SPA-Hüllen")
+SPA_MARKERS = [
+    '<div id="root"></div>', '<div id="app"></div>', '<div id="__next">', "__NEXT_DATA__",
+    "ng-version=", "data-reactroot", "window.__NUXT__", "<noscript>you need to enable javascript",
+    "bitte aktivieren sie javascript", "please enable javascript"
+]
+
+# Tags, deren Inhalt nicht sichtbar ist
+INVISIBLE_TAGS = {"script", "style", "noscript", "template", "svg", "head", "iframe"}
+BLOCK_TAGS = {"p", "div", "br", "li", "ul", "ol", "tr", "td", "th", "h1", "h2", "h3", "h4", "h5", "h6",
+              "section", "article", "header", "footer", "nav", "main", "aside", "table", "form", "dd", "dt"}
+NAV_TAGS = {"nav", "footer"} # Links daraus werden gesammelt, der Text zählt aber nicht zum Seiteninhalt
+
+_http_local = threading.local()
+
+def get_http_session():
+    """Eine gepoolte requests-Session pro Thread (Keep-Alive, Verbindungs-Wiederverwendung)."""
+    session = getattr(_http_local, "session", None)
+    if session is None:
+        import requests
+        session = requests.Session()
+        adapter = requests.adapters.HTTPAdapter(pool_connections=20, pool_maxsize=20, max_retries=1)
+        session.mount("http://", adapter)
+        session.mount("https://", adapter)
+        session.headers.update({"User-Agent": USER_AGENT, "Accept-Language": "de-DE,de;q=0.9"})
+        _http_local.session = session
+    return session
+
+class PageTextParser(HTMLParser):
+    """Extrahiert Titel, sichtbaren Text und Links (inkl. Text eingeklappter Menüs) aus rohem HTML."""
+
+    def __init__(self, base_url):
+        super().__init__(convert_charrefs=True)
+        self.base_url = base_url
+        self.title = ""
+        self.parts = []
+        self.main_parts = [] # wie parts, aber ohne Navigation/Footer
+        self.links = []
+        self._skip_depth = 0
+        self._nav_depth = 0
+        self._in_title = False
+        self._link_stack = [] # [href, [textteile]]
+
+    def handle_starttag(self, tag, attrs):
+        if tag in INVISIBLE_TAGS:
+            self._skip_depth += 1
+        elif tag in NAV_TAGS:
+            self._nav_depth += 1
+        elif tag == "title":
+            self._in_title = True
+        elif tag == "base":
+            href = dict(attrs).get("href")
+            if href: self.base_url = urljoin(self.base_url, href)
+        elif tag == "a":
+            self._link_stack.append([dict(attrs).get("href"), []])
+        if tag in BLOCK_TAGS:
+            self.parts.append("\n")
+            self.main_parts.append("\n")
+
+    def handle_endtag(self, tag):
+        if tag in INVISIBLE_TAGS:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag in NAV_TAGS:
+            self._nav_depth = max(0, self._nav_depth - 1)
+        elif tag == "title":
+            self._in_title = False
+        elif tag == "a" and self._link_stack:
+            href, texts = self._link_stack.pop()
+            if href and not href.startswith(("javascript:", "mailto:", "tel:", "#")):
+                clean_text = " ".join(" ".join(texts).split()).lower()
+                if clean_text:
+                    self.links.append((urljoin(self.base_url, href), clean_text))
+        if tag in BLOCK_TAGS:
+            self.parts.append("\n")
+            self.main_parts.append("\n")
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title += data
+            return
+        if self._skip_depth:
+            return
+        self.parts.append(data)
+        if not self._nav_depth: self.main_parts.append(data)
+        for link in self._link_stack:
+            link[1].append(data)
+
+    def get_text(self, main_only=False):
+        """Sichtbarer Text; main_only=True ohne Navigation/Footer (falls dann noch etwas übrig bleibt)."""
+        def clean(parts):
+            lines = (" ".join(line.split()) for line in "".join(parts).splitlines())
+            return "\n".join(line for line in lines if line)
+        return (main_only and clean(self.main_parts)) or clean(self.parts)
+
+def looks_js_rendered(html, visible_text):
+    """Heuristik: Fast leerer Body oder bekannte SPA-Hülle -> Browser nötig."""
+    if len(visible_text) < CONFIG.get("FAST_FETCH_MIN_TEXT", 400):
+        return True
+    html_low = html[:200000].lower()
+    return any(m.lower() in html_low for m in SPA_MARKERS)
+
+NOT_MODIFIED = "304"
+
+def get_http_content(url, validators=None):
+    """
+    Lädt eine Seite per einfachem HTTP-Request und extrahiert Titel, Text und Links.
+    Rückgabe: (seite, validators). `seite` ist wie bei get_selenium_content, NOT_MODIFIED
+    bei 304 (Revalidierung mit ETag/Last-Modified) oder None, wenn die Seite einen
+    Browser braucht (JS-Seite, Fehlerstatus, Netzwerkproblem).
+    """
+    headers = {}
+    if validators:
+        if validators.get("etag"): headers["If-None-Match"] = validators["etag"]
+        if validators.get("last_modified"): headers["If-Modified-Since"] = validators["last_modified"]
+
+    try:
+        r = get_http_session().get(url, timeout=CONFIG.get("HTTP_TIMEOUT", 10), stream=True, headers=headers)
+        try:
+            new_validators = {"etag": r.headers.get("ETag"), "last_modified": r.headers.get("Last-Modified")}
+            if r.status_code == 304 and validators:
+                return NOT_MODIFIED, new_validators
+            ctype = r.headers.get("Content-Type", "").lower()
+            if r.status_code >= 400:
+                return None, {}
+            if "html" not in ctype:
+                # PDFs & Co.: Der Browser blockiert Downloads ohnehin -> leeres Ergebnis, kein Chrome nötig
+                return ("", "", []), {}
+            raw = r.raw.read(MAX_HTML_BYTES, decode_content=True)
+            final_url = r.url
+        finally:
+            r.close()
+    except Exception:
+        return None, {}
+
+    encoding = r.encoding if "charset" in ctype else "utf-8"
+    try:
+        html = raw.decode(encoding or "utf-8")
+    except (UnicodeDecodeError, LookupError):
+        html = raw.decode("cp1252", errors="replace")
+
+    parser = PageTextParser(final_url)
+    try:
+        parser.feed(html)
+        parser.close()
+    except Exception:
+        return None, {}
+
+    title = " ".join(parser.title.split())
+    if looks_js_rendered(html, parser.get_text()):
+        return None, {}
+    body_text = parser.get_text(main_only=True)
+
+    return (title, f"{title}\n\n{body_text}", parser.links), new_validators
+
+# --- SEITEN-CACHE ---
+
+_page_cache = None
+_page_cache_lock = threading.Lock()
+_page_cache_writes = 0
+
+def normalize_url(url):
+    """Cache-Schlüssel: Schema/Host klein, ohne Fragment, ohne Standard-Port, leerer Pfad = '/'."""
+    parts = urlparse(url.strip())
+    scheme = parts.scheme.lower()
+    host = (parts.hostname or "").lower()
+    if parts.port and not ((scheme == "http" and parts.port == 80) or (scheme == "https" and parts.port == 443)):
+        host = f"{host}:{parts.port}"
+    path = parts.path or "/"
+    return f"{scheme}://{host}{path}" + (f"?{parts.query}" if parts.query else "")
+
+def get_page_cache():
+    global _page_cache
+    if _page_cache is None:
+        conn = sqlite3.connect(CONFIG.get("PAGE_CACHE_FILE", "page_cache.sqlite"), check_same_thread=False, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS pages (
+                url TEXT PRIMARY KEY,
+                title TEXT,
+                text TEXT,
+                links TEXT,
+                etag TEXT,
+                last_modified TEXT,
+                fetched REAL NOT NULL,
+                accessed REAL NOT NULL,
+                size INTEGER NOT NULL
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS pages_accessed ON pages (accessed)")
+        conn.commit()
+        _page_cache = conn
+    return _page_cache
+
+def page_cache_get(url):
+    """Liefert den Cache-Eintrag als Dict (inkl. 'fresh') oder None."""
+    key = normalize_url(url)
+    with _page_cache_lock:
+        conn = get_page_cache()
+        row = conn.execute(
+            "SELECT title, text, links, etag, last_modified, fetched FROM pages WHERE url = ?", (key,)
+        ).fetchone()
+        if not row: return None
+        conn.execute("UPDATE pages SET accessed = ? WHERE url = ?", (time.time(), key))
+        conn.commit()
+    title, text, links, etag, last_modified, fetched = row
+    max_age = CONFIG.get("PAGE_CACHE_MAX_AGE_HOURS", 168) * 3600
+    return {
+        "page": (title, text, [tuple(l) for l in json.loads(links)]),
+        "validators": {"etag": etag, "last_modified": last_modified},
+        "fresh": time.time() - fetched < max_age
+    }
+
+def page_cache_touch(url):
+    """Nach einem 304: Eintrag gilt wieder als frisch."""
+    with _page_cache_lock:
+        conn = get_page_cache()
+        conn.execute("UPDATE pages SET fetched = ? WHERE url = ?", (time.time(), normalize_url(url)))
+        conn.commit()
+
+def page_cache_put(url, page, validators=None):
+    global _page_cache_writes
+    title, text, links = page
+    links_json = json.dumps(links, ensure_ascii=False)
+    size = len(title) + len(text) + len(links_json)
+    validators = validators or {}
+    now = time.time()
+    with _page_cache_lock:
+        conn = get_page_cache()
+        conn.execute(
+            "INSERT OR REPLACE INTO pages (url, title, text, links, etag, last_modified, fetched, accessed, size) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+            (normalize_url(url), title, text, links_json, validators.get("etag"), validators.get("last_modified"), now, now, size)
+        )
+        conn.commit()
+        _page_cache_writes += 1
+        if _page_cache_writes % 50 == 1:
+            page_cache_evict(conn)
+
+def page_cache_evict(conn):
+    """LRU: Am längsten nicht gelesene Seiten löschen, bis PAGE_CACHE_MAX_MB eingehalten wird."""
+    limit = CONFIG.get("PAGE_CACHE_MAX_MB", 200) * 1024 * 1024
+    total = conn.execute("SELECT COALESCE(SUM(size), 0) FROM pages").fetchone()[0]
+    if total <= limit: return
+    freed = 0
+    victims = []
+    for url, size in conn.execute("SELECT url, size FROM pages ORDER BY accessed ASC"):
+        if total - freed <= limit * 0.9: break # etwas Luft lassen, damit nicht bei jedem Insert geräumt wird
+        victims.append((url,))
+        freed += size
+    conn.executemany("DELETE FROM pages WHERE url = ?", victims)
+    conn.commit()
+
+def get_page_content(driver, url, wait_time=2.0):
+    """
+    Reihenfolge: Seiten-Cache -> schneller HTTP-Abruf -> Selenium (nur für JS-lastige Seiten).
+    Abschaltbar mit PAGE_CACHE=false bzw. FAST_FETCH=false in der config.json.
+    """
+    title, text, links = cassette("seite", url, _get_page_content, driver, url, wait_time)
+    return title, text, [tuple(link) for link in links]
+
+def _get_page_content(driver, url, wait_time):
+    use_cache = CONFIG.get("PAGE_CACHE", True)
+    cached = page_cache_get(url) if use_cache else None
+    if cached and cached["fresh"]:
+        record_metric("seite_cache", 0.0, len(cached["page"][1]))
+        return cached["page"]
+
+    if CONFIG.get("FAST_FETCH", True):
+        with measure("seite_http") as m:
+            result, validators = get_http_content(url, cached["validators"] if cached else None)
+            if isinstance(result, tuple): m.size = len(result[1])
+        if result == NOT_MODIFIED:
+            page_cache_touch(url)
+            return cached["page"]
+        if result is not None:
+            if use_cache and result[1]: page_cache_put(url, result, validators)
+            return result
+    if driver is None:
+        return "", "", []
+    with measure("seite_browser") as m:
+        result = get_selenium_content(driver, url, wait_time)
+        m.size = len(result[1])
+    if use_cache and result[1]: page_cache_put(url, result)
+    return result
+
+# --- TEXT-ERKENNUNG (Keywords, Schultypen, Strict-Prüfung) ---
+
+# Typische Text-Fallen, die darauf hindeuten, dass eine andere Schule gemeint ist
+# (werden auf den kleingeschriebenen Text vor dem Schultyp angewendet)
+SCHULTYP_FALLEN = [
+    r"nach\s+der\s+", 
+    r"von\s+der\s+", 
+    r"über\s+die\s+",
+    r"über\s+ihre\s+",
+    r"übergang\s+(von|aus)\s+(der)?\s*", 
+    r"kooperation\s+mit\s+(der|einer)?\s*",
+    r"schüler(innen)?\s+der\s+",
+    r"abgänger(innen)?\s+der\s+"
+]
+
+# Der TÜV-Modus: Phrasen, an denen man eine offizielle Schulwebseite erkennt
+STRICT_TRIGGERS = ["leitbild", "konzept", "schulprogramm", "schulprofil", "pädagogik"]
+STRICT_PATTERNS = [
+    r"wir\s+sind\s+eine",       # "Wir sind eine offene Ganztagsschule"
+    r"unsere\s+ist\s+eine",
+    r"unsere\s+schule",
+    r"wir\s+schule",
+    r"die\s+schule",
+    r"die\s+.{0,100}?\s+ist\s+eine" # "Die Goetheschule ist eine Grundschule"
+]
+STRICT_SAMPLE_CHARS = 10000 # Wir prüfen die ersten 10.000 Zeichen
+FALLEN_CONTEXT_CHARS = 35   # So weit schaut der "Rückspiegel" vor einem Schultyp zurück
+
+def _prefix_groups(terms):
+    """
+    Ordnet jedem (kleingeschriebenen) Begriff alle Original-Begriffe zu, die ein Präfix davon sind.
+    Matcht die längste Alternative an einer Position, matchen dort auch alle ihre Präfixe.
+    """
+    originals = {}
+    for t in terms:
+        originals.setdefault(t.lower(), []).append(t)
+    groups = {}
+    for low in originals:
+        groups[low] = [o for other, origs in originals.items() if low.startswith(other) for o in origs]
+    return groups
+
+def _alternation(terms):
+    # Längste zuerst, damit z.B. "Oberstufengymnasium" vor "Gymnasium" probiert wird
+    return "|".join(re.escape(t) for t in sorted(terms, key=len, reverse=True))
+
+class TextMatcher:
+    """
+    Einmal aus den Config-Listen kompiliert, erkennt in EINEM Durchlauf über den
+    kleingeschriebenen Text alle Keywords (Wortanfang) und Schultypen (inkl. Fallen-Filter).
+    Die Strict-Prüfung ist ein einziger kombinierter Regex über die ersten 10.000 Zeichen.
+    """
+
+    def __init__(self, keywords, school_types):
+        self.kw_groups = _prefix_groups(keywords)
+        self.type_groups = _prefix_groups(school_types)
+        branches = []
+        if self.kw_groups:
+            kw_alt = r"(?=(?P<kw>\b(?:" + _alternation(self.kw_groups) + ")))"
+            if self.type_groups:
+                kw_alt += r"(?=(?P<ty>" + _alternation(self.type_groups) + "))?"
+            branches.append(kw_alt)
+        if self.type_groups:
+            branches.append(r"(?=(?P<ty2>" + _alternation(self.type_groups) + "))")
+        # Nullbreite Lookaheads -> auch überlappende Treffer werden gefunden
+        self.scan_re = re.compile("|".join(branches)) if branches else None
+        self.fallen_re = re.compile("|".join(SCHULTYP_FALLEN))
+        self.strict_re = re.compile("|".join([re.escape(t) for t in STRICT_TRIGGERS] + STRICT_PATTERNS))
+
+    def match(self, text, check_strict=False):
+        """
+        Liefert (keywords, schultypen, strict_ok) für einen Text.
+        strict_ok ist None, wenn check_strict nicht gesetzt ist.
+        """
+        with measure("matching", size=len(text)):
+            return self._match(text, check_strict)
+
+    def _match(self, text, check_strict):
+        low = text.lower()
+        keywords, types = set(), set()
+
+        if self.scan_re:
+            for m in self.scan_re.finditer(low):
+                groups = m.groupdict()
+                if groups.get("kw"):
+                    keywords.update(self.kw_groups[groups["kw"]])
+                ty = groups.get("ty") or groups.get("ty2")
+                if ty:
+                    candidates = [t for t in self.type_groups[ty] if t not in types]
+                    start = m.start()
+                    context_before = low[max(0, start - FALLEN_CONTEXT_CHARS):start]
+                    # Nur wenn das Vorkommen KEINE Falle ist, zählt es als echter Treffer
+                    if candidates and not self.fallen_re.search(context_before):
+                        types.update(candidates)
+
+        strict_ok = self.is_school_page(low) if check_strict else None
+        return keywords, sorted(types), strict_ok
+
+    def is_school_page(self, text):
+        return bool(self.strict_re.search(text[:STRICT_SAMPLE_CHARS].lower()))
+
+_text_matcher = None
+_text_matcher_key = None
+_text_matcher_lock = threading.Lock()
+
+def get_text_matcher():
+    """Kompilierter Matcher für die aktuellen Listen; wird automatisch neu gebaut, wenn sie sich ändern."""
+    global _text_matcher, _text_matcher_key
+    key = (tuple(CONFIG["KEYWORD_LISTE"]), tuple(CONFIG["SCHULTYPEN_LISTE"]))
+    with _text_matcher_lock:
+        if _text_matcher is None or key != _text_matcher_key:
+            _text_matcher = TextMatcher(*key)
+            _text_matcher_key = key
+        return _text_matcher
+
+def reset_text_matcher():
+    global _text_matcher
+    with _text_matcher_lock:
+        _text_matcher = None
+
 def find_school_type_in_text(text):
     """
     Sucht nach Schultypen mit einem "Rückspiegel", 
     um False-Positives (z.B. "nach der Grundschule") auszufiltern.
     Greift direkt auf die globale CONFIG zu.
     """
-    found = set()
-    
-    # Typische Text-Fallen, die darauf hindeuten, dass eine andere Schule gemeint ist
-    fallen = [
-        r"nach\s+der\s+", 
-        r"von\s+der\s+", 
-        r"über\s+die\s+"
-        r"über\s+Ihre\s+"
-        r"übergang\s+(von|aus)\s+(der)?\s*", 
-        r"kooperation\s+mit\s+(der|einer)?\s*",
-        r"schüler(innen)?\s+der\s+",
-        r"abgänger(innen)?\s+der\s+"
-    ]
-    
-    for styp in CONFIG["SCHULTYPEN_LISTE"]:
-        # Finde ALLE Vorkommen dieses Schultyps im Text
-        matches = list(re.finditer(re.escape(styp), text, re.IGNORECASE))
-        
-        for match in matches:
-            # Hole die 35 Zeichen VOR dem gefundenen Schultyp
-            start_idx = max(0, match.start() - 35)
-            context_before = text[start_idx:match.start()].lower()
-            
-            # Prüfe, ob eine der Fallen im Kontext davor auftaucht
-            is_falle = any(re.search(falle, context_before) for falle in fallen)
-            
-            # Wenn auch nur ein Vorkommen KEINE Falle ist, 
-            # ist es ein echter Treffer -> speichern und zum nächsten Typ wechseln!
-            if not is_falle:
-                found.add(styp)
-                break 
-                
-    return list(found)
+    return get_text_matcher().match(text)[1]
+
+def find_keywords_in_text(text):
+    """Keywords aus KEYWORD_LISTE, die irgendwo am Wortanfang im Text stehen."""
+    return get_text_matcher().match(text)[0]
 
 def validate_page_strict(text):
     """
     Der TÜV-Modus: Prüft, ob es sich wirklich um eine offizielle Schulwebseite handelt.
     Kriterien: Spezielle Phrasen oder Keywords.
     """
-    text_sample = text[:10000] # Wir prüfen die ersten 10.000 Zeichen
-        
-    # 1. Hard Keywords (reichen alleine aus)
-    triggers = ["leitbild", "konzept", "schulprogramm", "schulprofil", "pädagogik"]
-    if any(t in text_sample.lower() for t in triggers):
-        return True
+    return get_text_matcher().is_school_page(text)
 
-    # 2. Satzfragmente (Flexibel mit Regex)
-    
-    # "Wir sind eine..." (z.B. "Wir sind eine offene Ganztagsschule")
-    # \s+ erlaubt beliebige Leerzeichen/Tabs
-    if re.search(r"Wir\s+sind\s+eine", text_sample, re.IGNORECASE):
-        return True
-        
-     # "Wir sind eine..." (z.B. "Wir sind eine offene Ganztagsschule")
-    # \s+ erlaubt beliebige Leerzeichen/Tabs
-    if re.search(r"Unsere\s+ist\s+eine", text_sample, re.IGNORECASE):
-        return True
-        
-     # "Wir sind eine..." (z.B. "Wir sind eine offene Ganztagsschule")
-    # \s+ erlaubt beliebige Leerzeichen/Tabs
-    if re.search(r"Unsere\s+Schule", text_sample, re.IGNORECASE):
-        return True
-        
-    # "Wir sind eine..." (z.B. "Wir sind eine offene Ganztagsschule")
-    # \s+ erlaubt beliebige Leerzeichen/Tabs
-    if re.search(r"Wir\s+Schule", text_sample, re.IGNORECASE):
-        return True    
-    
-    # "Wir sind eine..." (z.B. "Wir sind eine offene Ganztagsschule")
-    # \s+ erlaubt beliebige Leerzeichen/Tabs
-    if re.search(r"Die\s+Schule", text_sample, re.IGNORECASE):
-        return True
+# --- SITEMAP-DISCOVERY ---
+# Viele Schul-CMS veröffentlichen eine sitemap.xml. Deren URL-Pfade verraten die Profilseiten,
+# ohne dass Startseite und L1-Seiten im Browser gerendert werden müssen, nur um Links zu finden.
 
-    # "Die ... ist eine ..." (z.B. "Die Goetheschule ist eine Grundschule")
-    # .{0,100}? erlaubt bis zu 100 Zeichen zwischen "Die" und "ist eine" (für Name + Adjektive)
-    if re.search(r"Die\s+.{0,100}?\s+ist\s+eine", text_sample, re.IGNORECASE):
-        return True
-        
-    return False
+SITEMAP_SKIP = ["impressum", "datenschutz", "login", "anmelden", "kontakt", "sitemap", "termine", "kalender",
+                "aktuelles", "news", "archiv", "galerie", "tag/", "category/", "kategorie/", "author/", "feed"]
+SITEMAP_MAX_BYTES = 5 * 1024 * 1024
+SITEMAP_MAX_FILES = 5 # Max. Sitemaps pro Website (bei Sitemap-Index)
 
-def crawl_and_analyze(driver, school_input, school_ort):
-    if school_input.startswith("http"):
-        url = school_input
-        is_manual_url = True 
-    else:
-        url = search_ddg_robust(f"{school_input} {school_ort} Startseite")
-        is_manual_url = False
+def fetch_text(url, max_bytes=SITEMAP_MAX_BYTES):
+    """Kleiner HTTP-Abruf für robots.txt/Sitemaps (entpackt auch .xml.gz). None bei Fehlern."""
+    return cassette("datei", url, _fetch_text, url, max_bytes)
 
+def _fetch_text(url, max_bytes):
+    try:
+        r = get_http_session().get(url, timeout=CONFIG.get("HTTP_TIMEOUT", 10), stream=True)
+        try:
+            if r.status_code >= 400: return None
+            raw = r.raw.read(max_bytes, decode_content=True)
+        finally:
+            r.close()
+    except Exception:
+        return None
+    if raw[:2] == b"\x1f\x8b":
+        import gzip
+        try: raw = gzip.decompress(raw)
+        except OSError: return None
+    return raw.decode("utf-8", errors="replace")
+
+def sitemap_urls(start_url):
+    """Alle Seiten-URLs aus den Sitemaps einer Website (robots.txt, sonst /sitemap.xml)."""
+    parsed = urlparse(start_url)
+    root = f"{parsed.scheme}://{parsed.netloc}"
+    robots = fetch_text(root + "/robots.txt", 256 * 1024) or ""
+    todo = re.findall(r"(?im)^\s*sitemap:\s*(\S+)", robots)
+    fetched = {}
+    if not todo:
+        # Kein Hinweis in robots.txt -> die üblichen Orte probieren
+        for candidate in (root + "/sitemap.xml", root + "/sitemap_index.xml"):
+            xml = fetch_text(candidate)
+            if xml and "<loc" in xml:
+                todo, fetched[candidate] = [candidate], xml
+                break
+
+    pages, seen = [], set()
+    while todo and len(seen) < SITEMAP_MAX_FILES:
+        sm_url = todo.pop(0)
+        if sm_url in seen: continue
+        seen.add(sm_url)
+        xml = fetched.pop(sm_url, None) or fetch_text(sm_url)
+        if not xml or "<loc" not in xml: continue
+        locs = [html_lib.unescape(u) for u in re.findall(r"<loc>\s*(.*?)\s*</loc>", xml, re.IGNORECASE | re.DOTALL)]
+        if "<sitemapindex" in xml.lower():
+            todo.extend(locs)
+        else:
+            pages.extend(locs)
+    return pages
+
+def priority_term_slugs(term):
+    """'Über uns' -> {'ueber-uns', 'uber-uns', 'ueberuns', 'ueber_uns', ...} für den Vergleich mit URL-Pfaden."""
+    low = term.lower()
+    variants = {low, low.replace("ä", "ae").replace("ö", "oe").replace("ü", "ue").replace("ß", "ss"),
+                low.replace("ä", "a").replace("ö", "o").replace("ü", "u").replace("ß", "ss")}
+    return {v.replace(" ", sep) for v in variants for sep in ("-", "_", "")}
+
+def priority_path_re(terms):
+    """Slugs nur als ganze Pfadsegmente bzw. durch -/_ getrennte Wörter ('ags' ja, 'mittagsbetreuung' nein)."""
+    slugs = sorted({slug for term in terms for slug in priority_term_slugs(term)}, key=len, reverse=True)
+    return re.compile(r"(?:^|[/_-])(?:" + "|".join(map(re.escape, slugs)) + r")(?:$|[/_.-])")
+
+SITEMAP_PRIORITY_RES = ((2, priority_path_re(PRIORITY_LINKS_L1)), (1, priority_path_re(PRIORITY_LINKS_L2)))
+
+def score_sitemap_path(path):
+    """PRIORITY_LINKS_L1-Treffer zählen doppelt, L2 einfach; tiefe Pfade leicht abgewertet."""
+    path = unquote(path).lower()
+    if any(s in path for s in SITEMAP_SKIP) or re.search(r"/(19|20)\d\d/", path): return 0
+    score = 0
+    for weight, pattern in SITEMAP_PRIORITY_RES:
+        if pattern.search(path):
+            score += weight
+    return score - 0.1 * path.strip("/").count("/") if score else 0
+
+def discover_profile_pages(start_url):
+    """Die vielversprechendsten Profilseiten laut Sitemap (max. SITEMAP_MAX_PAGES), sonst []."""
+    domain = urlparse(start_url).netloc.lower().removeprefix("www.")
+    scored = {}
+    for u in sitemap_urls(start_url):
+        parsed = urlparse(u)
+        if not parsed.netloc.lower().removeprefix("www.") == domain: continue
+        if parsed.path.lower().endswith((".pdf", ".jpg", ".png", ".doc", ".docx")): continue
+        score = score_sitemap_path(parsed.path)
+        if score > 0 and normalize_url(u) != normalize_url(start_url):
+            scored[u] = max(score, scored.get(u, 0))
+    best = sorted(scored, key=lambda u: (-scored[u], len(u)))
+    return best[:CONFIG.get("SITEMAP_MAX_PAGES", 6)]
+
+def url_reachable(url):
+    """Günstiger Check, ob eine gespeicherte Webseite noch antwortet (Seiten-Cache, sonst HEAD/GET)."""
+    return cassette("erreichbar", url, _url_reachable, url)
+
+def _url_reachable(url):
+    cached = page_cache_get(url) if CONFIG.get("PAGE_CACHE", True) else None
+    if cached and cached["fresh"]: return True
+    try:
+        session = get_http_session()
+        timeout = CONFIG.get("HTTP_TIMEOUT", 10)
+        resp = session.head(url, allow_redirects=True, timeout=timeout)
+        if resp.status_code in (403, 405, 501): # HEAD nicht erlaubt -> kurzer GET
+            resp = session.get(url, allow_redirects=True, timeout=timeout, stream=True)
+            resp.close()
+        return resp.status_code < 400
+    except Exception:
+        return False
+
+def find_school_url(school_name, school_ort, known_url=None):
+    """Bekannte, noch erreichbare Webseite wiederverwenden (REUSE_KNOWN_URL), sonst suchen."""
+    if known_url and str(known_url).startswith("http") and CONFIG.get("REUSE_KNOWN_URL", True):
+        if url_reachable(known_url):
+            return known_url
+    return search_ddg_robust(f"{school_name} {school_ort} Startseite")
+
+def reusable_url(entry):
+    """
+    Gespeicherte Webseite nur wiederverwenden, wenn der letzte Scan damit etwas gefunden hat.
+    Der Auto-Scan besucht nur leere/fehlerhafte Zeilen erneut - hat die URL damals nichts
+    geliefert, ist es oft die falsche Seite, und es wird neu gesucht.
+    """
+    def clean(val):
+        v = str(val).strip().lower()
+        return "" if v in ["nan", "none", "null", ""] else v
+
+    if clean(entry.get('schultyp', "")) or clean(entry.get('keywords', "")):
+        return entry.get('webseite')
+    ki = clean(entry.get('ki_zusammenfassung', ""))
+    failed = [m.lower() for m in CONFIG.get("ERROR_MARKERS", [])] + ["absturz", "keine relevanten daten"]
+    if ki and not any(m in ki for m in failed):
+        return entry.get('webseite')
+    return None
+
+def crawl_and_analyze(driver, school_input, school_ort, known_url=None):
+    with cassette_school(school_input, school_ort):
+        if school_input.startswith("http"):
+            result = crawl_url(driver, school_input, is_manual_url=True)
+        else:
+            result = crawl_url(driver, find_school_url(school_input, school_ort, known_url), is_manual_url=False)
+        cassette_owns_context(result[3])
+    return result
+
+def crawl_url(driver, url, is_manual_url=False):
+    """Lädt Startseite + Unterseiten einer bereits bekannten URL und sammelt Typ, Keywords und Kontext."""
+    with measure("crawl"):
+        return _crawl_url(driver, url, is_manual_url)
+
+def _crawl_url(driver, url, is_manual_url):
     if not url: return "Nicht gefunden", "", "", ""
     
     print(f"      -> URL: {url} {'(Deep Scan)' if is_manual_url else ''}")
     
     wait_time = CONFIG.get("WAIT_TIME", 2.0)
-    title_main, text_main, links_main = get_selenium_content(driver, url, wait_time)
+    title_main, text_main, links_main = get_page_content(driver, url, wait_time)
     
     if not text_main: return "Nicht erreichbar", "", "", ""
     
-    if CONFIG["SENSITIVITY"] == "strict" and not is_manual_url:
-        is_valid = validate_page_strict(text_main)
-        if not is_valid:
-            print("      🛑 Strict Mode: Seite abgelehnt.")
-            return url, "", "", ""
-            
-    found_types = find_school_type_in_text(title_main + "\n" + text_main)
-    found_kws = set()
-    chunks = [f"--- Seite 1 ({title_main}) ---\n{text_main[:2500]}"]
-    
-    def scan(txt):
-        for k in CONFIG["KEYWORD_LISTE"]:
-            if re.search(r'\b' + re.escape(k.lower()), txt.lower()): found_kws.add(k)
-
-    scan(text_main)
+    matcher = get_text_matcher()
+    check_strict = CONFIG["SENSITIVITY"] == "strict" and not is_manual_url
+    found_kws, found_types, is_valid = matcher.match(title_main + "\n" + text_main, check_strict=check_strict)
+
+    if check_strict and not is_valid:
+        print("      🛑 Strict Mode: Seite abgelehnt.")
+        return url, "", "", ""
+
+    pages = [(f"Seite 1 ({title_main})", text_main)]
+
+    # Abkürzung: Profilseiten direkt aus der Sitemap statt über gerenderte L1-Seiten
+    sitemap_targets = discover_profile_pages(url) if not is_manual_url and CONFIG.get("SITEMAP_DISCOVERY", True) else []
+    if sitemap_targets:
+        print(f"      -> Sitemap: {len(sitemap_targets)} Profilseiten")
+        for target in sitemap_targets:
+            t, text, _ = get_page_content(driver, target, wait_time)
+            if text:
+                kws, types, _ = matcher.match(text)
+                found_kws.update(kws)
+                if not found_types: found_types.extend(types)
+                pages.append((t, text))
+        if len(pages) > 1:
+            return url, ", ".join(sorted(set(found_types))), ", ".join(sorted(found_kws)), compact_pages(pages)
+        print("      -> Sitemap-Seiten nicht erreichbar, folge den Links der Startseite")
     
     domain = urlparse(url).netloc
     l1_targets = []
@@ -515,11 +1693,12 @@ def crawl_and_analyze(driver, school_input, school_ort):
     
     for l1 in scan_list:
         print(f"      -> Scan Deep: {l1}") # (Nur für CLI wichtig)
-        t1, text1, links1 = get_selenium_content(driver, l1, wait_time)
+        t1, text1, links1 = get_page_content(driver, l1, wait_time)
         if text1:
-            scan(text1)
-            chunks.append(f"--- {t1} ---\n{text1[:2500]}")
-            if not found_types: found_types.extend(find_school_type_in_text(text1))
+            kws1, types1, _ = matcher.match(text1)
+            found_kws.update(kws1)
+            pages.append((t1, text1))
+            if not found_types: found_types.extend(types1)
             
             if not is_manual_url:
                  l2_urls = []
@@ -531,13 +1710,122 @@ def crawl_and_analyze(driver, school_input, school_ort):
                              l2_urls.append(full_h)
                  
                  for l2 in list(dict.fromkeys(l2_urls))[:3]:
-                    t2, text2, _ = get_selenium_content(driver, l2, wait_time)
+                    t2, text2, _ = get_page_content(driver, l2, wait_time)
                     if text2:
-                        scan(text2)
-                        chunks.append(f"--- {t2} ---\n{text2[:2500]}")
+                        found_kws.update(find_keywords_in_text(text2))
+                        pages.append((t2, text2))
 
     schultyp_final = ", ".join(sorted(list(set(found_types))))
-    return url, schultyp_final, ", ".join(sorted(list(found_kws))), "\n\n".join(chunks)
+    return url, schultyp_final, ", ".join(sorted(list(found_kws))), compact_pages(pages)
+
+# --- KONTEXT-KOMPAKTIERUNG ---
+# Schul-Websites wiederholen Menü, Cookie-Banner und Footer auf jeder Seite.
+# Das fliegt raus, bevor der Text an die KI geht - die Keyword-Suche sieht weiterhin alles.
+
+# Nur eigenständige, kurze Zeilen (Menüpunkte, Banner-Buttons, Copyright) - nie Teile echter Sätze
+BOILERPLATE_RE = re.compile(
+    r"(?:impressum|datenschutz(?:erklärung|hinweise)?|cookie[- ]?einstellungen|einstellungen|"
+    r"alle\s+akzeptieren|akzeptieren|ablehnen|nur\s+notwendige(?:\s+cookies)?|zum\s+inhalt\s+springen|"
+    r"nach\s+oben|(?:©|\(c\)|copyright)\b.*|.*alle\s+rechte\s+vorbehalten\.?|bitte\s+javascript\s+aktivieren\.?)",
+    re.IGNORECASE)
+BOILERPLATE_SPLIT_RE = re.compile(r"\s*[|·•]\s*") # "Impressum | Datenschutz | © 2024"
+CONSENT_RE = re.compile(r"\bcookies?\b|einwilligung|google\s+analytics", re.IGNORECASE)
+CONSENT_MAX_LINE = 250       # Cookie-Hinweise sind kurz; längere Zeilen mit "Cookie" sind echter Inhalt
+BOILERPLATE_PAGE_RE = re.compile(r"impressum|datenschutz|cookie", re.IGNORECASE)
+NEAR_DUP_THRESHOLD = 0.85    # Jaccard-Ähnlichkeit (Wort-Trigramme), ab der ein Absatz als Dublette gilt
+PAGE_HEADER_RE = re.compile(r"^--- (.*) ---$", re.MULTILINE)
+
+def _norm_line(line):
+    return re.sub(r"\s+", " ", line).strip().lower()
+
+def _shingles(norm):
+    words = norm.split()
+    return {" ".join(words[i:i + 3]) for i in range(max(1, len(words) - 2))}
+
+def is_boilerplate_line(norm):
+    if len(norm) < CONSENT_MAX_LINE and CONSENT_RE.search(norm): return True
+    parts = [p for p in BOILERPLATE_SPLIT_RE.split(norm) if p]
+    return bool(parts) and all(BOILERPLATE_RE.fullmatch(p) for p in parts)
+
+def is_site_chrome(norm, count, page_count):
+    """
+    Kommt die Zeile auf den meisten Seiten vor (Menü, Footer)? Ein Satz, der nur auf Startseite
+    und Profilseite steht, zählt nicht. Bei nur 2 Seiten gelten nur kurze Zeilen als Menü.
+    """
+    if page_count <= 2: return count == 2 and len(norm) < 60
+    return count >= 3 and count >= 0.6 * page_count
+
+def compact_pages(pages):
+    """
+    Baut den KI-Kontext aus [(titel, text), ...] einer Website:
+    - Zeilen, die auf den meisten Seiten gleich vorkommen (Navigation, Footer), fliegen raus;
+      sonst bleibt von wiederholten Zeilen das erste Vorkommen stehen
+    - Cookie-/Impressum-/Datenschutz-Zeilen und solche Unterseiten fliegen raus
+    - fast identische Absätze bleiben nur einmal stehen
+    - pro Seite max. KI_CONTEXT_PAGE_CHARS Zeichen (nach dem Aufräumen)
+    """
+    page_limit = CONFIG.get("KI_CONTEXT_PAGE_CHARS", 2500)
+    pages = [(t, txt) for n, (t, txt) in enumerate(pages) if n == 0 or not BOILERPLATE_PAGE_RE.search(t or "")]
+
+    # Auf wie vielen Seiten kommt eine Zeile vor?
+    seen_on = collections.Counter()
+    for _, text in pages:
+        seen_on.update({_norm_line(l) for l in text.splitlines() if l.strip()})
+
+    kept_exact, kept_shingles, chunks = set(), [], []
+    for title, text in pages:
+        lines, size = [], 0
+        for line in text.splitlines():
+            norm = _norm_line(line)
+            if not norm or norm in kept_exact: continue
+            if len(norm) < 200 and is_site_chrome(norm, seen_on[norm], len(pages)): continue
+            if is_boilerplate_line(norm): continue
+            if len(norm) >= 60:
+                sh = _shingles(norm)
+                if any(len(sh & k) / len(sh | k) >= NEAR_DUP_THRESHOLD for k in kept_shingles): continue
+                kept_shingles.append(sh)
+            kept_exact.add(norm)
+            lines.append(line.strip())
+            size += len(line) + 1
+            if size >= page_limit: break
+        if lines:
+            chunks.append(f"--- {title} ---\n" + "\n".join(lines)[:page_limit])
+    return "\n\n".join(chunks)
+
+def fit_context(context_text, max_tokens):
+    """
+    Kürzt den Kontext auf ein Token-Budget (ca. 4 Zeichen/Token). Statt hinten abzuschneiden,
+    bekommt jede Seite ihren fairen Anteil; was kurze Seiten nicht brauchen, geht an die langen.
+    """
+    text = re.sub(r'\n\s*\n', '\n', context_text)
+    budget = max_tokens * 4
+    if len(text) <= budget: return text
+
+    heads = list(PAGE_HEADER_RE.finditer(text))
+    if not heads: return text[:budget]
+    pages = [(m.group(0), text[m.end():(heads[i + 1].start() if i + 1 < len(heads) else len(text))].strip("\n"))
+             for i, m in enumerate(heads)]
+    budget -= sum(len(h) + 2 for h, _ in pages)
+
+    shares, open_pages = {}, sorted(range(len(pages)), key=lambda n: len(pages[n][1]))
+    while open_pages:
+        fair = max(0, budget) // len(open_pages)
+        n = open_pages.pop(0)
+        shares[n] = min(len(pages[n][1]), fair)
+        budget -= shares[n]
+
+    out = []
+    for n, (head, body) in enumerate(pages):
+        part = body[:shares[n]]
+        if len(part) < len(body) and "\n" in part: part = part[:part.rfind("\n")]
+        if part: out.append(f"{head}\n{part}")
+    return "\n".join(out)
+
+def context_token_budget(providers):
+    """Token-Budget für den Kontext: das kleinste unter den aktiven Anbietern (KI_CONTEXT_TOKENS)."""
+    budgets = CONFIG.get("KI_CONTEXT_TOKENS", {})
+    default = budgets.get("default", 6000)
+    return min([int(budgets.get(p, default)) for p in providers] or [int(default)])
 
 def is_entry_empty(entry, config):
     """
@@ -566,103 +1854,869 @@ def is_entry_empty(entry, config):
 
 # --- KI ---
 
+def provider_model(provider):
+    """Modellname je Anbieter (Teil des Cache-Schlüssels)."""
+    return {
+        "openrouter": CONFIG["OPENROUTER_MODEL"],
+        "openai": CONFIG.get("OPENAI_MODEL", "gpt-4o-mini"),
+        "gemini": CONFIG["GEMINI_MODEL"],
+        "groq": CONFIG["GROQ_MODEL"],
+    }.get(provider, "")
+
+PROVIDER_LABELS = {"openrouter": "[Llama/Claude]", "openai": "[OpenAI]", "gemini": "[Gemini]", "groq": "[Groq]"}
+
+def call_provider_raw(provider, prompt):
+    """Eine einzelne Anfrage an einen Anbieter, Antworttext ohne Label. Fehler gehen an den Aufrufer."""
+    model = provider_model(provider)
+    timeout = provider_timeout(provider)
+    if provider in ("openrouter", "openai", "groq"):
+        return get_client(provider).chat.completions.create(model=model, messages=[{"role": "user", "content": prompt}], timeout=timeout).choices[0].message.content.strip()
+    elif provider == "gemini":
+        from google.genai import types
+        config = types.GenerateContentConfig(http_options=types.HttpOptions(timeout=int(timeout * 1000)))
+        return get_client("gemini").models.generate_content(model=model, contents=prompt, config=config).text.strip()
+    raise ValueError(f"Unbekannter KI-Anbieter: {provider}")
+
+def call_provider(provider, prompt):
+    return f"{PROVIDER_LABELS[provider]}: " + call_provider_raw(provider, prompt)
+
+def provider_timeout(provider):
+    timeouts = CONFIG.get("KI_TIMEOUTS", {})
+    return float(timeouts.get(provider, timeouts.get("default", 60)))
+
+def build_prompt(context_text):
+    # Kontext auf das Token-Budget der aktiven Anbieter zuschneiden (statt pauschal 60.000 Zeichen)
+    return CONFIG["PROMPT_TEMPLATE"].format(text=fit_context(context_text, context_token_budget(active_providers())))
+
+def active_providers():
+    return [p.lower() for p in CONFIG["AI_PRIORITY"] if status_flags.get(p.lower(), False)]
+
 def ki_analyse(context_text):
     if not context_text or len(context_text) < 50: return "Keine Daten"
-    
-    # 1. Text bereinigen 
-    clean_context = re.sub(r'\n\s*\n', '\n', context_text)
-    
-    # 2. Limit vervierfachen! (60.000 Zeichen statt 15.000)
-    prompt = CONFIG["PROMPT_TEMPLATE"].format(text=clean_context[:60000])
+    key = cassette_hash(context_text)
+    return cassette("ki", key, _ki_analyse, context_text, school=_cassette_ctx_school.get(key))
+
+def _ki_analyse(context_text):
+    prompt = build_prompt(context_text)
+    providers = active_providers()
+
+    # Gleicher Prompt schon einmal beantwortet? -> keine (bezahlte) Anfrage
+    cached = llm_cache_lookup(providers, prompt)
+    if cached: return cached
+
+    provider, answer = ask_providers(providers, prompt)
+    if answer is None: return "KI-Fehler"
+    llm_cache_store(provider, prompt, answer)
+    return answer
+
+def ki_analyse_many(contexts):
+    """Mehrere KI-Analysen gleichzeitig (KI_CONCURRENCY), gebremst durch die Anbieter-Limits."""
+    workers = max(1, int(CONFIG.get("KI_CONCURRENCY", 4)))
+    if workers == 1 or len(contexts) < 2:
+        return [ki_analyse(c) for c in contexts]
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        return list(ex.map(ki_analyse, contexts))
+
+# --- KI-RATENLIMITS ---
+
+class TokenBucket:
+    """Klassischer Token-Bucket: `capacity` Einheiten pro Minute, kontinuierlich nachgefüllt."""
+
+    def __init__(self, per_minute):
+        self.capacity = float(per_minute)
+        self.rate = self.capacity / 60.0
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def _refill(self, now):
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait_time(self, amount, now):
+        """0, wenn `amount` sofort verfügbar ist, sonst Sekunden bis dahin."""
+        self._refill(now)
+        amount = min(amount, self.capacity) # Riesige Einzelanfragen dürfen bei vollem Bucket trotzdem durch
+        return 0.0 if self.level >= amount else (amount - self.level) / self.rate
+
+    def take(self, amount):
+        self.level -= min(amount, self.capacity)
+
+class ProviderLimiter:
+    """Requests pro Minute + Tokens pro Minute für einen Anbieter (aus PROVIDER_LIMITS)."""
+
+    def __init__(self, rpm=None, tpm=None):
+        self.requests = TokenBucket(rpm) if rpm else None
+        self.tokens = TokenBucket(tpm) if tpm else None
+        self.blocked_until = 0.0 # nach einem 429 (Quota) eine Weile aussetzen
+        self.lock = threading.Lock()
+
+    def try_acquire(self, tokens):
+        """Reserviert Kapazität und liefert 0 - oder die Wartezeit in Sekunden, wenn sie fehlt."""
+        with self.lock:
+            now = time.monotonic()
+            wait_s = max(0.0, self.blocked_until - now)
+            for bucket, amount in ((self.requests, 1), (self.tokens, tokens)):
+                if bucket: wait_s = max(wait_s, bucket.wait_time(amount, now))
+            if wait_s > 0: return wait_s
+            if self.requests: self.requests.take(1)
+            if self.tokens: self.tokens.take(tokens)
+            return 0.0
+
+    def headroom(self, tokens):
+        """Wie viele Anfragen dieser Größe gerade sofort durchgehen würden (unbegrenzt = inf)."""
+        with self.lock:
+            now = time.monotonic()
+            if now < self.blocked_until: return 0.0
+            room = float("inf")
+            if self.requests:
+                self.requests._refill(now)
+                room = min(room, self.requests.level)
+            if self.tokens:
+                self.tokens._refill(now)
+                room = min(room, self.tokens.level / max(1, tokens))
+            return room
+
+    def block(self, seconds):
+        with self.lock:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + seconds)
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+
+def get_limiter(provider):
+    with _limiters_lock:
+        if provider not in _limiters:
+            limits = CONFIG.get("PROVIDER_LIMITS", {}).get(provider, {})
+            _limiters[provider] = ProviderLimiter(limits.get("rpm"), limits.get("tpm"))
+        return _limiters[provider]
+
+def estimate_tokens(text):
+    """Grobe Schätzung (ca. 4 Zeichen pro Token) + erwartete Antwortlänge."""
+    return len(text) // 4 + CONFIG.get("KI_EXPECTED_OUTPUT_TOKENS", 300)
+
+PROBE_WAIT_SECONDS = 0.2 # Wartezeit, wenn alle Anbieter halb offen sind und ihre Probe-Anfrage schon läuft
+
+def acquire_provider(remaining, tokens, block=True):
+    """
+    Wählt aus `remaining` den Anbieter mit der meisten freien Kapazität (laut PROVIDER_LIMITS)
+    und entfernt ihn aus der Liste - so verteilt sich die Last auf alle Quoten. Bei gleicher
+    Kapazität (z.B. ohne Limits) gilt die AI_PRIORITY-Reihenfolge. Haben alle keine Kapazität,
+    wird gewartet (block=True). Anbieter mit offenem Circuit Breaker werden übersprungen.
+    None = keiner verfügbar.
+    """
+    while True:
+        usable = [p for p in remaining if get_breaker(p).is_available()]
+        if not usable: return None
+        usable.sort(key=lambda p: -get_limiter(p).headroom(tokens)) # stabil -> Priorität bei Gleichstand
+        waits = []
+        for p in usable:
+            breaker = get_breaker(p)
+            if not breaker.claim(): continue # Probe inzwischen von einem anderen Thread belegt
+            w = get_limiter(p).try_acquire(tokens)
+            if w == 0:
+                remaining.remove(p)
+                return p
+            breaker.release_probe() # Anfrage geht doch nicht raus -> Probe wieder freigeben
+            waits.append(w)
+        if not block: return None
+        # Limits voll -> bis zum nächsten freien Token; nur belegte Proben -> kurz auf deren Ergebnis warten
+        time.sleep(min(min(waits), 5.0) if waits else PROBE_WAIT_SECONDS)
+
+def is_rate_limit_error(e):
+    status = getattr(e, "status_code", None) or getattr(e, "code", None)
+    msg = str(e).lower()
+    return status == 429 or "429" in msg or "rate limit" in msg or "resource_exhausted" in msg or "quota" in msg
+
+def note_provider_error(provider, e):
+    """Bei Quota-/Rate-Limit-Fehlern pausiert der Anbieter (Retry-After, sonst KI_RATE_LIMIT_PAUSE)."""
+    get_breaker(provider).record_failure()
+    if not is_rate_limit_error(e): return
+    pause = CONFIG.get("KI_RATE_LIMIT_PAUSE", 30)
+    try:
+        pause = float(e.response.headers.get("retry-after", pause))
+    except Exception:
+        pass
+    get_limiter(provider).block(pause)
 
-    for provider in CONFIG["AI_PRIORITY"]:
-        provider = provider.lower()
-        if not status_flags.get(provider, False): continue
+# --- KI-AUSFALLSICHERUNG (Circuit Breaker, Latenzen, Hedging) ---
+
+class CircuitBreaker:
+    """
+    Nach KI_BREAKER_FAILURES Fehlern in Folge (inkl. 429) wird ein Anbieter für
+    KI_BREAKER_COOLDOWN Sekunden übersprungen. Danach darf genau eine Probe-Anfrage
+    durch; klappt sie, ist der Anbieter wieder normal im Einsatz.
+    """
+
+    def __init__(self):
+        self.failures = 0
+        self.open_until = 0.0
+        self.probing = False
+        self.lock = threading.Lock()
+
+    def is_available(self):
+        """Nur nachsehen (ohne die Probe zu belegen) - zum Filtern der Anbieterliste."""
+        with self.lock:
+            if self.failures < CONFIG.get("KI_BREAKER_FAILURES", 3):
+                return True
+            return time.monotonic() >= self.open_until and not self.probing
+
+    def claim(self):
+        """Belegt im halb offenen Zustand die eine Probe-Anfrage. False = gerade nicht erlaubt."""
+        with self.lock:
+            if self.failures < CONFIG.get("KI_BREAKER_FAILURES", 3):
+                return True
+            if time.monotonic() < self.open_until or self.probing:
+                return False
+            self.probing = True # halb offen: eine Probe-Anfrage
+            return True
+
+    def release_probe(self):
+        """Die belegte Probe wurde nie gesendet (kein Rate-Limit-Platz, Hedge abgebrochen)."""
+        with self.lock:
+            self.probing = False
+
+    def record_success(self):
+        with self.lock:
+            self.failures = 0
+            self.probing = False
+
+    def record_failure(self):
+        with self.lock:
+            self.failures += 1
+            self.probing = False
+            if self.failures >= CONFIG.get("KI_BREAKER_FAILURES", 3):
+                self.open_until = time.monotonic() + CONFIG.get("KI_BREAKER_COOLDOWN", 120)
+
+_breakers = {}
+_latencies = {} # Anbieter -> die letzten Antwortzeiten (Sek.) erfolgreicher Anfragen
+_health_lock = threading.Lock()
+
+def get_breaker(provider):
+    with _health_lock:
+        if provider not in _breakers: _breakers[provider] = CircuitBreaker()
+        return _breakers[provider]
+
+def record_latency(provider, seconds):
+    with _health_lock:
+        _latencies.setdefault(provider, collections.deque(maxlen=100)).append(seconds)
+
+def hedge_delay(provider):
+    """Ab wann eine zweite Anfrage losgeschickt wird: p95 der bisherigen Antwortzeiten."""
+    with _health_lock:
+        samples = sorted(_latencies.get(provider, []))
+    if len(samples) < 10:
+        return CONFIG.get("KI_HEDGE_DEFAULT_DELAY", 15.0)
+    p95 = samples[min(len(samples) - 1, int(len(samples) * 0.95))]
+    return max(CONFIG.get("KI_HEDGE_MIN_DELAY", 2.0), p95)
+
+def timed_call(provider, prompt, raw=False):
+    """Anfrage inkl. Buchführung für Breaker, Latenzen und Rate-Limits."""
+    start = time.monotonic()
+    try:
+        with measure(f"ki_{provider}", tokens=len(prompt) // 4) as m:
+            answer = call_provider_raw(provider, prompt) if raw else call_provider(provider, prompt)
+            m.tokens += len(answer) // 4
+    except Exception as e:
+        note_provider_error(provider, e)
+        raise
+    record_latency(provider, time.monotonic() - start)
+    get_breaker(provider).record_success()
+    return answer
+
+_hedge_pool = None
+
+def get_hedge_pool():
+    global _hedge_pool
+    if _hedge_pool is None:
+        _hedge_pool = ThreadPoolExecutor(max_workers=max(4, int(CONFIG.get("KI_CONCURRENCY", 4)) * 2), thread_name_prefix="ki-hedge")
+    return _hedge_pool
+
+def ask_providers(providers, prompt, raw=False):
+    """
+    Fragt die Anbieter der Reihe nach, bis einer antwortet. Liefert (anbieter, antwort)
+    oder (None, None). Mit KI_HEDGING=true wird, wenn der erste Anbieter länger als sein
+    p95 braucht, derselbe Prompt zusätzlich an den nächsten geschickt - die erste Antwort gewinnt.
+    """
+    tokens = estimate_tokens(prompt)
+    remaining = list(providers)
+    hedging = CONFIG.get("KI_HEDGING", False)
+
+    while remaining:
+        first = acquire_provider(remaining, tokens)
+        if first is None: break
+
+        if not hedging:
+            try:
+                return first, timed_call(first, prompt, raw)
+            except Exception:
+                continue
+
+        pool = get_hedge_pool()
+        futures = {pool.submit(timed_call, first, prompt, raw): first}
+        done, _ = wait(futures, timeout=hedge_delay(first))
+        if not done:
+            second = acquire_provider(remaining, tokens, block=False)
+            if second:
+                futures[pool.submit(timed_call, second, prompt, raw)] = second
+
+        open_futures = set(futures)
+        while open_futures:
+            done, open_futures = wait(open_futures, return_when=FIRST_COMPLETED)
+            for f in done:
+                try:
+                    answer = f.result()
+                except Exception:
+                    continue # der andere Anbieter läuft evtl. noch
+                for other in open_futures:
+                    # Noch nicht gestartet -> abbrechen und die evtl. belegte Probe freigeben
+                    if other.cancel(): get_breaker(futures[other]).release_probe()
+                return futures[f], answer
+    return None, None
+
+# --- KI-CACHE ---
+
+_llm_cache = None
+_llm_cache_lock = threading.Lock()
+llm_cache_stats = {"hits": 0, "misses": 0}
+
+def get_llm_cache():
+    global _llm_cache
+    if _llm_cache is None:
+        conn = sqlite3.connect(CONFIG.get("LLM_CACHE_FILE", "llm_cache.sqlite"), check_same_thread=False, timeout=30)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("""
+            CREATE TABLE IF NOT EXISTS responses (
+                key TEXT PRIMARY KEY,
+                provider TEXT NOT NULL,
+                model TEXT NOT NULL,
+                answer TEXT NOT NULL,
+                created REAL NOT NULL,
+                accessed REAL NOT NULL,
+                hits INTEGER NOT NULL DEFAULT 0
+            )
+        """)
+        conn.execute("CREATE INDEX IF NOT EXISTS responses_accessed ON responses (accessed)")
+        conn.commit()
+        _llm_cache = conn
+    return _llm_cache
+
+def llm_cache_key(provider, prompt):
+    """
+    Hash über (Anbieter, Modell, fertiger Prompt). Da PROMPT_TEMPLATE im Prompt steckt,
+    erzeugt ein geänderter Prompt-Text automatisch neue Schlüssel.
+    """
+    raw = "\x00".join([provider, provider_model(provider), prompt])
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def llm_cache_lookup(providers, prompt):
+    """Sucht in Prioritätsreihenfolge nach einer gespeicherten Antwort."""
+    if not CONFIG.get("LLM_CACHE", True) or not providers: return None
+    keys = [llm_cache_key(p, prompt) for p in providers]
+    max_age = CONFIG.get("LLM_CACHE_MAX_AGE_DAYS", 90) * 86400
+    with _llm_cache_lock:
+        conn = get_llm_cache()
+        for key in keys:
+            row = conn.execute("SELECT answer, created FROM responses WHERE key = ?", (key,)).fetchone()
+            if row and time.time() - row[1] < max_age:
+                conn.execute("UPDATE responses SET accessed = ?, hits = hits + 1 WHERE key = ?", (time.time(), key))
+                conn.commit()
+                llm_cache_stats["hits"] += 1
+                return row[0]
+        llm_cache_stats["misses"] += 1
+    return None
+
+def llm_cache_store(provider, prompt, answer):
+    if not CONFIG.get("LLM_CACHE", True): return
+    now = time.time()
+    with _llm_cache_lock:
+        conn = get_llm_cache()
+        conn.execute(
+            "INSERT OR REPLACE INTO responses (key, provider, model, answer, created, accessed, hits) VALUES (?, ?, ?, ?, ?, ?, 0)",
+            (llm_cache_key(provider, prompt), provider, provider_model(provider), answer, now, now)
+        )
+        # Eviction: abgelaufene Einträge und (LRU) alles über LLM_CACHE_MAX_ENTRIES
+        conn.execute("DELETE FROM responses WHERE created < ?", (now - CONFIG.get("LLM_CACHE_MAX_AGE_DAYS", 90) * 86400,))
+        conn.execute(
+            "DELETE FROM responses WHERE key IN (SELECT key FROM responses ORDER BY accessed DESC LIMIT -1 OFFSET ?)",
+            (CONFIG.get("LLM_CACHE_MAX_ENTRIES", 20000),)
+        )
+        conn.commit()
+
+def print_llm_cache_stats():
+    hits, misses = llm_cache_stats["hits"], llm_cache_stats["misses"]
+    if hits or misses:
+        print(f"🧠 KI-Cache: {hits} Treffer, {misses} neue Anfragen ({hits / (hits + misses):.0%} gespart)")
+
+# --- KI-BATCH ---
+
+BATCH_PROMPT = (
+    "Du bekommst mehrere Schulen als JSON-Liste mit den Feldern 'id' und 'text'. "
+    "Bearbeite JEDE Schule einzeln und unabhängig von den anderen nach folgendem Auftrag:\n\n"
+    "{auftrag}\n\n"
+    "Antworte ausschließlich mit gültigem JSON in der Form "
+    '{{"ergebnisse": [{{"id": <id>, "zusammenfassung": "<Text>"}}]}} '
+    "und genau einem Ergebnis pro id.\n\nSchulen:\n{schulen}"
+)
+
+def build_batch_prompt(contexts):
+    """Packt mehrere Schul-Kontexte in EINEN strukturierten Prompt."""
+    limit = min(CONFIG.get("KI_BATCH_CONTEXT_TOKENS", 2000), context_token_budget(active_providers()))
+    auftrag = CONFIG["PROMPT_TEMPLATE"].replace("{text}", "(siehe Feld 'text' der jeweiligen Schule)")
+    schulen = [{"id": n, "text": fit_context(ctx, limit)} for n, ctx in enumerate(contexts)]
+    return BATCH_PROMPT.format(auftrag=auftrag, schulen=json.dumps(schulen, ensure_ascii=False))
+
+def parse_batch_answer(raw, count):
+    """Ordnet die Antworten wieder den Schulen zu. Fehlende/kaputte Einträge -> None."""
+    answers = [None] * count
+    text = raw.strip()
+    # Markdown-Codeblöcke (```json ... ```) entfernen
+    text = re.sub(r"^```(?:json)?\s*|\s*```$", "", text)
+    start, end = text.find("{"), text.rfind("}")
+    if start == -1 or end == -1: return answers
+    try:
+        parsed = json.loads(text[start:end + 1])
+    except ValueError:
+        return answers
+    items = parsed.get("ergebnisse", []) if isinstance(parsed, dict) else []
+    for item in items:
         try:
-            if provider == "openrouter":
-                return "[Llama/Claude]: " + clients["openrouter"].chat.completions.create(model=CONFIG["OPENROUTER_MODEL"], messages=[{"role": "user", "content": prompt}]).choices[0].message.content.strip()
-            elif provider == "openai":
-                return "[OpenAI]: " + clients["openai"].chat.completions.create(model="gpt-4o-mini", messages=[{"role": "user", "content": prompt}]).choices[0].message.content.strip()
-            elif provider == "gemini":
-                return "[Gemini]: " + clients["gemini"].models.generate_content(model=CONFIG["GEMINI_MODEL"], contents=prompt).text.strip()
-            elif provider == "groq":
-                return "[Groq]: " + clients["groq"].chat.completions.create(model=CONFIG["GROQ_MODEL"], messages=[{"role": "user", "content": prompt}]).choices[0].message.content.strip()
-        except: continue
-    return "KI-Fehler"
+            n = int(item.get("id"))
+            summary = str(item.get("zusammenfassung", "")).strip()
+        except (AttributeError, TypeError, ValueError):
+            continue
+        if 0 <= n < count and summary:
+            answers[n] = summary
+    return answers
+
+def ki_analyse_batch(contexts):
+    """
+    KI-Zusammenfassung für viele Schulen mit einer Anfrage pro KI_BATCH_SIZE Schulen.
+    Bereits gecachte Prompts werden nicht erneut geschickt. Schulen, deren Antwort
+    nicht sauber zugeordnet werden kann, laufen einzeln über ki_analyse().
+    """
+    if cassette_mode() == "replay":
+        return [ki_analyse(c) for c in contexts] # jede Schule hat ihre KI-Antwort einzeln auf Kassette
+
+    results = [None] * len(contexts)
+    todo = []
+    providers = active_providers()
+    for n, ctx in enumerate(contexts):
+        if not ctx or len(ctx) < 50:
+            results[n] = "Keine Daten"
+            continue
+        cached = llm_cache_lookup(providers, build_prompt(ctx))
+        if cached:
+            results[n] = cached
+            if cassette_mode(): cassette_record_ki(ctx, cached, 0.0)
+        else: todo.append(n)
+
+    if todo:
+        batch_prompt = build_batch_prompt([contexts[n] for n in todo])
+        t0 = time.perf_counter()
+        provider, raw = ask_providers(providers, batch_prompt, raw=True)
+        share = (time.perf_counter() - t0) / len(todo) # Wiedergabe-Dauer pro Schule
+        if raw is not None:
+            for n, answer in zip(todo, parse_batch_answer(raw, len(todo))):
+                if answer:
+                    results[n] = f"{PROVIDER_LABELS[provider]}: {answer}"
+                    llm_cache_store(provider, build_prompt(contexts[n]), results[n])
+                    if cassette_mode(): cassette_record_ki(contexts[n], results[n], share)
+
+    # Fallback: Einzelanfrage für alles, was im Batch nicht geklappt hat
+    missing = [n for n, r in enumerate(results) if r is None]
+    if missing:
+        print(f"      ⚠️ KI-Batch: {len(missing)} von {len(contexts)} Antworten nicht zuordenbar -> Einzelanfragen")
+    for n, answer in zip(missing, ki_analyse_many([contexts[n] for n in missing])):
+        results[n] = answer
+    return results
+
+def cassette_record_ki(ctx, answer, seconds):
+    key = cassette_hash(ctx)
+    cassette_record("ki", key, answer, seconds, _cassette_ctx_school.get(key))
 
 # --- MAPPING ---
 
+def open_geocode_cache():
+    """Öffnet (bzw. erzeugt) den persistenten Geocoding-Cache (SQLite)."""
+    conn = sqlite3.connect(CONFIG.get("GEOCODE_CACHE_FILE", "geocode_cache.sqlite"))
+    conn.execute("""
+        CREATE TABLE IF NOT EXISTS geocode (
+            query TEXT PRIMARY KEY,
+            lat REAL,
+            lon REAL,
+            created REAL NOT NULL
+        )
+    """)
+    conn.commit()
+    return conn
+
+def normalize_geo_query(query):
+    """Cache-Schlüssel: Kleinbuchstaben, Whitespace zusammengefasst."""
+    return " ".join(str(query).lower().split())
+
+def geocode_cached(geolocator, cache, query):
+    """
+    Liefert (lat, lon) oder None. Treffer im Cache kosten weder eine
+    Netzwerkanfrage noch die Höflichkeitspause für OSM.
+    Negative Ergebnisse werden ebenfalls gespeichert, laufen aber nach
+    GEOCODE_NEGATIVE_TTL_DAYS ab und werden dann erneut angefragt.
+    """
+    key = normalize_geo_query(query)
+    row = cache.execute("SELECT lat, lon, created FROM geocode WHERE query = ?", (key,)).fetchone()
+    if row:
+        lat, lon, created = row
+        if lat is not None and lon is not None:
+            return lat, lon
+        ttl = CONFIG.get("GEOCODE_NEGATIVE_TTL_DAYS", 30) * 86400
+        if time.time() - created < ttl:
+            return None
+
+    # Cache-Miss -> echte Anfrage (Timeouts etc. werden NICHT gecacht)
+    loc = geolocator.geocode(query, timeout=10)
+    result = (loc.latitude, loc.longitude) if loc else None
+    cache.execute(
+        "INSERT OR REPLACE INTO geocode (query, lat, lon, created) VALUES (?, ?, ?, ?)",
+        (key, result[0] if result else None, result[1] if result else None, time.time())
+    )
+    cache.commit()
+
+    # WICHTIG: Höflichkeitspause für OSM nur nach echten Anfragen
+    time.sleep(CONFIG.get("MAP_DELAY", 1.5))
+    return result
+
+def geocode_cassette(geolocator, cache, query):
+    return cassette("geo", normalize_geo_query(query), geocode_cached, geolocator, cache, query)
+
+GEO_PRECISION_EXACT = "exakt"
+GEO_PRECISION_CITY = "stadt"
+
+def make_geo_key(entry):
+    """Merkt sich, für welchen Namen/Ort die gespeicherten Koordinaten gelten."""
+    name = str(entry.get('schulname', '')).strip().lower()
+    ort = str(entry.get('ort', '')).strip().lower()
+    return f"{name}|{ort}"
+
+def get_coords(entry):
+    """Liest lat/lon aus dem Eintrag. Leere Zellen (NaN aus Excel) -> (None, None)."""
+    try:
+        lat, lon = float(entry.get('lat')), float(entry.get('lon'))
+    except (TypeError, ValueError):
+        return None, None
+    if lat != lat or lon != lon: # NaN
+        return None, None
+    return lat, lon
+
+def needs_geocoding(entry):
+    lat, lon = get_coords(entry)
+    if lat is None or lon is None:
+        return True
+    return str(entry.get('geo_key', '')) != make_geo_key(entry)
+
+def geocode_entry(entry, geolocator, cache):
+    """
+    Geocodiert einen Eintrag und schreibt lat, lon, geo_precision und geo_key
+    direkt in den Datensatz zurück.
+    """
+    name = str(entry.get('schulname', '')).strip()
+    ort = str(entry.get('ort', '')).strip()
+    lat, lon, precision = None, None, ""
+
+    # Versuch 1: Exakte Suche (Schule + Ort)
+    clean_name = re.sub(r"\(.*?\)", "", name).strip()
+    with cassette_school(name, ort):
+        loc = geocode_cassette(geolocator, cache, f"{clean_name}, {ort}, Germany")
+
+    if loc:
+        lat, lon = loc
+        precision = GEO_PRECISION_EXACT
+    else:
+        # Versuch 2: NUR ORT (Fallback)
+        with cassette_school(name, ort):
+            loc_city = geocode_cassette(geolocator, cache, f"{ort}, Germany")
+        if loc_city:
+            # Streuung erst NACH dem Cache, damit dort die echte Stadtmitte liegt.
+            # Der gestreute Wert wird gespeichert -> Marker bleibt bei jedem Neubau an derselben Stelle.
+            lat = loc_city[0] + random.uniform(-0.015, 0.015)
+            lon = loc_city[1] + random.uniform(-0.015, 0.015)
+            precision = GEO_PRECISION_CITY
+
+    entry['lat'] = lat
+    entry['lon'] = lon
+    entry['geo_precision'] = precision
+    entry['geo_key'] = make_geo_key(entry)
+
+# Farbkategorien der Karte (Reihenfolge = Legende)
+MAP_CATEGORIES = [
+    ("purple", "Bilingual / bilingualer Schwerpunkt"),
+    ("blue", "Gymnasium"),
+    ("green", "Gesamtschule"),
+    ("orange", "Mix (Gym/HR)"),
+    ("red", "Realschule"),
+    ("gray", "Grundschule"),
+    ("beige", "Sonstige/Förder"),
+]
+MAP_NO_TYPE = "Ohne Schultyp"
+
+def map_color(schultyp, ki, kw):
+    st_lower = schultyp.lower()
+    full_text_scan = (ki + " " + kw).lower()
+    trigger_stems = ["bilingual", "zweisprachig"]
+
+    if any(stem in full_text_scan for stem in trigger_stems): return "purple"
+    if "gesamtschule" in st_lower: return "green"
+    if "gymnasium" in st_lower and ("haupt" in st_lower or "real" in st_lower or "verbund" in st_lower): return "orange"
+    if "gymnasium" in st_lower: return "blue"
+    if "realschule" in st_lower: return "red"
+    if "grundschule" in st_lower: return "gray"
+    return "beige"
+
+def map_web_link(entry):
+    web_link = str(entry.get('webseite', '')).strip() # HIER FIX: Sofort in String umwandeln
+    if web_link and web_link.lower() != 'nan' and web_link != "Nicht gefunden" and web_link.startswith("http"):
+        return web_link
+    return ""
+
+def map_cluster_mode(count):
+    """MAP_MODE: "classic" (ein Marker samt Popup je Schule), "cluster" oder "auto" (ab MAP_CLUSTER_THRESHOLD)."""
+    mode = str(CONFIG.get("MAP_MODE", "auto")).lower()
+    if mode == "auto": return count >= CONFIG.get("MAP_CLUSTER_THRESHOLD", 500)
+    return mode == "cluster"
+
+def map_title_html():
+    current_date = time.strftime("%d.%m.%Y")
+    return f"""
+     <div style="position: fixed; top: 15px; left: 60px; width: auto; height: auto; z-index:9999; font-size:16px; background-color:white; opacity:0.95; padding: 10px 15px; border: 2px solid grey; border-radius: 5px; box-shadow: 2px 2px 5px rgba(0,0,0,0.3);">
+     <b style="color: #333;">🗺️ Interaktive Schulkarte</b><br>
+     <span style="font-size:12px; color: #666;"><i>Datenstand: {current_date}</i></span>
+     </div>
+     """
+
+def add_classic_markers(m, points):
+    """Ein folium.Marker pro Schule, Popup-HTML direkt in der Datei (gut für kleine Listen)."""
+    import folium
+    from folium import Element
+
+    legend_rows = "".join(f'     <i style="color:{color}" class="fa fa-map-marker"></i> {label}<br>\n' for color, label in MAP_CATEGORIES)
+    legend_html = f"""
+     <div style="position: fixed; bottom: 50px; right: 50px; width: 200px; height: 180px; border:2px solid grey; z-index:9999; font-size:14px; background-color:white; opacity:0.9; padding: 10px;">
+     <b>Legende</b><br>
+{legend_rows}     </div>
+     """
+    m.get_root().html.add_child(Element(legend_html))
+
+    for p in points:
+        if p["web"]:
+            link_html = f'<a href="{p["web"]}" target="_blank" style="background-color:#007bff;color:white;padding:3px 8px;text-decoration:none;border-radius:3px;font-size:11px">Webseite öffnen</a>'
+        else:
+            link_html = '<span style="color:red; font-style:italic; font-size:11px;">(Keine Webseite hinterlegt)</span>'
+
+        # --- POPUP HTML ---
+        pos_hint = "<br><i style='color:red; font-size:10px'>(Position geschätzt/Stadtmitte)</i>" if p["approx"] else ""
+
+        html = f"""
+        <div style="font-family: Arial; width: 300px;">
+            <h4>{p["name"]}</h4>
+            <p style="color:grey; font-size:11px">{p["schultyp"]} {pos_hint}</p>
+            <hr>
+            <p><b>KW:</b> {p["kw"]}</p>
+            <div style="max-height:150px;overflow-y:auto;background:#f9f9f9;padding:5px;font-size:11px;border:1px solid #eee;">
+                {p["ki"]}
+            </div>
+            <br>
+            {link_html}
+        </div>
+        """
+
+        # Marker setzen
+        icon_type = "info-sign" if not p["approx"] else "question-sign"
+        folium.Marker(
+            [p["lat"], p["lon"]],
+            popup=folium.Popup(html, max_width=350),
+            icon=folium.Icon(color=p["color"], icon=icon_type)
+        ).add_to(m)
+
+# Läuft vor dem Cluster-Skript: Icons (einmal pro Farbe), Popups aus den gepackten Details
+MAP_CLUSTER_HEAD_JS = """
+<script>
+var SCHOOL_COLORS = __COLORS__;
+var SCHOOL_MARKERS = [];
+var SCHOOL_DETAILS = null;
+var SCHOOL_ICONS = {};
+
+function schoolIcon(color, approx) {
+    var key = color + "_" + approx;
+    if (!SCHOOL_ICONS[key]) SCHOOL_ICONS[key] = L.AwesomeMarkers.icon({markerColor: SCHOOL_COLORS[color], icon: approx ? "question-sign" : "info-sign", prefix: "glyphicon"});
+    return SCHOOL_ICONS[key];
+}
+
+function schoolEsc(s) {
+    return String(s).replace(/[&<>"']/g, function (c) { return {"&": "&amp;", "<": "&lt;", ">": "&gt;", '"': "&quot;", "'": "&#39;"}[c]; });
+}
+
+function schoolPopup(marker) {
+    var row = marker.row;
+    if (!SCHOOL_DETAILS) return "<i>Details werden geladen...</i>";
+    var d = SCHOOL_DETAILS[row[5]];
+    var link = /^https?:/.test(d[4])
+        ? '<a href="' + schoolEsc(d[4]) + '" target="_blank" style="background-color:#007bff;color:white;padding:3px 8px;text-decoration:none;border-radius:3px;font-size:11px">Webseite öffnen</a>'
+        : '<span style="color:red; font-style:italic; font-size:11px;">(Keine Webseite hinterlegt)</span>';
+    var hint = row[4] ? "<br><i style='color:red; font-size:10px'>(Position geschätzt/Stadtmitte)</i>" : "";
+    return '<div style="font-family: Arial; width: 300px;"><h4>' + schoolEsc(d[0]) + '</h4>'
+        + '<p style="color:grey; font-size:11px">' + schoolEsc(d[1]) + ' ' + hint + '</p><hr>'
+        + '<p><b>KW:</b> ' + schoolEsc(d[2]) + '</p>'
+        + '<div style="max-height:150px;overflow-y:auto;background:#f9f9f9;padding:5px;font-size:11px;border:1px solid #eee;">' + schoolEsc(d[3]) + '</div><br>'
+        + link + '</div>';
+}
+
+// Details (Name, Typ, Keywords, KI-Text, Webseite) liegen gzip+base64 in der Datei und werden erst nach dem Laden entpackt
+document.addEventListener("DOMContentLoaded", async function () {
+    var raw = atob(document.getElementById("school-details").textContent.trim());
+    var bytes = new Uint8Array(raw.length);
+    for (var i = 0; i < raw.length; i++) bytes[i] = raw.charCodeAt(i);
+    var stream = new Blob([bytes]).stream().pipeThrough(new DecompressionStream("gzip"));
+    SCHOOL_DETAILS = JSON.parse(await new Response(stream).text());
+});
+</script>
+"""
+
+MAP_CLUSTER_CALLBACK = """function (row) {
+    var marker = L.marker(new L.LatLng(row[0], row[1]), {icon: schoolIcon(row[2], row[4])});
+    marker.row = row;
+    marker.bindPopup(schoolPopup, {maxWidth: 350});
+    SCHOOL_MARKERS.push(marker);
+    return marker;
+}"""
+
+MAP_FILTER_JS = """
+<script>
+document.addEventListener("DOMContentLoaded", function () {
+    var cluster = __CLUSTER__;
+    var boxes = document.querySelectorAll("#school-filter input");
+    function apply() {
+        var colors = {}, types = {};
+        boxes.forEach(function (b) {
+            if (!b.checked) return;
+            if (b.dataset.color !== undefined) colors[b.dataset.color] = true; else types[b.dataset.type] = true;
+        });
+        var visible = SCHOOL_MARKERS.filter(function (m) {
+            return colors[m.row[2]] && m.row[3].some(function (t) { return types[t]; });
+        });
+        cluster.clearLayers();
+        cluster.addLayers(visible);
+        document.getElementById("school-filter-count").textContent = visible.length + " von " + SCHOOL_MARKERS.length + " Schulen";
+    }
+    boxes.forEach(function (b) { b.addEventListener("change", apply); });
+});
+</script>
+"""
+
+# Wie FastMarkerCluster, aber alle Marker auf einmal per addLayers statt einzeln per addTo:
+# nur so greift chunkedLoading und die Seite bleibt beim Aufbau großer Cluster bedienbar
+MAP_CLUSTER_TEMPLATE = """
+{% macro script(this, kwargs) %}
+    var {{ this.get_name() }} = (function(){
+        {{ this.callback }}
+        var data = {{ this.data|tojson }};
+        var cluster = L.markerClusterGroup({{ this.options|tojavascript }});
+        cluster.addTo({{ this._parent.get_name() }});
+        cluster.addLayers(data.map(callback));
+        return cluster;
+    })();
+{% endmacro %}"""
+
+def add_cluster_layer(m, points):
+    """
+    Skalierbare Karte: Marker als kompaktes JSON-Array in einem Marker-Cluster
+    ([lat, lon, farbe, [typen], geschätzt, id]), Popups werden erst im Browser aus
+    den gepackten Details gebaut. Die Legende ist zugleich Filter nach Farbe und Schultyp.
+    """
+    import base64
+    import gzip
+    from folium import Element
+    from folium.plugins import FastMarkerCluster
+    from folium.template import Template
+
+    class SchoolCluster(FastMarkerCluster):
+        _template = Template(MAP_CLUSTER_TEMPLATE)
+
+    colors = [color for color, _ in MAP_CATEGORIES]
+    type_counts = collections.Counter(t for p in points for t in p["types"])
+    types = sorted(type_counts, key=lambda t: (t == MAP_NO_TYPE, t))
+    type_idx = {t: n for n, t in enumerate(types)}
+
+    rows, details = [], []
+    for n, p in enumerate(points):
+        rows.append([round(p["lat"], 5), round(p["lon"], 5), colors.index(p["color"]),
+                     [type_idx[t] for t in p["types"]], int(p["approx"]), n])
+        details.append([p["name"], p["schultyp"], p["kw"], p["ki"], p["web"]])
+    packed = base64.b64encode(gzip.compress(json.dumps(details, ensure_ascii=False, separators=(",", ":")).encode("utf-8"))).decode("ascii")
+
+    root = m.get_root()
+    root.html.add_child(Element(f'<script type="application/octet-stream" id="school-details">{packed}</script>'))
+    root.html.add_child(Element(MAP_CLUSTER_HEAD_JS.replace("__COLORS__", json.dumps(colors))))
+
+    cluster = SchoolCluster(rows, callback=MAP_CLUSTER_CALLBACK, chunkedLoading=True)
+    cluster.add_to(m)
+
+    color_counts = collections.Counter(p["color"] for p in points)
+    color_rows = "".join(
+        f'<label><input type="checkbox" data-color="{n}" checked> <i style="color:{color}" class="fa fa-map-marker"></i> {label} ({color_counts[color]})</label><br>'
+        for n, (color, label) in enumerate(MAP_CATEGORIES))
+    type_rows = "".join(
+        f'<label><input type="checkbox" data-type="{type_idx[t]}" checked> {html_lib.escape(t)} ({type_counts[t]})</label><br>' for t in types)
+    filter_html = f"""
+     <div id="school-filter" style="position: fixed; bottom: 50px; right: 50px; width: 260px; max-height: 70vh; overflow-y: auto; border:2px solid grey; z-index:9999; font-size:13px; background-color:white; opacity:0.95; padding: 10px;">
+     <b>Legende / Filter</b><br>
+     {color_rows}
+     <hr><b>Schultyp</b><br>
+     {type_rows}
+     <hr><span id="school-filter-count" style="color:#666; font-size:11px">{len(points)} von {len(points)} Schulen</span>
+     </div>
+     """
+    root.html.add_child(Element(filter_html))
+    root.html.add_child(Element(MAP_FILTER_JS.replace("__CLUSTER__", cluster.get_name())))
+
 def generate_map(data):
     print("\n🗺️  Erstelle Landkarte (mit Fallback-Suche)...")
-    
+    import folium
+    from folium import Element
+    from geopy.geocoders import Nominatim
+
     # User-Agent muss eindeutig sein
     geolocator = Nominatim(user_agent=f"schul_scanner_{int(time.time())}")
-    
+
     # Karte zentrieren (Deutschland Mitte)
-    m = folium.Map(location=[51.1657, 10.4515], zoom_start=6) 
-    
-    # 1. LEGENDE 
-    legend_html = '''
-     <div style="position: fixed; bottom: 50px; right: 50px; width: 200px; height: 180px; border:2px solid grey; z-index:9999; font-size:14px; background-color:white; opacity:0.9; padding: 10px;">
-     <b>Legende</b><br>
-     <i style="color:purple" class="fa fa-map-marker"></i> Bilingual / bilingualer Schwerpunkt<br>
-     <i style="color:blue" class="fa fa-map-marker"></i> Gymnasium<br>
-     <i style="color:green" class="fa fa-map-marker"></i> Gesamtschule<br>
-     <i style="color:orange" class="fa fa-map-marker"></i> Mix (Gym/HR)<br>
-     <i style="color:red" class="fa fa-map-marker"></i> Realschule<br>
-     <i style="color:gray" class="fa fa-map-marker"></i> Grundschule<br>
-     <i style="color:beige" class="fa fa-map-marker"></i> Sonstige/Förder<br>
-     </div>
-     '''
-    m.get_root().html.add_child(Element(legend_html))
-    
+    m = folium.Map(location=[51.1657, 10.4515], zoom_start=6)
+
     # --- DATUMS-STEMPEL (TITEL) ---
-    current_date = time.strftime("%d.%m.%Y")
-    title_html = f'''
-     <div style="position: fixed; top: 15px; left: 60px; width: auto; height: auto; z-index:9999; font-size:16px; background-color:white; opacity:0.95; padding: 10px 15px; border: 2px solid grey; border-radius: 5px; box-shadow: 2px 2px 5px rgba(0,0,0,0.3);">
-     <b style="color: #333;">🗺️ Interaktive Schulkarte</b><br>
-     <span style="font-size:12px; color: #666;"><i>Datenstand: {current_date}</i></span>
-     </div>
-     '''
-    m.get_root().html.add_child(Element(title_html))
+    m.get_root().html.add_child(Element(map_title_html()))
 
-    count = 0
+    points = []
     missing_count = 0
-    
+    geocoded_count = 0
+    geo_cache = open_geocode_cache()
+
     print("   (Dieser Schritt kann dauern, um die OSM-Server nicht zu überlasten...)")
+    print("   (Bereits bekannte Orte kommen aus dem Cache und gehen schnell.)")
 
     for i, entry in enumerate(data):
         # in String umwandeln und Leerzeichen entfernen
         name = str(entry.get('schulname', '')).strip()
         ort = str(entry.get('ort', '')).strip()
-        
+
         # Ignoriere komplett leere oder 'nan' Einträge
-        if not name or name.lower() == 'nan': 
+        if not name or name.lower() == 'nan':
             continue
-        
+
         try:
-            # --- GEOCODING STRATEGIE ---
-            lat, lon = None, None
-            is_approx = False
-            
-            # Versuch 1: Exakte Suche (Schule + Ort)
-            clean_name = re.sub(r"\(.*?\)", "", name).strip()
-            query = f"{clean_name}, {ort}, Germany"
-            loc = geolocator.geocode(query, timeout=10)
-            
-            if loc:
-                lat, lon = loc.latitude, loc.longitude
-            else:
-                # Versuch 2: NUR ORT (Fallback)
-                loc_city = geolocator.geocode(f"{ort}, Germany", timeout=10)
-                if loc_city:
-                    lat = loc_city.latitude
-                    lon = loc_city.longitude
-                    lat += random.uniform(-0.015, 0.015) 
-                    lon += random.uniform(-0.015, 0.015)
-                    is_approx = True
-            
-            if not lat or not lon:
+            # --- GEOCODING (nur neue oder geänderte Einträge) ---
+            if needs_geocoding(entry):
+                geocode_entry(entry, geolocator, geo_cache)
+                geocoded_count += 1
+
+            lat, lon = get_coords(entry)
+
+            if lat is None or lon is None:
                 print(f"   ❌ Ort nicht gefunden: {ort} (Schule: {name})")
                 missing_count += 1
                 continue
@@ -671,80 +2725,37 @@ def generate_map(data):
             schultyp = str(entry.get('schultyp', 'Unbekannt'))
             ki = str(entry.get('ki_zusammenfassung', 'Keine Analyse'))
             kw = str(entry.get('keywords', '-'))
-            st_lower = schultyp.lower()
-            full_text_scan = (ki + " " + kw).lower()
-        
-            # Farb-Logik 
-            trigger_stems = ["bilingual", "zweisprachig"]
-        
-            if any(stem in full_text_scan for stem in trigger_stems): 
-                color = "purple"
-            elif "gesamtschule" in st_lower: 
-                color = "green"
-            elif "gymnasium" in st_lower and ("haupt" in st_lower or "real" in st_lower or "verbund" in st_lower): 
-                color = "orange"
-            elif "gymnasium" in st_lower: 
-                color = "blue"
-            elif "realschule" in st_lower: 
-                color = "red"
-            elif "grundschule" in st_lower: 
-                color = "gray"
-            else: 
-                color = "beige"
-            
-           # --- WEBSEITEN-LINK LOGIK ---
-            web_link = str(entry.get('webseite', '')).strip() # HIER FIX: Sofort in String umwandeln
-            
-            if web_link and web_link.lower() != 'nan' and web_link != "Nicht gefunden" and web_link.startswith("http"):
-                link_html = f'<a href="{web_link}" target="_blank" style="background-color:#007bff;color:white;padding:3px 8px;text-decoration:none;border-radius:3px;font-size:11px">Webseite öffnen</a>'
-            else:
-                link_html = '<span style="color:red; font-style:italic; font-size:11px;">(Keine Webseite hinterlegt)</span>'
-            
-            # --- POPUP HTML ---
-            pos_hint = "<br><i style='color:red; font-size:10px'>(Position geschätzt/Stadtmitte)</i>" if is_approx else ""
-            
-            html = f"""
-            <div style="font-family: Arial; width: 300px;">
-                <h4>{name}</h4>
-                <p style="color:grey; font-size:11px">{schultyp} {pos_hint}</p>
-                <hr>
-                <p><b>KW:</b> {kw}</p>
-                <div style="max-height:150px;overflow-y:auto;background:#f9f9f9;padding:5px;font-size:11px;border:1px solid #eee;">
-                    {ki}
-                </div>
-                <br>
-                {link_html}
-            </div>
-            """
-            
-            # Marker setzen
-            icon_type = "info-sign" if not is_approx else "question-sign"
-            folium.Marker(
-                [lat, lon], 
-                popup=folium.Popup(html, max_width=350), 
-                icon=folium.Icon(color=color, icon=icon_type)
-            ).add_to(m)
-            
-            count += 1
-            
-            
-            
+            types = [t.strip() for t in schultyp.split(",") if t.strip() and t.strip().lower() not in ("nan", "unbekannt")]
+            points.append({
+                "lat": lat, "lon": lon, "name": name, "schultyp": schultyp, "ki": ki, "kw": kw,
+                "color": map_color(schultyp, ki, kw), "types": types or [MAP_NO_TYPE],
+                "approx": entry.get('geo_precision') == GEO_PRECISION_CITY, "web": map_web_link(entry),
+            })
+
             # Fortschritt alle 50 Schulen anzeigen
-            if count % 50 == 0:
-                print(f"   ... {count} Schulen platziert ...")
-                
-            # WICHTIG: Höflichkeitspause für OSM dynamisch aus der Config
-            delay = CONFIG.get("MAP_DELAY", 1.5)
-            time.sleep(delay) 
+            if len(points) % 50 == 0:
+                print(f"   ... {len(points)} Schulen platziert ...")
 
         except Exception as e:
             # Fehler ausgeben, statt pass
             print(f"   ⚠️ Fehler bei {name}: {e}")
             pass
 
+    geo_cache.close()
+
+    # Koordinaten in der Ergebnisliste sichern -> nächster Durchlauf startet nicht bei Null
+    if geocoded_count:
+        save_data(data)
+
+    if map_cluster_mode(len(points)):
+        add_cluster_layer(m, points)
+    else:
+        add_classic_markers(m, points)
+
     m.save(CONFIG["MAP_FILE"])
     print(f"\n✅ Karte gespeichert: '{CONFIG['MAP_FILE']}'")
-    print(f"   📊 Ergebnis: {count} platziert, {missing_count} ohne Ort.")
+    print(f"   📊 Ergebnis: {len(points)} platziert, {missing_count} ohne Ort, {geocoded_count} neu geocodiert.")
+    save_cassettes()
 
 # --- MENU HELPERS ---
 
@@ -770,6 +2781,7 @@ def manage_list_setting(key_name, display_name):
             if input("   ⚠️ Sicher? (j/n): ").lower() == "j":
                 new_full = input("   Neue Liste (kommagetrennt): ")
                 CONFIG[key_name] = [x.strip() for x in new_full.split(",") if x.strip()]
+        reset_text_matcher() # Keyword-/Schultyp-Erkennung mit der neuen Liste neu kompilieren
         save_config_to_file(CONFIG)
 
 def menu_settings():
@@ -811,45 +2823,114 @@ def menu_settings():
 
 # --- RUNNERS ---
 
+KI_PENDING_KEY = "_ki_kontext"
+
+class ScanAborted(Exception):
+    """Scan wurde zwischen zwei Stufen abgebrochen (STRG+C im Parallel-Modus)."""
+
+def scan_entry(driver, entry, defer_ki=False, stop=None):
+    """
+    Scannt eine einzelne Schule (Suche, Crawl, KI) und liefert die neuen
+    Feldwerte als Dict. Der Eintrag selbst wird NICHT verändert, damit
+    parallele Worker ihre Ergebnisse sicher im Haupt-Thread einspielen können.
+    Mit defer_ki=True (Batch-Modus) bleibt die KI offen; der Kontext steht dann
+    unter KI_PENDING_KEY im Ergebnis. Ist `stop` gesetzt, gibt es keine (bezahlte) KI-Anfrage mehr.
+    """
+    url, typ, kw, ctx = crawl_and_analyze(driver, entry['schulname'], entry['ort'], reusable_url(entry))
+    if stop is not None and stop.is_set(): raise ScanAborted()
+    result = {'webseite': url, 'schultyp': typ, 'keywords': kw}
+
+    print(f"      -> Typ: {typ if typ else '-'}")
+    print(f"      -> KW:  {kw if kw else '-'}")
+
+    if defer_ki and (typ or kw) and ctx:
+        result[KI_PENDING_KEY] = ctx
+    else:
+        result['ki_zusammenfassung'] = summarize_scan(typ, kw, ctx)
+    return result
+
+def ki_batch_size():
+    size = int(CONFIG.get("KI_BATCH_SIZE", 0) or 0)
+    return size if size > 1 else 0
+
+def flush_ki_batch(data, ki_batch):
+    """Schickt gesammelte Kontexte als Batch an die KI und speichert die fertigen Schulen."""
+    if not ki_batch: return
+    print(f"      🧠 KI-Batch mit {len(ki_batch)} Schulen...")
+    answers = ki_analyse_batch([ctx for _, _, ctx in ki_batch])
+    for (i, result, _), answer in zip(ki_batch, answers):
+        result['ki_zusammenfassung'] = answer
+        data[i].update(result)
+        save_entry(data[i], i)
+    ki_batch.clear()
+
+def merge_scan_result(data, i, result, ki_batch):
+    """Übernimmt ein Scan-Ergebnis; im Batch-Modus wartet es ggf. noch auf die KI."""
+    ctx = result.pop(KI_PENDING_KEY, None)
+    if ctx is None:
+        data[i].update(result)
+        save_entry(data[i], i) # Jede fertige Schule sofort sichern
+        return
+    ki_batch.append((i, result, ctx))
+    if len(ki_batch) >= ki_batch_size():
+        flush_ki_batch(data, ki_batch)
+
+def summarize_scan(typ, kw, ctx):
+    """KI-Schritt des Auto-Scans inkl. der Platzhalter-Texte, wenn es nichts zu analysieren gibt."""
+    if (typ or kw) and ctx:
+        if CONFIG["SENSITIVITY"] == "strict" and not ctx:
+            return "Zu wenige Infos (Strict Filter)"
+        print("      🧠 Kontext gefunden -> KI...")
+        return ki_analyse(ctx)
+    return "Zu wenige Infos (Strict Filter)" if CONFIG["SENSITIVITY"] == "strict" else "Keine relevanten Daten gefunden"
+
 def run_auto_scan(data):
+    reset_metrics()
+    set_metrics_export(True)
+    try:
+        return _run_auto_scan(data)
+    finally:
+        set_metrics_export(False)
+
+def _run_auto_scan(data):
     print(f"\n🤖 AUTO-SCAN V13.1 (Safe Mode) | Sensibilität: {CONFIG['SENSITIVITY'].upper()}")
+    if cassette_mode():
+        print(f"📼 Kassetten-Modus: {cassette_mode()} ('{CONFIG.get('CASSETTE_DIR', 'cassettes')}')")
+    
+    if CONFIG.get("WORK_QUEUE", False):
+        return run_auto_scan_queue()
     
     start_idx = CONFIG.get("AUTO_RESUME_IDX", 0)
     if start_idx >= len(data): start_idx = 0
     
     print(f"ℹ️ Start bei Zeile {start_idx + 1} von {len(data)}. Drücke STRG+C zum Pausieren.")
+
+    workers = max(1, int(CONFIG.get("SCAN_WORKERS", 1)))
+    if CONFIG.get("PIPELINE_MODE", False):
+        return run_auto_scan_pipeline(data, start_idx, workers)
+    if workers > 1:
+        return run_auto_scan_parallel(data, start_idx, workers)
     
-    driver = get_driver()
-    unsaved_changes = False 
+    driver = get_shared_driver()
+    batching = ki_batch_size() > 0
+    ki_batch = [] # (index, ergebnis, kontext) - Schulen, die noch auf die KI warten
+    completed = False
     
     try:
         for i in range(start_idx, len(data)):
             entry = data[i]
-            CONFIG["AUTO_RESUME_IDX"] = i
+            # Schulen im KI-Batch sind noch nicht fertig -> dort wieder einsteigen
+            CONFIG["AUTO_RESUME_IDX"] = ki_batch[0][0] if ki_batch else i
             
             if not is_entry_empty(entry, CONFIG):
                 continue
             
             print(f"\n[{i+1}/{len(data)}] {entry['schulname']}...")
+            driver = revive_driver(driver)
             
             # --- DER SCHUTZSCHILD: Jeder einzelne Scan wird abgesichert ---
             try:
-                url, typ, kw, ctx = crawl_and_analyze(driver, entry['schulname'], entry['ort'])
-                
-                entry['webseite'] = url; entry['schultyp'] = typ; entry['keywords'] = kw
-                unsaved_changes = True
-
-                print(f"      -> Typ: {typ if typ else '-'}")
-                print(f"      -> KW:  {kw if kw else '-'}")
-
-                if (typ or kw) and ctx:
-                    if CONFIG["SENSITIVITY"] == "strict" and not ctx:
-                        entry['ki_zusammenfassung'] = "Zu wenige Infos (Strict Filter)"
-                    else:
-                        print("      🧠 Kontext gefunden -> KI...")
-                        entry['ki_zusammenfassung'] = ki_analyse(ctx)
-                else:
-                    entry['ki_zusammenfassung'] = "Zu wenige Infos (Strict Filter)" if CONFIG["SENSITIVITY"] == "strict" else "Keine relevanten Daten gefunden"
+                merge_scan_result(data, i, scan_entry(driver, entry, defer_ki=batching), ki_batch)
                 
             except Exception as inner_e:
                 # Fehler abfangen, ins Log schreiben und einfach weitermachen!
@@ -859,34 +2940,427 @@ def run_auto_scan(data):
                 
                 # Wir markieren den Eintrag als fehlerhaft, damit wir ihn später filtern können
                 entry['ki_zusammenfassung'] = "Absturz während des Scans" 
+                save_entry(entry, i)
+                driver = get_shared_driver() # Browser abgestürzt? -> wird hier neu gestartet
                 continue # Springt sofort zur nächsten Schule
             # --- ENDE SCHUTZSCHILD ---
 
             if (i + 1) % 10 == 0:
-                print("      💾 Zwischenspeicherung (Backup & Save)...")
-                save_data(data)
                 save_config_to_file(CONFIG)
-                unsaved_changes = False
+
+        completed = True
+        flush_ki_batch(data, ki_batch)
             
     except KeyboardInterrupt:
+        # Schulen im offenen KI-Batch werden verworfen (AUTO_RESUME_IDX zeigt auf die erste davon)
         print("\n🛑 PAUSE durch Benutzer! Speichere den exakten Stand...")
-        save_data(data)
         save_config_to_file(CONFIG)
-        unsaved_changes = False
     except Exception as fatal_e:
         
         print(f"\n🚨 KRITISCHER FEHLER! Skript wurde abgebrochen. Details im Log.")
         logging.critical(f"Kritischer Systemabsturz:\n{traceback.format_exc()}")
     finally:
-        if unsaved_changes:
-            print("💾 Letzte Änderungen werden gespeichert...")
-            save_data(data)
-        
-        if CONFIG.get("AUTO_RESUME_IDX", 0) >= len(data) - 1:
+        if completed and CONFIG.get("AUTO_RESUME_IDX", 0) >= len(data) - 1:
             CONFIG["AUTO_RESUME_IDX"] = 0
             
         save_config_to_file(CONFIG)
-        if driver: driver.quit()
+
+def run_auto_scan_parallel(data, start_idx, workers):
+    """
+    Auto-Scan mit einem Pool aus `workers` Chrome-Instanzen.
+    Jeder Worker leiht sich einen Browser aus dem Pool, scannt eine Schule und gibt
+    ihn zurück. Ergebnisse werden ausschließlich im Haupt-Thread in `data` übernommen.
+    AUTO_RESUME_IDX zeigt immer auf die kleinste noch nicht fertige Zeile, auch wenn
+    Worker in anderer Reihenfolge fertig werden.
+    """
+    print(f"⚡ Parallel-Modus: {workers} Browser gleichzeitig (SCAN_WORKERS in config.json).")
+
+    driver_pool = queue.Queue()
+    drivers = borrow_drivers(workers)
+    for slot in range(len(drivers)): driver_pool.put(slot) # Plätze statt Browser -> abgestürzte lassen sich ersetzen
+    if not drivers:
+        print("❌ Kein Browser verfügbar. Abbruch.")
+        return
+
+    batching = ki_batch_size() > 0
+    ki_batch = [] # (index, ergebnis, kontext) - Schulen, die noch auf die KI warten
+    stop = threading.Event()
+
+    def worker(i):
+        if stop.is_set(): raise ScanAborted()
+        slot = driver_pool.get()
+        try:
+            print(f"\n[{i+1}/{len(data)}] {data[i]['schulname']}...")
+            drivers[slot] = revive_driver(drivers[slot])
+            return scan_entry(drivers[slot], data[i], defer_ki=batching, stop=stop)
+        finally:
+            driver_pool.put(slot)
+
+    pending = {}       # future -> index
+    next_idx = start_idx
+    unsaved = 0
+    executor = ThreadPoolExecutor(max_workers=len(drivers))
+
+    def resume_idx():
+        # Alles unterhalb der kleinsten offenen Zeile (laufender Scan oder offener KI-Batch) ist fertig
+        open_rows = list(pending.values()) + [i for i, _, _ in ki_batch]
+        return min(open_rows) if open_rows else next_idx
+
+    try:
+        while next_idx < len(data) or pending:
+            # Fenster auffüllen (begrenzt, damit STRG+C nicht tausende Aufträge verwerfen muss)
+            while next_idx < len(data) and len(pending) < len(drivers) * 2:
+                if is_entry_empty(data[next_idx], CONFIG):
+                    pending[executor.submit(worker, next_idx)] = next_idx
+                next_idx += 1
+
+            if not pending:
+                break
+
+            done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for fut in done:
+                i = pending.pop(fut)
+                entry = data[i]
+                try:
+                    merge_scan_result(data, i, fut.result(), ki_batch)
+                except Exception:
+                    print(f"      ⚠️ Fehler bei {entry.get('schulname')}! Überspringe... (Siehe Log)")
+                    logging.error(f"Fehler bei Index {i} ({entry.get('schulname')}):\n{traceback.format_exc()}")
+                    entry['ki_zusammenfassung'] = "Absturz während des Scans"
+                    save_entry(entry, i)
+                unsaved += 1
+
+            CONFIG["AUTO_RESUME_IDX"] = resume_idx()
+
+            if unsaved >= 10:
+                save_config_to_file(CONFIG)
+                unsaved = 0
+
+        flush_ki_batch(data, ki_batch)
+
+    except KeyboardInterrupt:
+        print("\n🛑 PAUSE durch Benutzer! Speichere den exakten Stand...")
+        # Laufende Schulen (und ein offener KI-Batch) werden verworfen und beim nächsten Start erneut gescannt
+        CONFIG["AUTO_RESUME_IDX"] = resume_idx()
+    except Exception:
+        print(f"\n🚨 KRITISCHER FEHLER! Skript wurde abgebrochen. Details im Log.")
+        logging.critical(f"Kritischer Systemabsturz:\n{traceback.format_exc()}")
+        CONFIG["AUTO_RESUME_IDX"] = resume_idx()
+    finally:
+        # Keine neuen Stufen mehr starten; laufende Schulen kurz zu Ende laufen lassen, erst dann die Browser schließen
+        stop.set()
+        executor.shutdown(wait=False, cancel_futures=True)
+        wait_for_workers(pending)
+
+        if not pending and not ki_batch and next_idx >= len(data):
+            CONFIG["AUTO_RESUME_IDX"] = 0
+
+        save_config_to_file(CONFIG)
+        release_drivers(drivers)
+
+def wait_for_workers(futures=(), threads=()):
+    """Wartet nach einem Abbruch höchstens SCAN_STOP_TIMEOUT Sekunden auf laufende Worker."""
+    deadline = time.monotonic() + CONFIG.get("SCAN_STOP_TIMEOUT", 15)
+    futures = [f for f in futures if not f.done()]
+    threads = [t for t in threads if t.is_alive()]
+    if not futures and not threads: return
+    print(f"   ⏳ Warte auf {len(futures) + len(threads)} laufende Worker...")
+    if futures: wait(futures, timeout=max(0.0, deadline - time.monotonic()))
+    for t in threads: t.join(max(0.0, deadline - time.monotonic()))
+
+def _queue_put(q, item, stop):
+    """put() auf eine begrenzte Queue, das bei STRG+C nicht ewig blockiert."""
+    while True:
+        try:
+            q.put(item, timeout=0.2)
+            return True
+        except queue.Full:
+            if stop.is_set(): return False
+
+def _start_stage(name, func, in_q, out_q, workers, next_workers, stop):
+    """
+    Startet `workers` Threads, die Aufträge aus `in_q` bearbeiten und an `out_q` weiterreichen.
+    Sind alle Threads fertig, bekommt die nächste Stufe ein Ende-Signal (None) pro Worker.
+    Fehlerhafte Aufträge werden nicht weiterbearbeitet, sondern nur noch durchgereicht.
+    """
+    def worker(*args):
+        while not stop.is_set():
+            try:
+                job = in_q.get(timeout=0.2)
+            except queue.Empty:
+                continue
+            if job is None: break
+            if not job.get('error'):
+                try:
+                    func(job, *args)
+                except Exception:
+                    job['error'] = traceback.format_exc()
+            _queue_put(out_q, job, stop)
+
+    def closer(threads):
+        for t in threads: t.join()
+        for _ in range(next_workers): _queue_put(out_q, None, stop)
+
+    threads = []
+    for n, extra in enumerate(workers):
+        t = threading.Thread(target=worker, args=extra, name=f"{name}-{n}", daemon=True)
+        t.start()
+        threads.append(t)
+    threading.Thread(target=closer, args=(threads,), name=f"{name}-closer", daemon=True).start()
+    return list(threads) # Kopie: der Aufrufer hängt weitere Stufen an, der Closer darf nur auf seine eigenen warten
+
+def run_auto_scan_pipeline(data, start_idx, crawl_workers):
+    """
+    Auto-Scan als Fließband: Suche -> Crawl -> KI -> Speichern.
+    Zwischen den Stufen liegen begrenzte Queues, jede Stufe hat eigene Worker.
+    So läuft die KI-Anfrage für Schule A, während der Browser schon Schule B lädt.
+    Gespeichert wird ausschließlich im Haupt-Thread; AUTO_RESUME_IDX zeigt auf die
+    kleinste Schule, die noch nicht komplett durch alle Stufen ist.
+    """
+    search_workers = max(1, int(CONFIG.get("PIPELINE_SEARCH_WORKERS", 2)))
+    ki_workers = max(1, int(CONFIG.get("PIPELINE_KI_WORKERS", 2)))
+    q_size = max(1, int(CONFIG.get("PIPELINE_QUEUE_SIZE", 8)))
+    print(f"🏭 Pipeline-Modus: {search_workers}x Suche | {crawl_workers}x Browser | {ki_workers}x KI")
+
+    drivers = borrow_drivers(crawl_workers)
+    if not drivers:
+        print("❌ Kein Browser verfügbar. Abbruch.")
+        return
+
+    stop = threading.Event()
+    search_q, crawl_q, ki_q, result_q = (queue.Queue(maxsize=q_size) for _ in range(4))
+    in_flight = set()
+    in_flight_lock = threading.Lock()
+    feeder_pos = [start_idx] # nächste noch nicht eingespeiste Zeile
+
+    # Jede Stufe ordnet ihre Aufnahmen der Schule zu (wie crawl_and_analyze im normalen Auto-Scan)
+    def do_search(job):
+        entry = data[job['idx']]
+        with cassette_school(entry['schulname'], entry['ort']):
+            job['url'] = find_school_url(entry['schulname'], entry['ort'], reusable_url(entry))
+
+    def do_crawl(job, slot):
+        entry = data[job['idx']]
+        drivers[slot] = revive_driver(drivers[slot])
+        with cassette_school(entry['schulname'], entry['ort']):
+            url, typ, kw, ctx = crawl_url(drivers[slot], job['url'])
+            cassette_owns_context(ctx)
+        job['result'] = {'webseite': url, 'schultyp': typ, 'keywords': kw}
+        job['ctx'] = ctx
+
+    def do_ki(job):
+        if stop.is_set(): raise ScanAborted() # schon abgebrochen -> keine bezahlte Anfrage mehr
+        entry = data[job['idx']]
+        r = job['result']
+        with cassette_school(entry['schulname'], entry['ort']):
+            r['ki_zusammenfassung'] = summarize_scan(r['schultyp'], r['keywords'], job.pop('ctx'))
+
+    def feeder():
+        for i in range(start_idx, len(data)):
+            if stop.is_set(): return
+            if is_entry_empty(data[i], CONFIG):
+                with in_flight_lock: in_flight.add(i)
+                if not _queue_put(search_q, {'idx': i}, stop): return
+            feeder_pos[0] = i + 1
+        for _ in range(search_workers): _queue_put(search_q, None, stop)
+
+    def resume_idx():
+        with in_flight_lock:
+            return min(in_flight) if in_flight else feeder_pos[0]
+
+    threading.Thread(target=feeder, name="feeder", daemon=True).start()
+    stage_threads = _start_stage("suche", do_search, search_q, crawl_q, [()] * search_workers, len(drivers), stop)
+    stage_threads += _start_stage("crawl", do_crawl, crawl_q, ki_q, [(slot,) for slot in range(len(drivers))], ki_workers, stop)
+    stage_threads += _start_stage("ki", do_ki, ki_q, result_q, [()] * ki_workers, 1, stop)
+
+    # --- Stufe 4: Speichern (Haupt-Thread) ---
+    unsaved = 0
+    finished = False
+    try:
+        while True:
+            try:
+                job = result_q.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            if job is None:
+                finished = True
+                break
+
+            i = job['idx']
+            entry = data[i]
+            if job.get('error'):
+                print(f"      ⚠️ Fehler bei {entry.get('schulname')}! Überspringe... (Siehe Log)")
+                logging.error(f"Fehler bei Index {i} ({entry.get('schulname')}):\n{job['error']}")
+                entry['ki_zusammenfassung'] = "Absturz während des Scans"
+            else:
+                entry.update(job['result'])
+                print(f"[{i+1}/{len(data)}] ✅ {entry['schulname']} -> {job['result']['webseite']}")
+            save_entry(entry, i)
+
+            with in_flight_lock: in_flight.discard(i)
+            CONFIG["AUTO_RESUME_IDX"] = resume_idx()
+            unsaved += 1
+
+            if unsaved >= 10:
+                save_config_to_file(CONFIG)
+                unsaved = 0
+
+    except KeyboardInterrupt:
+        print("\n🛑 PAUSE durch Benutzer! Speichere den exakten Stand...")
+    except Exception:
+        print(f"\n🚨 KRITISCHER FEHLER! Skript wurde abgebrochen. Details im Log.")
+        logging.critical(f"Kritischer Systemabsturz:\n{traceback.format_exc()}")
+    finally:
+        # Schulen, die noch in einer Stufe stecken, werden verworfen und beim nächsten Start neu gescannt
+        stop.set()
+        wait_for_workers(threads=stage_threads) # Browser erst schließen, wenn die Crawl-Worker sie losgelassen haben
+        CONFIG["AUTO_RESUME_IDX"] = 0 if finished else resume_idx()
+        save_config_to_file(CONFIG)
+        release_drivers(drivers)
+
+# --- VERTEILTE ARBEITSWARTESCHLANGE (Leases) ---
+# Statt eines globalen AUTO_RESUME_IDX reserviert jeder Worker ein paar Schulen mit Ablaufzeit
+# (Lease) in der Tabelle `work` der Ergebnis-Datenbank. Solange er scannt, verlängert ein
+# Heartbeat die Leases; stirbt er, laufen sie ab und ein anderer Worker übernimmt.
+
+def worker_id():
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+CLAIM_SQL = """
+    SELECT s.key_name, s.key_ort, s.pos, s.data FROM schulen s
+    LEFT JOIN work w ON w.key_name = s.key_name AND w.key_ort = s.key_ort
+    WHERE s.pos >= ?
+      AND (w.key_name IS NULL OR (w.expires < ? AND (w.attempted IS NULL OR w.attempted < ?)))
+    ORDER BY s.pos
+"""
+
+def claim_work(owner, count, from_pos=0):
+    """
+    Reserviert bis zu `count` offene Schulen ab Position `from_pos` (atomar, BEGIN IMMEDIATE).
+    Abgelaufene Leases anderer Worker gelten als frei. Liefert [(pos, entry), ...].
+    """
+    now = time.time()
+    retry_before = now - CONFIG.get("WORK_QUEUE_RETRY_HOURS", 24) * 3600
+    expires = now + CONFIG.get("WORK_QUEUE_LEASE_SECONDS", 600)
+    with _result_db_lock:
+        conn = get_result_db()
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            claimed = []
+            for name, ort, pos, raw in conn.execute(CLAIM_SQL, (from_pos, now, retry_before)):
+                entry = json.loads(raw)
+                if is_entry_empty(entry, CONFIG):
+                    claimed.append((name, ort, pos, entry))
+                    if len(claimed) >= count: break
+            conn.executemany("""
+                INSERT INTO work (key_name, key_ort, owner, expires) VALUES (?, ?, ?, ?)
+                ON CONFLICT (key_name, key_ort) DO UPDATE SET owner = excluded.owner, expires = excluded.expires
+            """, [(name, ort, owner, expires) for name, ort, _, _ in claimed])
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+    return [(pos, entry) for _, _, pos, entry in claimed]
+
+def heartbeat_work(owner):
+    """Verlängert alle Leases dieses Workers."""
+    expires = time.time() + CONFIG.get("WORK_QUEUE_LEASE_SECONDS", 600)
+    with _result_db_lock:
+        conn = get_result_db()
+        with conn:
+            conn.execute("UPDATE work SET expires = ? WHERE owner = ? AND expires > 0", (expires, owner))
+
+def commit_work(owner, entry):
+    """
+    Speichert das Ergebnis und gibt die Lease frei - aber nur, wenn die Schule nicht
+    inzwischen (nach abgelaufener Lease) ein anderer Worker übernommen hat.
+    """
+    key = entry_key(entry)
+    now = time.time()
+    with measure("speichern"), _result_db_lock:
+        conn = get_result_db()
+        with conn:
+            row = conn.execute("SELECT owner, expires FROM work WHERE key_name = ? AND key_ort = ?", key).fetchone()
+            if row and row[0] not in (owner, None) and row[1] > now:
+                return False
+            conn.execute("UPDATE schulen SET data = ?, updated = ? WHERE key_name = ? AND key_ort = ?",
+                         (json.dumps(entry, ensure_ascii=False, default=str), now, *key))
+            conn.execute("""
+                INSERT INTO work (key_name, key_ort, owner, expires, attempted) VALUES (?, ?, NULL, 0, ?)
+                ON CONFLICT (key_name, key_ort) DO UPDATE SET owner = NULL, expires = 0, attempted = excluded.attempted
+            """, (*key, now))
+    return True
+
+def release_work(owner):
+    """Gibt alle noch offenen Leases dieses Workers sofort frei (z.B. bei STRG+C)."""
+    with _result_db_lock:
+        conn = get_result_db()
+        with conn:
+            conn.execute("UPDATE work SET owner = NULL, expires = 0 WHERE owner = ? AND expires > 0", (owner,))
+
+def next_foreign_lease_expiry(owner):
+    """Sekunden bis die nächste Lease eines anderen Workers abläuft, None = keine aktiv."""
+    with _result_db_lock:
+        row = get_result_db().execute("SELECT MIN(expires) FROM work WHERE expires > ? AND owner != ?",
+                                      (time.time(), owner)).fetchone()
+    return None if row[0] is None else max(1.0, row[0] - time.time())
+
+def run_auto_scan_queue():
+    """
+    Auto-Scan als Worker an der gemeinsamen Warteschlange. Beliebig viele Instanzen
+    (auch auf anderen Rechnern mit derselben RESULT_DB_FILE) können parallel laufen.
+    """
+    owner = worker_id()
+    batch = max(1, int(CONFIG.get("WORK_QUEUE_BATCH", 5)))
+    lease = CONFIG.get("WORK_QUEUE_LEASE_SECONDS", 600)
+    print(f"🧾 Warteschlangen-Modus: Worker {owner} | {batch} Schulen pro Reservierung, Lease {lease}s")
+
+    driver = get_shared_driver()
+    stop = threading.Event()
+
+    def heartbeat():
+        while not stop.wait(lease / 3):
+            try: heartbeat_work(owner)
+            except Exception: logging.error(f"Heartbeat fehlgeschlagen:\n{traceback.format_exc()}")
+
+    threading.Thread(target=heartbeat, name="work-heartbeat", daemon=True).start()
+    done, cursor = 0, 0
+    try:
+        while True:
+            claimed = claim_work(owner, batch, cursor)
+            if not claimed and cursor:
+                cursor = 0 # vorne könnten abgelaufene Leases frei geworden sein
+                continue
+            if not claimed:
+                wait_s = next_foreign_lease_expiry(owner)
+                if wait_s is None: break
+                print(f"   ⏳ Rest ist bei anderen Workern in Arbeit. Prüfe in {min(wait_s, 30):.0f}s erneut...")
+                time.sleep(min(wait_s, 30))
+                continue
+
+            for pos, entry in claimed:
+                print(f"\n[{pos+1}] {entry['schulname']}...")
+                driver = revive_driver(driver)
+                try:
+                    entry.update(scan_entry(driver, entry))
+                except Exception:
+                    print(f"      ⚠️ Fehler bei dieser Schule! Überspringe... (Siehe Log)")
+                    logging.error(f"Fehler bei {entry.get('schulname')}:\n{traceback.format_exc()}")
+                    entry['ki_zusammenfassung'] = "Absturz während des Scans"
+                    driver = get_shared_driver()
+                if commit_work(owner, entry): done += 1
+                else: print("      ⚠️ Lease verloren - Ergebnis verworfen, ein anderer Worker hat übernommen.")
+            cursor = claimed[-1][0] + 1
+
+        print(f"\n✅ Warteschlange leer. {done} Schulen von diesem Worker bearbeitet.")
+    except KeyboardInterrupt:
+        print(f"\n🛑 PAUSE durch Benutzer! {done} Schulen gespeichert, offene Reservierungen werden freigegeben.")
+    except Exception:
+        print(f"\n🚨 KRITISCHER FEHLER! Skript wurde abgebrochen. Details im Log.")
+        logging.critical(f"Kritischer Systemabsturz:\n{traceback.format_exc()}")
+    finally:
+        stop.set()
+        release_work(owner)
 
 def run_manual_review(data):
     # Lade aktuellen Startpunkt aus der Config
@@ -977,27 +3451,27 @@ def run_manual_review(data):
                 c = input("   👉 Wahl: ").strip()
                 
                 if c == "1":
-                    if not driver: driver = get_driver()
+                    driver = get_shared_driver()
                     url, typ, kw, ctx = crawl_and_analyze(driver, entry['schulname'], entry['ort'])
                     entry['webseite'] = url; entry['schultyp'] = typ; entry['keywords'] = kw
                     entry['ki_zusammenfassung'] = ki_analyse(ctx) if ctx else "Nicht gefunden"
-                    save_data(data); break 
+                    save_entry(entry, i); break 
 
                 elif c == "2":
                     curr = entry.get('webseite', '')
                     u = input("   🔗 URL (Enter = behalten): ").strip()
                     target_url = u if u.startswith("http") else curr
                     if target_url and target_url != "Nicht gefunden":
-                        if not driver: driver = get_driver()
-                        t, text, _ = get_selenium_content(driver, target_url)
+                        driver = get_shared_driver()
+                        t, text, _ = get_page_content(driver, target_url)
                         entry['ki_zusammenfassung'] = ki_analyse(text[:15000]) if text else "Inhalt leer"
-                        save_data(data)
+                        save_entry(entry, i)
                     break
 
                 elif c == "3": 
                     u = input("   🔗 URL eingeben: ").strip()
                     if u.startswith("http"):
-                        if not driver: driver = get_driver()
+                        driver = get_shared_driver()
                         print(f"   🤖 Starte Deep-Scan für: {u}")
                         url, typ, kw, ctx = crawl_and_analyze(driver, u, entry['ort'])
                         
@@ -1013,18 +3487,18 @@ def run_manual_review(data):
                             print("   ⚠️ URL geladen, aber 'crawl_and_analyze' hat keine Inhalte validiert.")
                             entry['ki_zusammenfassung'] = "Inhalt abgelehnt (Strict Filter)"
                         
-                        save_data(data)
+                        save_entry(entry, i)
                     break
                     
                 elif c == "4":
                     new_typ = input(f"   ✍️ Typ ({entry.get('schultyp')}): ").strip()
                     if new_typ: entry['schultyp'] = new_typ
-                    save_data(data); break
+                    save_entry(entry, i); break
                 
                 elif c == "5":
                     new_kw = input(f"   ✍️ Keywords ({entry.get('keywords')}): ").strip()
                     if new_kw: entry['keywords'] = new_kw
-                    save_data(data); break
+                    save_entry(entry, i); break
 
                 # --- NEUE FILTER-FUNKTIONEN ---
                 elif c == "6":
@@ -1064,8 +3538,6 @@ def run_manual_review(data):
     except KeyboardInterrupt:
         save_config_to_file(CONFIG)
         print("\n🛑 Pause. Position gespeichert.")
-    finally:
-        if driver: driver.quit()
 
 
 def run_single_edit(data):
@@ -1091,74 +3563,78 @@ def run_single_edit(data):
         print("[4] Zurück")
         
         c = input("👉 Wahl: ").strip()
-        driver = None
-        
-        try:
-            if c == "1" or c == "2":
-                driver = get_driver() # Brauchen wir nur hier
-
-            if c == "1":
-                url, typ, kw, ctx = crawl_and_analyze(driver, e['schulname'], e['ort'])
-                e['webseite'] = url; e['schultyp'] = typ; e['keywords'] = kw
-                if ctx: e['ki_zusammenfassung'] = ki_analyse(ctx)
-                
-            elif c == "2":
-                u = input("URL: ").strip()
-                if u.startswith("http"):
-                    e['webseite'] = u
-                    t, text, _ = get_selenium_content(driver, u)
-                    e['schultyp'] = ", ".join(find_school_type_in_text(text))
-                    if text: e['ki_zusammenfassung'] = ki_analyse(text[:15000])
-
-            elif c == "3":
-                new_typ = input(f"Schultyp ({e.get('schultyp')}): ").strip()
-                if new_typ: e['schultyp'] = new_typ
-                
-                # Keywords anpassen
-                new_kw = input(f"Keywords ({e.get('keywords')}): ").strip()
-                if new_kw: e['keywords'] = new_kw
-                
-                print("💾 Daten aktualisiert.")
 
-            save_data(data)
+        if c == "1":
+            driver = get_shared_driver() # Browser nur für [1] und [2]
+            url, typ, kw, ctx = crawl_and_analyze(driver, e['schulname'], e['ort'])
+            e['webseite'] = url; e['schultyp'] = typ; e['keywords'] = kw
+            if ctx: e['ki_zusammenfassung'] = ki_analyse(ctx)
             
-        finally:
-            if driver: driver.quit()
+        elif c == "2":
+            u = input("URL: ").strip()
+            if u.startswith("http"):
+                e['webseite'] = u
+                driver = get_shared_driver()
+                t, text, _ = get_page_content(driver, u)
+                e['schultyp'] = ", ".join(find_school_type_in_text(text))
+                if text: e['ki_zusammenfassung'] = ki_analyse(text[:15000])
+
+        elif c == "3":
+            new_typ = input(f"Schultyp ({e.get('schultyp')}): ").strip()
+            if new_typ: e['schultyp'] = new_typ
+            
+            # Keywords anpassen
+            new_kw = input(f"Keywords ({e.get('keywords')}): ").strip()
+            if new_kw: e['keywords'] = new_kw
+            
+            print("💾 Daten aktualisiert.")
+
+        save_entry(e, idx)
     else:
         print("❌ Ungültige Zeilennummer.")
 
 def main():
     print_system_status()
-    while True:
-        data = load_data()
-        if not data and os.path.exists(CONFIG["INPUT_FILE"]): data = sync_with_source([])
-        if data:
-            for d in data:
-                if 'schultyp' not in d: d['schultyp'] = ""
-                if 'keywords' not in d: d['keywords'] = ""
-            save_data(data)
-
-        done = sum(1 for x in data if str(x.get('ki_zusammenfassung')) not in ["Keine Daten", "Keine relevanten Daten gefunden", "", "Zu wenige Infos (Strict Filter)"])
-        print(f"\n--- SCANNER V13.0 (National/Strict) | Fertig: {done}/{len(data)} ---")
-        print("1️⃣ Auto-Scan")
-        print("2️⃣ Manuelle Kontrolle")
-        print("3️⃣ Einzelne Zeile")
-        print("4️⃣ Karte erstellen")
-        print("5️⃣ Sync mit Input-Datei")
-        print("6️⃣ Einstellungen")
-        print("7️⃣ Beenden")
+    if CONFIG.get("BROWSER_PREWARM", False): prewarm_shared_driver()
+    try:
+        while True:
+            data = load_data()
+            if not data and os.path.exists(CONFIG["INPUT_FILE"]): data = sync_with_source([])
+            if data:
+                changed = False
+                for d in data:
+                    if 'schultyp' not in d: d['schultyp'] = ""; changed = True
+                    if 'keywords' not in d: d['keywords'] = ""; changed = True
+                if changed: save_data(data)
+
+            done = sum(1 for x in data if str(x.get('ki_zusammenfassung')) not in ["Keine Daten", "Keine relevanten Daten gefunden", "", "Zu wenige Infos (Strict Filter)"])
+            print(f"\n--- SCANNER V13.0 (National/Strict) | Fertig: {done}/{len(data)} ---")
+            print("1️⃣ Auto-Scan")
+            print("2️⃣ Manuelle Kontrolle")
+            print("3️⃣ Einzelne Zeile")
+            print("4️⃣ Karte erstellen")
+            print("5️⃣ Sync mit Input-Datei")
+            print("6️⃣ Einstellungen")
+            print("7️⃣ Excel exportieren")
+            print("8️⃣ Beenden (mit Excel-Export)")
         
-        try:
-            c = input("\n👉 Wahl: ").strip()
-            if c == "1": run_auto_scan(data)
-            elif c == "2": run_manual_review(data)
-            elif c == "3": run_single_edit(data)
-            elif c == "4": generate_map(data)
-            elif c == "5": data = sync_with_source(data)
-            elif c == "6": menu_settings()
-            elif c == "7": break
-        except KeyboardInterrupt:
-            print("\n(Im Hauptmenü: '7' zum Beenden)")
+            try:
+                c = input("\n👉 Wahl: ").strip()
+                if c == "1": run_auto_scan(data); print_llm_cache_stats(); print_metrics_summary(); print_cassette_stats()
+                elif c == "2": run_manual_review(data)
+                elif c == "3": run_single_edit(data)
+                elif c == "4": generate_map(data)
+                elif c == "5": data = sync_with_source(data)
+                elif c == "6": menu_settings()
+                elif c == "7": export_excel(data)
+                elif c == "8":
+                    export_excel(data)
+                    break
+            except KeyboardInterrupt:
+                print("\n(Im Hauptmenü: '8' zum Beenden)")
+    finally:
+        close_shared_driver() # Der gemeinsame Browser lebt genau so lange wie das Menü
+        save_cassettes()
 
 if __name__ == "__main__":
     try: